@@ -3,28 +3,38 @@ import tkinter as tk
 from tkinter import ttk, font, filedialog
 import re
 import shutil
-import zipfile
 import os
-import json
-import glob
-from config import APP_NAME, COLORS
-from database import DatabaseManager
+import time
+import queue
+import sqlite3
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from config import (
+    APP_NAME, COLORS, PROJECT_PAGE_SIZE, PROJECT_STATE_CACHE, SEARCH_DEBOUNCE_MS, RESIZE_THROTTLE_MS,
+    JOURNAL_FLUSH_MS, JOURNAL_CHECKPOINT_OPS, STORAGE_GC_INTERVAL_S, MAINTENANCE_IDLE_MS, MAINTENANCE_STEP_MS
+)
+from database import DatabaseManager, parse_due
+from crypto import HAS_CRYPTO
+from instrument import tracer, traced
+from snapshot import FORMAT_TAGS, parse_snapshot
 from whiteboard import Whiteboard
+from pdf_export import HAS_PDF, ExportCache, export_worker
+from backup import (
+    BackupStore, COMPRESSION_LEVELS, STAGING_DIR, ROLLBACK_DIR, data_files,
+    export_zip, stage_zip, swap_in, verify_database
+)
+from transfer import export_ndjson, import_ndjson
+from bulk_import import import_folder
 from ui_shared import (
-    ScrollableFrame, CalendarDialog, show_msg, 
-    ask_yes_no, ask_string
+    ScrollableFrame, CalendarDialog, ProgressDialog, BackgroundTask, show_msg, 
+    ask_yes_no, ask_string, get_scheduler, TextOpRecorder, QuickSwitcher
 )
+from title_index import TitleIndex
+from storage import collect_garbage, disk_usage
 
 # --- Optional Dependencies ---
-try:
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Image as PDFImage
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER
-    HAS_PDF = True
-except ImportError:
-    HAS_PDF = False
-
 try:
     from spellchecker import SpellChecker
     HAS_SPELL = True
@@ -42,7 +52,28 @@ class NoteApp(tk.Tk):
         self.configure(bg=COLORS["bg_main"])
         self._setup_styles()
         self.db = DatabaseManager()
+        self.db.checkpoint_journal() # Folds in edits journaled before an unclean exit
+        if self.db.get_setting("trace_enabled") == "1": tracer.enable()
         self.current_project = None
+        self.detail_view = None
+        self.project_states = OrderedDict() # project id -> remembered view state (LRU)
+        self.sched = get_scheduler(self)
+        self.spell_queue = [] # Word start indices waiting for the idle spell check
+        self.journal_pending = [] # (note id, op) not yet appended to the journal
+        self.journal_counts = {} # note id -> journaled ops since its last checkpoint
+        self.note_dirty = False
+        self.checkpoint_pool = ThreadPoolExecutor(max_workers=1)
+        self.title_index = TitleIndex()
+        self.app_locked = False
+        self.index_in_background() # Quick-switcher titles, and related-notes signatures notes don't have yet
+        self.storage_gc_in_background()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.bind_all("<Control-p>", lambda e: self.open_quick_switcher())
+        # Any key or click postpones database upkeep until the app has been idle a while
+        self.activity_seq = 0 # Bumped on every key or click; a running upkeep stops when it changes
+        self.bind_all("<KeyPress>", self.note_activity, add="+")
+        self.bind_all("<ButtonPress>", self.note_activity, add="+")
+        self.note_activity()
         
         # ... (keep existing variable inits) ...
         self.responsive_editor_btns = []
@@ -52,13 +83,25 @@ class NoteApp(tk.Tk):
         self.container.pack(fill="both", expand=True)
 
         # --- NEW: Check App Password ---
-        app_pass = self.db.get_setting("app_password")
-        if app_pass:
-            self.show_login_screen(app_pass)
+        if self.db.get_setting("app_password"):
+            self.show_login_screen()
         else:
             self.show_projects_view()
 
-    def show_login_screen(self, real_pass):
+    def on_close(self):
+        if hasattr(self, 'editor_text'): 
+            self.auto_save_current()
+        self.checkpoint_pool.shutdown(wait=True)
+        self.db.checkpoint_journal() # A clean exit leaves the journal empty
+        # Refreshes planner statistics this session's queries would benefit from;
+        # only the app does this, short-lived workers and CLI runs skip it
+        try: self.db.optimize()
+        except sqlite3.OperationalError: pass # Another process holds the write lock; skip it this time
+        self.db.close()
+        self.destroy()
+
+    def show_login_screen(self):
+        self.app_locked = True
         self.clear_container()
         f = tk.Frame(self.container, bg=COLORS["bg_main"])
         f.place(relx=0.5, rely=0.5, anchor="center")
@@ -71,7 +114,8 @@ class NoteApp(tk.Tk):
         e_pass.focus()
         
         def check(event=None):
-            if e_pass.get() == real_pass:
+            if self.db.check_app_password(e_pass.get()):
+                self.app_locked = False
                 self.show_projects_view()
             else:
                 show_msg(self, "Error", "Incorrect Password", True)
@@ -105,12 +149,18 @@ class NoteApp(tk.Tk):
     def clear_container(self):
         if hasattr(self, 'editor_text'): 
             self.auto_save_current()
-        for widget in self.container.winfo_children(): widget.destroy()
+        self.sched.cancel("project_search") # Its widgets are about to go
+        if self.detail_view and self.detail_view.winfo_manager():
+            self._remember_project_state()
+        # The project detail view is only hidden so the next notebook can reuse it
+        for widget in self.container.winfo_children():
+            if widget is self.detail_view: widget.pack_forget()
+            else: widget.destroy()
 
     def open_settings_window(self):
         d = tk.Toplevel(self)
         d.title("Settings")
-        d.geometry("500x550")
+        d.geometry("500x830")
         try: d.iconbitmap("icon.ico")
         except: pass
         d.resizable(False, False)
@@ -155,12 +205,12 @@ class NoteApp(tk.Tk):
         def set_app_pass():
             p = ask_string(self, "Set Password", "Enter new App Password:", show="*")
             if p:
-                self.db.set_setting("app_password", p)
+                self.db.set_app_password(p)
                 show_msg(self, "Done", "App password set.")
         
         def remove_app_pass():
             if ask_yes_no(self, "Remove", "Remove App Password?"):
-                self.db.set_setting("app_password", "")
+                self.db.set_app_password("")
                 show_msg(self, "Done", "App password removed.")
 
         ttk.Button(f_sec, text="Set App Password", command=set_app_pass).pack(side="left", padx=(0, 10))
@@ -176,42 +226,390 @@ class NoteApp(tk.Tk):
         def export_backup():
             path = filedialog.asksaveasfilename(defaultextension=".zip", filetypes=[("Zip Archive", "*.zip")])
             if not path: return
-            try:
-                # Zip the DB and all WB images
-                app_dir = os.path.dirname(self.db.db_path)
-                with zipfile.ZipFile(path, 'w') as zipf:
-                    zipf.write(self.db.db_path, arcname="noteapp.db")
-                    for img in glob.glob(os.path.join(app_dir, "wb_*.png")):
-                        zipf.write(img, arcname=os.path.basename(img))
-                show_msg(self, "Success", "Backup created successfully!")
-            except Exception as e:
-                show_msg(self, "Error", str(e), True)
+            level = COMPRESSION_LEVELS[level_var.get()]
+            self.db.set_setting("backup_compression", level_var.get())
+            def work(progress, cancelled):
+                return export_zip(self.db.db_path, path, level, progress=progress, cancelled=cancelled)
+            BackgroundTask(self, "Backup", "Preparing backup...", work,
+                           lambda ok: show_msg(self, "Success", "Backup created successfully!"))
 
         def import_backup():
             if not ask_yes_no(self, "Warning", "This will OVERWRITE all current data. Continue?"): return
             path = filedialog.askopenfilename(filetypes=[("Zip Archive", "*.zip")])
             if not path: return
-            try:
-                # 1. Close current DB connection to allow overwrite
-                self.db.conn.close()
-                
-                # 2. Extract files
-                app_dir = os.path.dirname(self.db.db_path)
-                with zipfile.ZipFile(path, 'r') as zipf:
-                    zipf.extractall(app_dir)
-                
-                # 3. Re-init Database
-                self.db = DatabaseManager() 
-                show_msg(self, "Success", "Data imported! The app will now reload.")
-                self.show_projects_view() # Reload UI
-                d.destroy()
-            except Exception as e:
-                show_msg(self, "Critical Error", f"Failed to import: {e}\nPlease restart app.", True)
+            self.run_restore(lambda staging, progress, cancelled: stage_zip(path, staging, progress, cancelled), d.destroy)
+
+        def undo_restore():
+            rollback = os.path.join(os.path.dirname(self.db.db_path), ROLLBACK_DIR)
+            if "noteapp.db" not in data_files(rollback): return show_msg(self, "Info", "There is no restore to undo.")
+            if not ask_yes_no(self, "Undo Restore", "Put back the data that was replaced by the last restore?"): return
+            self.run_restore(lambda staging, progress, cancelled: [shutil.copy2(os.path.join(rollback, n), staging) for n in data_files(rollback)], d.destroy)
 
         ttk.Button(f_data, text="Export Backup (.zip)", command=export_backup).pack(side="left", padx=(0, 10))
         ttk.Button(f_data, text="Import Backup (.zip)", command=import_backup).pack(side="left")
+        ttk.Button(f_data, text="Undo Restore", command=undo_restore).pack(side="left", padx=(10, 0))
+
+        f_level = tk.Frame(d, bg=COLORS["bg_main"], padx=20)
+        f_level.pack(fill="x", pady=(10, 0))
+        tk.Label(f_level, text="Database Compression:", bg=COLORS["bg_main"], font=lbl_style).pack(side="left")
+        level_var = tk.StringVar(value=self.db.get_setting("backup_compression") or "Default")
+        ttk.Combobox(f_level, textvariable=level_var, values=list(COMPRESSION_LEVELS), state="readonly", width=16).pack(side="left", padx=10)
+
+        # Incremental backups: only chunks that changed since the last snapshot are written
+        f_inc = tk.Frame(d, bg=COLORS["bg_main"], padx=20)
+        f_inc.pack(fill="x", pady=(10, 0))
+
+        def incremental_backup():
+            root = filedialog.askdirectory(title="Choose Backup Folder", initialdir=self.db.get_setting("backup_store") or None)
+            if not root: return
+            self.db.set_setting("backup_store", root)
+            def work(progress, cancelled):
+                return BackupStore(root).snapshot_app(self.db.db_path, progress, cancelled)
+            def done(result):
+                snap_id, written = result
+                show_msg(self, "Success", f"Snapshot {snap_id} saved ({written / 1048576:.1f} MB of new data).")
+            BackgroundTask(self, "Backup", "Backing up changed files...", work, done)
+
+        ttk.Button(f_inc, text="Incremental Backup", command=incremental_backup).pack(side="left", padx=(0, 10))
+        ttk.Button(f_inc, text="Manage Snapshots", command=lambda: self.open_snapshot_manager(d)).pack(side="left")
+
+        # Notebook transfer: merges into the current data instead of replacing it
+        f_move = tk.Frame(d, bg=COLORS["bg_main"], padx=20)
+        f_move.pack(fill="x", pady=(10, 0))
+
+        def export_notebooks():
+            path = filedialog.asksaveasfilename(defaultextension=".ndjson", filetypes=[("Notebook Export", "*.ndjson")])
+            if not path: return
+            self._settle_journal()
+            self.db.checkpoint_journal() # The export reads notes.content only
+            def work(progress, cancelled):
+                return export_ndjson(self.db.db_path, path, progress=progress, cancelled=cancelled)
+            BackgroundTask(self, "Export Notebooks", "Exporting notebooks...", work,
+                           lambda n: show_msg(self, "Success", f"Exported {n} notebook(s)."))
+
+        def import_notebooks():
+            path = filedialog.askopenfilename(filetypes=[("Notebook Export", "*.ndjson")])
+            if not path: return
+            def work(progress, cancelled):
+                return import_ndjson(self.db.db_path, path, progress=progress, cancelled=cancelled)
+            def done(n):
+                show_msg(self, "Success", f"Imported {n} notebook(s).")
+                self.index_in_background()
+                self.show_projects_view()
+            BackgroundTask(self, "Import Notebooks", "Importing notebooks...", work, done)
+
+        def import_folder_dialog():
+            root = filedialog.askdirectory(title="Choose a Folder of .md / .txt Files")
+            if not root: return
+            def work(progress, cancelled):
+                return import_folder(self.db.db_path, root, progress, cancelled)
+            def imported():
+                self.index_in_background()
+                self.show_projects_view()
+            def done(stats):
+                show_msg(self, "Import Complete",
+                         f"{stats['notes']} notes in {stats['notebooks']} notebooks "
+                         f"({stats['bytes'] / 1048576:.1f} MB) in {stats['seconds']:.1f}s - "
+                         f"{stats['notes_per_sec']:.0f} notes/s.")
+                imported()
+            # Batches committed before a cancel are kept, so they need indexing and listing too
+            BackgroundTask(self, "Import Folder", "Scanning folder...", work, done, on_cancel=imported)
+
+        ttk.Button(f_move, text="Export Notebooks", command=export_notebooks).pack(side="left", padx=(0, 10))
+        ttk.Button(f_move, text="Import Notebooks", command=import_notebooks).pack(side="left", padx=(0, 10))
+        ttk.Button(f_move, text="Import Folder", command=import_folder_dialog).pack(side="left")
+
+        ttk.Separator(d, orient="horizontal").pack(fill="x", padx=20, pady=15)
+
+        # --- Section 4: Storage ---
+        tk.Label(d, text="Storage", font=("Segoe UI", 14, "bold"), bg=COLORS["bg_main"], fg=COLORS["accent"]).pack(anchor="w", padx=20, pady=(0, 10))
+        f_store = tk.Frame(d, bg=COLORS["bg_main"], padx=20)
+        f_store.pack(fill="x")
+
+        def clean_up():
+            if hasattr(self, 'editor_text'): self.auto_save_current()
+            keep = {self.current_note_id}
+            app_dir = os.path.dirname(self.db.db_path)
+            def work(progress, cancelled):
+                progress(0, 1, "Looking for unused sketch pages and thumbnails...")
+                return collect_garbage(self.db, app_dir, keep, cancelled)
+            def done(result):
+                self.db.set_setting("storage_gc_at", str(int(time.time())))
+                show_msg(self, "Done", f"Removed {result[0]} unused sketch page(s) and thumbnail(s), {result[1] / 1048576:.1f} MB freed.")
+            BackgroundTask(self, "Clean Up", "Looking for unused sketch pages...", work, done)
+
+        ttk.Button(f_store, text="Disk Usage", command=self.open_disk_usage).pack(side="left", padx=(0, 10))
+        ttk.Button(f_store, text="Clean Up Storage", command=clean_up).pack(side="left", padx=(0, 10))
+        ttk.Button(f_store, text="Database Health", command=self.open_db_health).pack(side="left")
+
+        ttk.Separator(d, orient="horizontal").pack(fill="x", padx=20, pady=15)
+
+        # --- Section 5: Diagnostics ---
+        tk.Label(d, text="Diagnostics", font=("Segoe UI", 14, "bold"), bg=COLORS["bg_main"], fg=COLORS["accent"]).pack(anchor="w", padx=20, pady=(0, 10))
+        f_diag = tk.Frame(d, bg=COLORS["bg_main"], padx=20)
+        f_diag.pack(fill="x")
+
+        trace_var = tk.BooleanVar(value=tracer.enabled)
+        def toggle_trace():
+            tracer.enable(trace_var.get())
+            self.db.set_setting("trace_enabled", "1" if trace_var.get() else "")
+
+        def save_trace():
+            path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome Trace", "*.json")])
+            if not path: return
+            tracer.dump_chrome_trace(path)
+            show_msg(self, "Saved", "Open the file in chrome://tracing or ui.perfetto.dev.")
+
+        tk.Checkbutton(f_diag, text="Record timings", variable=trace_var, command=toggle_trace,
+                       bg=COLORS["bg_main"], activebackground=COLORS["bg_main"]).pack(side="left", padx=(0, 10))
+        ttk.Button(f_diag, text="Show Stats", command=self.open_stats_panel).pack(side="left", padx=(0, 10))
+        ttk.Button(f_diag, text="Save Trace", command=save_trace).pack(side="left")
+
+    def open_disk_usage(self):
+        app_dir = os.path.dirname(self.db.db_path)
+        def work(progress, cancelled):
+            return disk_usage(self.db, app_dir)
+        def done(usage):
+            d = tk.Toplevel(self)
+            d.title("Disk Usage")
+            d.geometry("640x400")
+            try: d.iconbitmap("icon.ico")
+            except: pass
+            d.configure(bg=COLORS["bg_main"])
+
+            cols = ("notes", "data", "pages", "images", "total")
+            tree = ttk.Treeview(d, columns=cols, show="tree headings")
+            tree.heading("#0", text="Notebook")
+            tree.column("#0", width=240)
+            for col, label in zip(cols, ("Notes", "Data MB", "Pages", "Images MB", "Total MB")):
+                tree.heading(col, text=label)
+                tree.column(col, width=70, anchor="e")
+            tree.pack(fill="both", expand=True, padx=10, pady=10)
+            mb = lambda n: f"{n / 1048576:.2f}"
+            for r in usage["notebooks"]:
+                tree.insert("", "end", text=r["name"], values=(r["notes"], mb(r["db_bytes"]), r["pages"],
+                                                               mb(r["image_bytes"]), mb(r["db_bytes"] + r["image_bytes"])))
+            summary = f"Database file: {mb(usage['db_file_bytes'])} MB"
+            summary += f"  ·  Caches: {mb(sum(usage['cache_bytes'].values()))} MB"
+            if usage["orphan_pages"]:
+                summary += f"  ·  {usage['orphan_pages']} unused page(s): {mb(usage['orphan_bytes'])} MB"
+            btns = tk.Frame(d, bg=COLORS["bg_main"])
+            btns.pack(fill="x", padx=10, pady=(0, 10))
+            tk.Label(btns, text=summary, bg=COLORS["bg_main"], fg=COLORS["fg_sub"]).pack(side="left")
+            ttk.Button(btns, text="Close", command=d.destroy).pack(side="right")
+        BackgroundTask(self, "Disk Usage", "Measuring notebooks...", work, done, cancellable=False)
+
+    def open_db_health(self):
+        d = tk.Toplevel(self)
+        d.title("Database Health")
+        d.geometry("380x300")
+        try: d.iconbitmap("icon.ico")
+        except: pass
+        d.resizable(False, False)
+        d.configure(bg=COLORS["bg_main"])
+        lbl = tk.Label(d, justify="left", anchor="nw", font=("Consolas", 10), bg=COLORS["bg_main"], fg=COLORS["fg_text"])
+        lbl.pack(fill="both", expand=True, padx=20, pady=20)
+
+        def refresh():
+            if not d.winfo_exists(): return
+            h = self.db.get_db_health()
+            mb = lambda n: f"{n / 1048576:.2f} MB"
+            lines = [
+                f"Database file    {mb(h['file_bytes'])}",
+                f"Write-ahead log  {mb(h['wal_bytes'])}",
+                f"Pages            {h['pages']} x {h['page_size']} bytes",
+                f"Free pages       {h['free_pages']} ({mb(h['free_bytes'])}, {h['free_pages'] / max(h['pages'], 1):.0%})",
+                f"Page fill        " + (f"{h['page_fill']:.0%}" if h['page_fill'] is not None else "n/a"),
+                f"Auto-vacuum      {h['auto_vacuum']}",
+                f"Statistics       {'yes' if h['analyzed'] else 'never analyzed'}",
+            ]
+            lbl.config(text="\n".join(lines))
+
+        def compact():
+            def work(progress, cancelled):
+                while not cancelled() and self.db.maintenance_step(): pass
+            BackgroundTask(self, "Compact", "Returning free space to the disk...", work, lambda _: refresh())
+
+        def optimize():
+            # ANALYZE can take a while on a large database; keep it off the Tk thread
+            BackgroundTask(self, "Optimize", "Refreshing query statistics...",
+                           lambda progress, cancelled: self.db.optimize(), lambda _: refresh(), cancellable=False)
+
+        btns = tk.Frame(d, bg=COLORS["bg_main"])
+        btns.pack(fill="x", padx=20, pady=(0, 15))
+        ttk.Button(btns, text="Close", command=d.destroy).pack(side="right")
+        ttk.Button(btns, text="Optimize", command=optimize).pack(side="right", padx=5)
+        ttk.Button(btns, text="Compact Now", command=compact).pack(side="right", padx=5)
+        refresh()
+
+    # --- Idle-time database upkeep ---
+    def note_activity(self, event=None):
+        self.activity_seq += 1
+        self.sched.debounce("maintenance", MAINTENANCE_IDLE_MS, self.run_maintenance)
+
+    def run_maintenance(self):
+        # Steps run on the checkpoint worker, queued behind any checkpoint or indexing
+        # that holds the write lock, so the window never waits for them. Each is a few
+        # milliseconds; the chain stops at the next key or click (which restarts the
+        # idle timer) or when a restore swaps the database out.
+        db, seq = self.db, self.activity_seq
+        def step():
+            if self.activity_seq != seq or self.index_db is not db: return
+            try: more = db.maintenance_step()
+            except sqlite3.OperationalError: more = False # Another process is writing; retry after the next idle spell
+            if not more: return
+            time.sleep(MAINTENANCE_STEP_MS / 1000)
+            try: self.checkpoint_pool.submit(step)
+            except RuntimeError: pass # Pool shut down on exit
+        try: self.checkpoint_pool.submit(step)
+        except RuntimeError: pass
+
+    def storage_gc_in_background(self):
+        # At most once per STORAGE_GC_INTERVAL_S, on the checkpoint worker
+        last = self.db.get_setting("storage_gc_at")
+        if last and time.time() - int(last) < STORAGE_GC_INTERVAL_S: return
+        db, app_dir = self.db, os.path.dirname(self.db.db_path)
+        def run():
+            if self.index_db is not db: return
+            collect_garbage(db, app_dir, {self.current_note_id})
+            db.set_setting("storage_gc_at", str(int(time.time())))
+        self.checkpoint_pool.submit(run)
+
+    def open_stats_panel(self):
+        d = tk.Toplevel(self)
+        d.title("Performance Stats")
+        d.geometry("640x400")
+        try: d.iconbitmap("icon.ico")
+        except: pass
+        d.configure(bg=COLORS["bg_main"])
+
+        cols = ("calls", "total", "avg", "max", "rows")
+        tree = ttk.Treeview(d, columns=cols, show="tree headings")
+        tree.heading("#0", text="Operation")
+        tree.column("#0", width=260)
+        for col, label in zip(cols, ("Calls", "Total ms", "Avg ms", "Max ms", "Rows")):
+            tree.heading(col, text=label)
+            tree.column(col, width=70, anchor="e")
+        tree.pack(fill="both", expand=True, padx=10, pady=10)
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            for name, calls, total, avg, mx, rows in tracer.summary():
+                tree.insert("", "end", text=name, values=(calls, f"{total:.1f}", f"{avg:.2f}", f"{mx:.1f}", rows))
+
+        def reset():
+            tracer.reset()
+            refresh()
+
+        btns = tk.Frame(d, bg=COLORS["bg_main"])
+        btns.pack(fill="x", padx=10, pady=(0, 10))
+        ttk.Button(btns, text="Close", command=d.destroy).pack(side="right")
+        ttk.Button(btns, text="Reset", command=reset).pack(side="right", padx=5)
+        ttk.Button(btns, text="Refresh", command=refresh).pack(side="right", padx=5)
+        if not tracer.enabled:
+            tk.Label(btns, text="Recording is off - enable it in Settings.", bg=COLORS["bg_main"], fg=COLORS["fg_sub"]).pack(side="left")
+        refresh()
+
+    def run_restore(self, stage, on_finished=None):
+        # stage(staging_dir, progress, cancelled) fills a staging folder on a worker thread.
+        # Nothing live is touched until the staged database passes its integrity check;
+        # the swap itself is a set of renames, and the replaced files are kept in
+        # ROLLBACK_DIR so the restore can be undone.
+        app_dir = os.path.dirname(self.db.db_path)
+        staging = os.path.join(app_dir, STAGING_DIR)
+
+        def work(progress, cancelled):
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            try:
+                if stage(staging, progress, cancelled) is False or cancelled():
+                    shutil.rmtree(staging, ignore_errors=True)
+                    return None
+                progress(1, 1, "Checking database integrity...")
+                verify_database(os.path.join(staging, "noteapp.db"))
+            except Exception:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            return staging
+
+        def done(staged):
+            if not staged: return
+            self.auto_save_current()
+            self.current_note_id = None # The open note belongs to the data being replaced
+            self.project_states.clear()
+            self.journal_counts.clear()
+            self.index_db = None
+            self.checkpoint_pool.submit(lambda: None).result() # Let running checkpoints finish before the connection closes
+            self.db.close()
+            rollback = os.path.join(app_dir, ROLLBACK_DIR)
+            try:
+                swap_in(staged, app_dir, rollback)
+                self.db = DatabaseManager()
+            except Exception as e:
+                discard = os.path.join(app_dir, STAGING_DIR)
+                if "noteapp.db" in data_files(rollback): swap_in(rollback, app_dir, discard)
+                shutil.rmtree(discard, ignore_errors=True)
+                self.db = DatabaseManager()
+                self.index_in_background()
+                return show_msg(self, "Error", f"Restore failed, your data was left unchanged.\n{e}", True)
+            self.index_in_background()
+            show_msg(self, "Success", "Data restored! The app will now reload.")
+            self.show_projects_view()
+            if on_finished: on_finished()
+
+        BackgroundTask(self, "Restore", "Reading backup...", work, done)
+
+    def open_snapshot_manager(self, settings_dialog):
+        root = self.db.get_setting("backup_store")
+        if not root or not os.path.isdir(root):
+            root = filedialog.askdirectory(title="Choose Backup Folder")
+            if not root: return
+            self.db.set_setting("backup_store", root)
+        store = BackupStore(root)
+
+        d = tk.Toplevel(self)
+        d.title("Snapshots")
+        d.geometry("420x360")
+        try: d.iconbitmap("icon.ico")
+        except: pass
+        d.configure(bg=COLORS["bg_main"])
+        tk.Label(d, text=root, bg=COLORS["bg_main"], fg=COLORS["fg_sub"], font=("Segoe UI", 8)).pack(anchor="w", padx=20, pady=(15, 5))
+        lb = tk.Listbox(d, font=("Segoe UI", 10), bg=COLORS["white"], fg=COLORS["fg_text"], activestyle="none")
+        lb.pack(fill="both", expand=True, padx=20)
+
+        snaps = []
+        def refresh():
+            snaps[:] = store.list_snapshots()
+            lb.delete(0, "end")
+            for snap in snaps:
+                lb.insert("end", f"{snap['created']}   {snap['files']} files   {snap['size'] / 1048576:.1f} MB")
+
+        def restore():
+            sel = lb.curselection()
+            if not sel: return
+            if not ask_yes_no(self, "Warning", "This will OVERWRITE all current data. Continue?"): return
+            snap_id = snaps[sel[0]]["id"]
+            def finished():
+                d.destroy()
+                settings_dialog.destroy()
+            self.run_restore(lambda staging, progress, cancelled: store.restore_snapshot(snap_id, staging, progress, cancelled), finished)
+
+        def prune():
+            keep = ask_string(self, "Prune", "Number of recent snapshots to keep:")
+            if not keep or not keep.isdigit(): return
+            removed, chunks = store.prune(int(keep))
+            refresh()
+            show_msg(self, "Done", f"Removed {removed} snapshot(s) and {chunks} unused chunk(s).")
+
+        btns = tk.Frame(d, bg=COLORS["bg_main"], pady=15)
+        btns.pack(fill="x")
+        ttk.Button(btns, text="Close", command=d.destroy).pack(side="right", padx=(5, 20))
+        ttk.Button(btns, text="Prune...", command=prune).pack(side="right", padx=5)
+        ttk.Button(btns, text="Restore", command=restore).pack(side="right", padx=5)
+        refresh()
 
     # --- PROJECT VIEW ---
+    @traced()
     def show_projects_view(self):
         self.clear_container()
         self.current_note_id = None
@@ -243,9 +641,10 @@ class NoteApp(tk.Tk):
         
         # --- NEW: Settings Button ---
         ttk.Button(ctrl_frame, text="⚙️ Settings", command=self.open_settings_window, style="Tool.TButton").pack(side="right", padx=10)
+        ttk.Button(ctrl_frame, text="📅 Agenda", command=self.open_agenda, style="Tool.TButton").pack(side="right")
         
         self.proj_search_var = tk.StringVar()
-        self.proj_search_var.trace("w", lambda n,i,m: self.refresh_project_list())
+        self.proj_search_var.trace("w", lambda n,i,m: self.sched.debounce("project_search", SEARCH_DEBOUNCE_MS, self.refresh_project_list))
         e_search = ttk.Entry(ctrl_frame, textvariable=self.proj_search_var, width=25)
         e_search.pack(side="right", padx=10)
         ttk.Button(ctrl_frame, text="+ New Notebook", command=self.open_new_project_dialog).pack(side="right")
@@ -262,28 +661,40 @@ class NoteApp(tk.Tk):
         self.proj_scroll.pack(fill="both", expand=True)
         self.refresh_project_list()
 
+    @traced()
     def refresh_project_list(self):
         for w in self.proj_scroll.scrollable_frame.winfo_children(): w.destroy()
-        projects = self.db.get_projects(self.proj_search_var.get())
-        if not projects:
+        self.proj_page_after = None
+        self.load_more_projects()
+
+    def load_more_projects(self):
+        if getattr(self, "btn_more_projects", None): self.btn_more_projects.destroy()
+        projects = self.db.get_project_page(self.proj_search_var.get(), self.proj_page_after, PROJECT_PAGE_SIZE)
+        if not projects and not self.proj_page_after:
             ttk.Label(self.proj_scroll.scrollable_frame, text="No notebooks found.", padding=20).pack()
         for row in projects: self.create_project_row(row)
+        if len(projects) == PROJECT_PAGE_SIZE:
+            self.proj_page_after = (projects[-1][7], projects[-1][0])
+            self.btn_more_projects = ttk.Button(self.proj_scroll.scrollable_frame, text="Load more", command=self.load_more_projects)
+            self.btn_more_projects.pack(pady=10)
+        else:
+            self.btn_more_projects = None
 
     def create_project_row(self, row_data):
-        pid, name, desc, created, password = row_data
+        pid, name, desc, created, locked, note_count, open_todos, last_activity = row_data
         row = tk.Frame(self.proj_scroll.scrollable_frame, bg=COLORS["white"], pady=12, padx=10, bd=1, relief="solid")
         row.pack(fill="x", pady=5)
-        def try_open(e, p=pid, n=name, pwd=password):
-            if pwd:
+        def try_open(e, p=pid, n=name):
+            if self.db.get_project_password(p):
                 inp = ask_string(self, "Password Required", f"Enter password for '{n}':", show='*')
-                if inp == pwd: self.open_project_detail(p, n)
+                if inp is not None and self.db.unlock_project(p, inp): self.open_project_detail(p, n)
                 elif inp is not None: show_msg(self, "Error", "Incorrect password.", True)
             else:
                 self.open_project_detail(p, n)
         
         info_frame = tk.Frame(row, bg=COLORS["white"])
         info_frame.pack(side="left", fill="both", expand=True)
-        name_text = f"🔒 {name}" if password else name
+        name_text = f"🔒 {name}" if locked else name
         l_name = tk.Label(info_frame, text=name_text, font=("Segoe UI", 12, "bold"), fg=COLORS["fg_text"], bg=COLORS["white"], width=30, anchor="w")
         l_name.pack(side="left")
         l_desc = tk.Label(info_frame, text=desc, font=("Segoe UI", 10), fg=COLORS["fg_sub"], bg=COLORS["white"], anchor="w")
@@ -291,26 +702,29 @@ class NoteApp(tk.Tk):
         
         meta_frame = tk.Frame(row, bg=COLORS["white"])
         meta_frame.pack(side="right")
-        tk.Label(meta_frame, text=f"Created: {created}", font=("Segoe UI", 8), fg="#888", bg=COLORS["white"]).pack(side="left", padx=15)
+        stats = f"{note_count} notes · {open_todos} open tasks · Updated {last_activity or created}"
+        l_meta = tk.Label(meta_frame, text=stats, font=("Segoe UI", 8), fg="#888", bg=COLORS["white"])
+        l_meta.pack(side="left", padx=15)
         ttk.Button(meta_frame, text="Delete", style="Delete.TButton", command=lambda: self.confirm_delete_project(pid)).pack(side="right", padx=5)
         
-        for w in [row, info_frame, l_name, l_desc, meta_frame]: w.bind("<Button-1>", try_open)
+        for w in [row, info_frame, l_name, l_desc, meta_frame, l_meta]: w.bind("<Button-1>", try_open)
 
     def confirm_delete_project(self, pid):
-        pwd = self.db.get_project_password(pid)
-        if pwd:
+        if self.db.get_project_password(pid):
             inp = ask_string(self, "Password Required", "Enter password to delete:", show='*')
-            if inp != pwd: return show_msg(self, "Error", "Incorrect password.", True)
+            if inp is None or not self.db.unlock_project(pid, inp): return show_msg(self, "Error", "Incorrect password.", True)
         if ask_yes_no(self, "Delete Notebook", "Are you sure? This will delete all notes and tasks inside."):
             self.db.delete_project(pid)
+            self.project_states.pop(pid, None)
             self.refresh_project_list()
     def remove_password_dialog(self):
         if ask_yes_no(self, "Remove Lock", "Are you sure you want to remove the password protection?"):
-            # Set the password to None or empty string to remove it
+            # Set the password to None or empty string to remove it (decrypts the notes too)
+            self._settle_journal()
             self.db.set_project_password(self.current_project, "")
+            self.refresh_notes_list()
             show_msg(self, "Success", "Password removed.")
-            
-            self.show_projects_view()
+            self._refresh_lock_tools()
     # In main.py (add this method to NoteApp class)
 
     def edit_project_details_dialog(self):
@@ -351,8 +765,7 @@ class NoteApp(tk.Tk):
             if new_name:
                 self.db.update_project(self.current_project, new_name, new_desc)
                 d.destroy()
-                # Refresh the view to show the new name
-                self.open_project_detail(self.current_project, new_name)
+                self.lbl_project_name.config(text=new_name)
             else:
                 show_msg(self, "Error", "Name cannot be empty", True)
 
@@ -363,15 +776,25 @@ class NoteApp(tk.Tk):
         ttk.Button(btn_frame, text="Cancel", command=d.destroy).pack(side="right", padx=5)
 
     # --- PROJECT DETAIL VIEW ---
+    # The three-pane layout is built once and rebound to whichever notebook is
+    # opened; recently used notebooks remember their selected note, scroll
+    # positions and whiteboard page in self.project_states.
+    @traced()
     def open_project_detail(self, pid, name):
         self.clear_container()
-        self.current_project = pid
-        self.current_note_id = None
-        
-        header = ttk.Frame(self.container, padding=(20, 10))
+        if not self.detail_view or not self.detail_view.winfo_exists():
+            self._build_detail_view()
+        self.detail_view.pack(fill="both", expand=True)
+        self._bind_project(pid, name)
+
+    def _build_detail_view(self):
+        self.detail_view = ttk.Frame(self.container)
+
+        header = ttk.Frame(self.detail_view, padding=(20, 10))
         header.pack(fill="x")
         ttk.Button(header, text="← Back", command=self.show_projects_view, width=8).pack(side="left", padx=(0, 20))
-        ttk.Label(header, text=name, style="Header.TLabel").pack(side="left")
+        self.lbl_project_name = ttk.Label(header, text="", style="Header.TLabel")
+        self.lbl_project_name.pack(side="left")
         tools_frame = ttk.Frame(header)
         tools_frame.pack(side="right")
         
@@ -380,15 +803,10 @@ class NoteApp(tk.Tk):
         tools_frame = ttk.Frame(header)
         tools_frame.pack(side="right")
         ttk.Button(tools_frame, text="Export PDF", style="Tool.TButton", command=self.open_export_dialog).pack(side="left", padx=5)
+        self.lock_tools = ttk.Frame(tools_frame)
+        self.lock_tools.pack(side="left")
         
-        has_pass = self.db.get_project_password(pid)
-        if has_pass:
-            ttk.Button(tools_frame, text="Change Password", style="Tool.TButton", command=self.change_password_dialog).pack(side="left", padx=5)
-            ttk.Button(tools_frame, text="Remove Lock", style="Tool.TButton", command=self.remove_password_dialog).pack(side="left", padx=5)
-        else:
-            ttk.Button(tools_frame, text="Set Password", style="Tool.TButton", command=self.set_password_dialog).pack(side="left", padx=5)
-        
-        paned = tk.PanedWindow(self.container, orient=tk.HORIZONTAL, bg=COLORS["bg_sec"], sashwidth=4)
+        paned = tk.PanedWindow(self.detail_view, orient=tk.HORIZONTAL, bg=COLORS["bg_sec"], sashwidth=4)
         paned.pack(fill="both", expand=True, padx=20, pady=(10, 20))
         
         pane_notes = tk.Frame(paned, bg=COLORS["bg_main"])
@@ -396,9 +814,12 @@ class NoteApp(tk.Tk):
         n_tool = tk.Frame(pane_notes, bg=COLORS["bg_sec"], pady=5, padx=5)
         n_tool.pack(fill="x")
         self.note_search_var = tk.StringVar()
-        self.note_search_var.trace("w", lambda n,i,m: self.refresh_notes_list())
+        self.note_search_var.trace("w", lambda n,i,m: self.sched.debounce("note_search", SEARCH_DEBOUNCE_MS, self.refresh_notes_list))
         ttk.Entry(n_tool, textvariable=self.note_search_var).pack(side="left", fill="x", expand=True)
         ttk.Button(n_tool, text="+", width=3, command=self.create_new_note).pack(side="right", padx=(5,0))
+        # Related notes for the open one, from the similarity index
+        self.related_frame = tk.Frame(pane_notes, bg=COLORS["bg_sec"], padx=5, pady=5)
+        self.related_frame.pack(side="bottom", fill="x")
         self.note_scroll = ScrollableFrame(pane_notes, bg_color=COLORS["bg_main"])
         self.note_scroll.pack(fill="both", expand=True)
         
@@ -413,21 +834,84 @@ class NoteApp(tk.Tk):
         self._setup_editor_ui(self.tab_editor)
         
         app_data_path = os.path.dirname(self.db.db_path)
-        self.tab_whiteboard = Whiteboard(self.notebook_tabs, storage_path=app_data_path)
+        self.tab_whiteboard = Whiteboard(self.notebook_tabs, storage_path=app_data_path) # Builds itself and reads pages only once shown
         self.notebook_tabs.add(self.tab_whiteboard, text=" ✏️ Notepad ")
 
         pane_todo = tk.Frame(paned, bg=COLORS["bg_main"])
         paned.add(pane_todo, width=170)
         self._setup_todo_ui(pane_todo)
 
+    def _bind_project(self, pid, name):
+        self._leave_note()
+        self.current_project = pid
+        self.current_note_id = None
+        self.lbl_project_name.config(text=name)
+        self._refresh_lock_tools()
+
+        self.note_search_var.set("")
+        self.sched.cancel("note_search")
         self.refresh_notes_list()
+        self.e_task.delete(0, "end")
+        self.pending_due = None
+        self.btn_due.config(text="📅", width=3)
+        self.editor_search_var.set("")
+        self.drop_spell_queue()
+        self.editor_text.delete("1.0", "end")
+        self.editor_text.edit_reset()
+        self._show_editor()
+        self.tab_whiteboard.load_board(None)
+        self.refresh_related()
         self.refresh_todo_list()
 
+        state = self.project_states.get(pid)
+        if state:
+            self.project_states.move_to_end(pid)
+            if state["note_id"] and self.db.get_note(state["note_id"]):
+                self.load_editor(state["note_id"])
+                self.tab_whiteboard.goto_page(state["wb_page"])
+                self.editor_text.yview_moveto(state["editor_y"])
+            self.notebook_tabs.select(state["tab"])
+            self.update_idletasks()
+            self.note_scroll.canvas.yview_moveto(state["notes_y"])
+        else:
+            self.notebook_tabs.select(0)
+            self.note_scroll.canvas.yview_moveto(0)
+
+    def _remember_project_state(self):
+        self.project_states[self.current_project] = {
+            "note_id": self.current_note_id,
+            "editor_y": self.editor_text.yview()[0],
+            "notes_y": self.note_scroll.canvas.yview()[0],
+            "wb_page": self.tab_whiteboard.current_page,
+            "tab": self.notebook_tabs.index("current"),
+        }
+        self.project_states.move_to_end(self.current_project)
+        while len(self.project_states) > PROJECT_STATE_CACHE:
+            self.project_states.popitem(last=False)
+
+    def _refresh_lock_tools(self):
+        for w in self.lock_tools.winfo_children(): w.destroy()
+        if self.db.get_project_password(self.current_project):
+            ttk.Button(self.lock_tools, text="Change Password", style="Tool.TButton", command=self.change_password_dialog).pack(side="left", padx=5)
+            ttk.Button(self.lock_tools, text="Remove Lock", style="Tool.TButton", command=self.remove_password_dialog).pack(side="left", padx=5)
+            if self.db.is_encrypted(self.current_project):
+                ttk.Button(self.lock_tools, text="Decrypt", style="Tool.TButton", command=self.decrypt_project_dialog).pack(side="left", padx=5)
+            elif HAS_CRYPTO:
+                ttk.Button(self.lock_tools, text="Encrypt", style="Tool.TButton", command=self.encrypt_project_dialog).pack(side="left", padx=5)
+        else:
+            ttk.Button(self.lock_tools, text="Set Password", style="Tool.TButton", command=self.set_password_dialog).pack(side="left", padx=5)
+
+    def _show_editor(self):
+        # delete_current_note hides the editor until another note is opened
+        if not self.editor_text.winfo_manager():
+            self.editor_toolbar.pack(side="top", fill="x")
+            self.editor_text.pack(fill="both", expand=True)
+
     def _setup_editor_ui(self, parent):
         self.editor_toolbar = tk.Frame(parent, bg="#eee", pady=5, padx=5)
         self.editor_toolbar.pack(side="top", fill="x")
         
-        parent.bind("<Configure>", self.on_editor_resize)
+        parent.bind("<Configure>", lambda e: self.sched.throttle("editor_resize", RESIZE_THROTTLE_MS, lambda: self.on_editor_resize(parent.winfo_width())))
         self.responsive_editor_btns = []
 
         fmt_frame = tk.Frame(self.editor_toolbar, bg="#eee")
@@ -455,7 +939,7 @@ class NoteApp(tk.Tk):
         search_frame = tk.Frame(self.editor_toolbar, bg="#eee")
         search_frame.pack(side="left", padx=10)
         self.editor_search_var = tk.StringVar()
-        self.editor_search_var.trace("w", self.on_search_type) 
+        self.editor_search_var.trace("w", lambda n,i,m: self.sched.debounce("editor_search", SEARCH_DEBOUNCE_MS, self.on_search_type))
         self.e_editor_search = ttk.Entry(search_frame, textvariable=self.editor_search_var, width=15)
         self.e_editor_search.pack(side="left")
         
@@ -467,6 +951,7 @@ class NoteApp(tk.Tk):
                                    bg=COLORS["white"], fg=COLORS["fg_text"],
                                    undo=True, maxundo=5, autoseparators=False)
         self.editor_text.pack(fill="both", expand=True)
+        self.text_recorder = TextOpRecorder(self.editor_text, self.on_editor_op, FORMAT_TAGS)
         
         self.editor_text.tag_configure("bold", font=self.bold_font)
         self.editor_text.tag_configure("italic", font=self.italic_font)
@@ -479,11 +964,11 @@ class NoteApp(tk.Tk):
         self.editor_text.bind("<KeyRelease>", self.on_key_release)
         self.editor_text.bind("<Key>", self.on_key_press)
         self.editor_text.bind("<Control-z>", lambda e: self.undo_action())
+        self.editor_text.bind("<Control-p>", lambda e: self.open_quick_switcher() or "break") # Before Text's own Ctrl+P (line up)
         self.editor_text.bind("<Control-y>", lambda e: self.redo_action())
         self.editor_text.bind("<FocusOut>", lambda e: self.auto_save_current())
 
-    def on_editor_resize(self, event):
-        width = event.width
+    def on_editor_resize(self, width):
         new_mode = "long" if width > 600 else "short"
         if new_mode != self.display_mode:
             self.display_mode = new_mode
@@ -503,6 +988,9 @@ class NoteApp(tk.Tk):
         
         self.e_task.bind("<Return>", lambda e: self.add_task())
         ttk.Button(t_input, text="+", width=3, command=self.add_task).pack(side="right", padx=(5,5))
+        self.pending_due = None
+        self.btn_due = ttk.Button(t_input, text="📅", width=3, command=self.pick_task_due)
+        self.btn_due.pack(side="right")
         
         self.todo_scroll = ScrollableFrame(parent, bg_color=COLORS["bg_main"])
         self.todo_scroll.pack(fill="both", expand=True)
@@ -546,21 +1034,34 @@ class NoteApp(tk.Tk):
 
     def on_key_release(self, event):
         if event.keysym in ['space', 'Return', 'period', 'comma', 'semicolon']:
-            self.check_previous_word()
+            self.queue_previous_word()
 
-    def check_previous_word(self):
+    def queue_previous_word(self):
+        # Remember where the finished word is now; fast typing checks the batch once when idle
         if not HAS_SPELL: return
-        if self.editor_text.compare("insert-1c", "<", "1.0"): return
         target_index = "insert-2c"
         if self.editor_text.compare(target_index, "<", "1.0"): return
-        word_start = self.editor_text.index(f"{target_index} wordstart")
-        word_end = self.editor_text.index(f"{target_index} wordend")
-        word = self.editor_text.get(word_start, word_end)
-        clean_word = re.sub(r'[^\w]', '', word)
-        if clean_word and spell.unknown([clean_word]):
-            self.editor_text.tag_add("misspelled", word_start, word_end)
-        else:
-            self.editor_text.tag_remove("misspelled", word_start, word_end)
+        self.spell_queue.append(self.editor_text.index(f"{target_index} wordstart"))
+        self.sched.idle("spell_check", self.check_queued_words)
+
+    def drop_spell_queue(self):
+        # Queued indices point into the text that is about to be replaced
+        self.sched.cancel("spell_check")
+        self.spell_queue.clear()
+
+    def check_queued_words(self):
+        words = []
+        for word_start in self.spell_queue:
+            word_end = self.editor_text.index(f"{word_start} wordend")
+            clean_word = re.sub(r'[^\w]', '', self.editor_text.get(word_start, word_end))
+            words.append((word_start, word_end, clean_word))
+        self.spell_queue.clear()
+        unknown = spell.unknown([w for _, _, w in words if w])
+        for word_start, word_end, clean_word in words:
+            if clean_word and clean_word.lower() in unknown:
+                self.editor_text.tag_add("misspelled", word_start, word_end)
+            else:
+                self.editor_text.tag_remove("misspelled", word_start, word_end)
 
     def undo_action(self, event=None):
         try: self.editor_text.edit_undo()
@@ -572,7 +1073,7 @@ class NoteApp(tk.Tk):
         except: pass
         return "break"
 
-    def on_search_type(self, *args):
+    def on_search_type(self):
         self.editor_text.tag_remove("search_hi", "1.0", "end")
         query = self.editor_search_var.get()
         if not query: return
@@ -612,6 +1113,7 @@ class NoteApp(tk.Tk):
             self.auto_save_current()
         except Exception: pass
         
+    @traced()
     def refresh_notes_list(self):
         for w in self.note_scroll.scrollable_frame.winfo_children(): w.destroy()
         notes = self.db.get_notes(self.current_project, self.note_search_var.get())
@@ -625,38 +1127,53 @@ class NoteApp(tk.Tk):
             def load(e, n=nid): self.auto_save_current(); self.load_editor(n)
             for w in [item, f] + f.winfo_children(): w.bind("<Button-1>", load)
 
-    def get_content_snapshot(self):
-        text = self.editor_text.get("1.0", "end-1c")
-        tags_data = []
-        for tag in ["bold", "italic", "heading"]:
-            ranges = self.editor_text.tag_ranges(tag)
-            if ranges:
-                tags_data.append({
-                    "name": tag,
-                    "ranges": [str(r) for r in ranges]
-                })
-        return json.dumps({"text": text, "tags": tags_data})
-
+    @traced()
     def apply_content_snapshot(self, json_str):
         self.editor_text.delete("1.0", "end")
-        try:
-            data = json.loads(json_str)
-            self.editor_text.insert("1.0", data.get("text", ""))
-            
-            for tag_info in data.get("tags", []):
-                tag_name = tag_info["name"]
-                ranges = tag_info["ranges"]
-                for i in range(0, len(ranges), 2):
-                    self.editor_text.tag_add(tag_name, ranges[i], ranges[i+1])
-        except (json.JSONDecodeError, TypeError):
-            self.editor_text.insert("1.0", json_str)
+        text, tags = parse_snapshot(json_str)
+        self.editor_text.insert("1.0", text)
+        for tag_name, pairs in tags.items():
+            for start, end in pairs:
+                self.editor_text.tag_add(tag_name, start, end)
 
+    @traced()
     def load_editor(self, nid):
-        self.current_note_id = nid
+        self._show_editor()
+        self.drop_spell_queue()
+        self._leave_note()
+        self.current_note_id = None # Replacing the text is not an edit to journal
         content = self.db.get_note_content(nid)
         self.apply_content_snapshot(content)
+        self.current_note_id = nid
         self.editor_text.edit_reset()
         self.tab_whiteboard.load_board(nid)
+        self.sched.idle("related", self.refresh_related)
+
+    def refresh_related(self):
+        for w in self.related_frame.winfo_children(): w.destroy()
+        related = self.db.related_notes(self.current_note_id) if self.current_note_id else []
+        if not related: return
+        tk.Label(self.related_frame, text="Related", font=("Segoe UI", 9, "bold"), bg=COLORS["bg_sec"], fg=COLORS["accent"], anchor="w").pack(fill="x")
+        for nid, title, score in related:
+            l = tk.Label(self.related_frame, text=f"{title}  ({score:.0%})", font=("Segoe UI", 9), bg=COLORS["bg_sec"],
+                         fg=COLORS["fg_text"], anchor="w", cursor="hand2")
+            l.pack(fill="x")
+            def load(e, n=nid): self.auto_save_current(); self.load_editor(n)
+            l.bind("<Button-1>", load)
+
+    def index_in_background(self):
+        # Title index: rebuilt from one query, then kept current by the database's title listeners.
+        # Similarity index: one batch per task, so journal checkpoints queued on the same
+        # pool aren't held up. Stops once self.index_db changes (restore swaps the database out).
+        db = self.index_db = self.db
+        if self.title_index.set not in db.title_listeners: db.title_listeners.append(self.title_index.set)
+        self.title_index.begin_build()
+        self.checkpoint_pool.submit(lambda: self.title_index.build(db.note_titles()))
+        def step():
+            if self.index_db is db and db.index_pending():
+                try: self.checkpoint_pool.submit(step)
+                except RuntimeError: pass # Pool shut down on exit
+        self.checkpoint_pool.submit(step)
 
     def create_new_note(self):
         self.auto_save_current()
@@ -664,20 +1181,85 @@ class NoteApp(tk.Tk):
         self.refresh_notes_list()
         self.load_editor(nid)
 
+    @traced()
     def auto_save_current(self):
+        # Edits are already journaled op by op; saving flushes them and refreshes
+        # the title, so it costs O(edit) rather than a full snapshot rewrite.
         if self.current_note_id:
-            content = self.get_content_snapshot()
-            self.db.update_note(self.current_note_id, content)
-            self.refresh_notes_list()
+            nid = self.current_note_id
+            self.flush_journal()
+            if self.note_dirty:
+                self.note_dirty = False
+                self.db.touch_note(nid, self.editor_text.get("1.0", "1.0 lineend")[:30].strip() or "Untitled",
+                                   self.editor_text.get("1.0", "end-1c"))
+                self.refresh_notes_list()
+                if self.journal_counts.get(nid, 0) >= JOURNAL_CHECKPOINT_OPS: self.checkpoint_in_background(nid)
             self.tab_whiteboard.save_current_page()
 
+    # --- Edit journal ---
+    def on_editor_op(self, op):
+        if not self.current_note_id: return
+        self.journal_pending.append((self.current_note_id, op))
+        self.note_dirty = True
+        self.sched.throttle("journal", JOURNAL_FLUSH_MS, self.flush_journal)
+
+    def flush_journal(self):
+        self.sched.cancel("journal")
+        if not self.journal_pending: return
+        self.db.append_journal(self.journal_pending)
+        for nid, _ in self.journal_pending:
+            self.journal_counts[nid] = self.journal_counts.get(nid, 0) + 1
+        self.journal_pending.clear()
+
+    def _leave_note(self):
+        # Called before the editor switches notes: fold the old note's journal in off the Tk thread
+        if self.note_dirty: self.auto_save_current()
+        self.flush_journal()
+        if self.journal_counts.get(self.current_note_id): self.checkpoint_in_background(self.current_note_id)
+
+    def checkpoint_in_background(self, nid):
+        self.journal_counts.pop(nid, None)
+        self.checkpoint_pool.submit(self.db.checkpoint_journal, [nid])
+
+    def _settle_journal(self):
+        # Before rewriting a whole notebook: save the editor and let background checkpoints finish
+        if hasattr(self, 'editor_text'): self.auto_save_current()
+        self.checkpoint_pool.submit(lambda: None).result()
+        self.journal_counts.clear()
+
+    # --- Quick switcher ---
+    def open_quick_switcher(self):
+        if self.app_locked: return
+        if not self.title_index.ready: return show_msg(self, "Busy", "Still indexing note titles, try again in a moment.")
+        if hasattr(self, 'editor_text'): self.auto_save_current()
+        names = self.db.get_project_names()
+        hidden = self.db.locked_project_ids() # Titles in locked notebooks stay hidden until unlocked
+        def search(query):
+            return [((nid, pid), f"{title}   —   {names.get(pid, '')}") for nid, pid, title in self.title_index.search(query, hidden=hidden)]
+        QuickSwitcher(self, search, lambda key: self.goto_note(*key))
+
+    def goto_note(self, nid, pid):
+        if not self.db.get_note(nid): return show_msg(self, "Error", "That note no longer exists.", True)
+        if self.current_project != pid or not self.detail_view or not self.detail_view.winfo_ismapped():
+            row = self.db.get_project_by_id(pid)
+            if not row: return
+            self.open_project_detail(pid, row[0])
+        self.auto_save_current()
+        self.load_editor(nid)
+        self.notebook_tabs.select(0)
+
     def delete_current_note(self):
         if self.current_note_id and ask_yes_no(self, "Delete", "Delete this note?"):
+            nid = self.current_note_id
+            self.journal_pending = [e for e in self.journal_pending if e[0] != nid]
+            self.journal_counts.pop(nid, None)
+            self.note_dirty = False
             self.db.delete_note(self.current_note_id)
             self.current_note_id = None
             self.editor_toolbar.pack_forget()
             self.editor_text.pack_forget()
             self.refresh_notes_list()
+            self.refresh_related()
 
     def open_export_dialog(self):
         d = tk.Toplevel(self)
@@ -712,113 +1294,196 @@ class NoteApp(tk.Tk):
 
     def generate_pdf_export(self, mode):
         if not HAS_PDF: return show_msg(self, "Error", "Install 'reportlab' first.", True)
+        if getattr(self, "export_proc", None) and self.export_proc.is_alive():
+            return show_msg(self, "Busy", "An export is already running.")
+
+        if mode.startswith("current"):
+            if not self.current_note_id: return show_msg(self, "Error", "No note selected!")
+            # Save editor and whiteboard so the worker reads what is on screen
+            self.auto_save_current()
+            note_ids = [self.current_note_id]
+        else:
+            # Snapshot the IDs now; edits made during the export don't change the set
+            note_ids = [row[0] for row in self.db.get_notes(self.current_project)]
+            if not note_ids: return show_msg(self, "Info", "Notebook is empty.")
+
         path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF", "*.pdf")])
         if not path: return
-        
+
+        self.export_queue = multiprocessing.Queue()
+        self.export_cancel = multiprocessing.Event()
+        self.export_proc = multiprocessing.Process(
+            target=export_worker, daemon=True,
+            args=(self.db.db_path, note_ids, path, mode != "current_text", mode == "notebook_full",
+                  self.export_queue, self.export_cancel, dict(self.db.keys)))
+        self.export_proc.start()
+        self.export_out = path
+        self.export_grace = 5
+        self.export_dialog = ProgressDialog(self, "Export PDF", f"Exporting {len(note_ids)} note(s)...",
+                                            on_cancel=self.cancel_pdf_export)
+        self.after(100, self._poll_pdf_export)
+
+    def cancel_pdf_export(self):
+        self.export_cancel.set()
+        # The final layout pass can't be interrupted cooperatively
+        proc, part = self.export_proc, self.export_out + ".part"
+        def remove_part():
+            # The file stays open until the process has actually gone
+            if proc.is_alive(): return self.after(100, remove_part)
+            try: os.remove(part)
+            except OSError: pass
+        def force_stop():
+            if not proc.is_alive(): return
+            proc.terminate()
+            remove_part()
+        self.after(3000, force_stop)
+
+    def _poll_pdf_export(self):
+        finished = None
         try:
-            doc = SimpleDocTemplate(path, pagesize=letter)
-            styles = getSampleStyleSheet()
-            story = []
-            
-            # --- HELPER: Adds text content from a raw string (JSON or Plain) ---
-            def add_note_text_to_story(raw_content, title_prefix=""):
-                # Parse JSON if needed
-                try:
-                    data = json.loads(raw_content)
-                    text = data.get("text", "")
-                except:
-                    text = raw_content
-                
-                if title_prefix:
-                    story.append(Paragraph(title_prefix, styles['Heading1']))
-                    story.append(Spacer(1, 12))
-
-                for line in text.split('\n'):
-                    if line.strip():
-                        # Simple styling for now (preserved headings logic could go here)
-                        story.append(Paragraph(line, styles['BodyText']))
-                        story.append(Spacer(1, 6))
-            
-            # --- HELPER: Adds Images ---
-            def add_images_to_story(note_id):
-                app_data_path = os.path.dirname(self.db.db_path)
-                pattern = os.path.join(app_data_path, f"wb_{note_id}_*.png")
-                paths = sorted(glob.glob(pattern))
-                
-                if paths:
-                    story.append(Spacer(1, 10))
-                    story.append(Paragraph("Sketches:", styles['Heading3']))
-                    for p in paths:
-                        try:
-                            story.append(PDFImage(p, width=400, height=300))
-                            story.append(Spacer(1, 10))
-                        except: pass
-
-            # --- EXPORT LOGIC ---
-            if mode.startswith("current"):
-                if not self.current_note_id: return show_msg(self, "Error", "No note selected!")
-                # For current note, we trust the editor's visible text
-                raw_text = self.editor_text.get("1.0", "end-1c")
-                add_note_text_to_story(raw_text) # It's already plain text from .get()
-                
-                if mode == "current_full":
-                    # Save current state first
-                    self.tab_whiteboard.save_current_page()
-                    add_images_to_story(self.current_note_id)
-
-            elif mode == "notebook_full":
-                # Fetch ALL notes from DB
-                notes = self.db.get_all_notes_content(self.current_project)
-                if not notes: return show_msg(self, "Info", "Notebook is empty.")
-                
-                for nid, title, content in notes:
-                    add_note_text_to_story(content, title_prefix=title)
-                    add_images_to_story(nid)
-                    story.append(PageBreak())
-
-            doc.build(story)
+            while finished is None:
+                msg = self.export_queue.get_nowait()
+                if msg[0] == "progress":
+                    done, total = msg[1], msg[2]
+                    text = "Writing PDF..." if done == total else f"Exported {done} of {total} notes..."
+                    if not self.export_cancel.is_set(): self.export_dialog.set_progress(done, total, text)
+                else:
+                    finished = msg
+        except queue.Empty:
+            if self.export_proc.is_alive():
+                return self.after(100, self._poll_pdf_export)
+            # The last message can still be in the pipe just after the worker exits
+            if self.export_grace > 0:
+                self.export_grace -= 1
+                return self.after(100, self._poll_pdf_export)
+            finished = ("cancelled",) if self.export_cancel.is_set() else ("error", "Export process stopped unexpectedly.")
+        # The worker has sent its last message; reap it without waiting on the Tk thread
+        self.export_proc.join(timeout=0)
+        if self.export_dialog.winfo_exists(): self.export_dialog.destroy()
+        if finished[0] == "done":
             show_msg(self, "Success", "PDF Exported Successfully!")
-        except Exception as e:
-            show_msg(self, "Error", str(e), True)
+        elif finished[0] == "error":
+            show_msg(self, "Error", finished[1], True)
+
+    def pick_task_due(self):
+        def chosen(iso):
+            self.pending_due = iso
+            self.btn_due.config(text=datetime.strptime(iso, "%Y-%m-%d").strftime("%d %b"), width=7)
+        CalendarDialog(self, chosen)
 
     def add_task(self):
         t = self.e_task.get().strip()
         if t: 
-            self.db.add_todo(self.current_project, t, "") # No date
+            self.db.add_todo(self.current_project, t, self.pending_due)
             self.e_task.delete(0, "end")
+            self.pending_due = None
+            self.btn_due.config(text="📅", width=3)
             self.refresh_todo_list()
 
+    @traced()
     def refresh_todo_list(self):
         for w in self.todo_scroll.scrollable_frame.winfo_children(): w.destroy()
         todos = self.db.get_todos(self.current_project)
-        for tid, pid, task, date, is_done, _ in todos:
-            row = tk.Frame(self.todo_scroll.scrollable_frame, bg=COLORS["white"], pady=2)
-            row.pack(fill="x", pady=2)
-            var = tk.BooleanVar(value=bool(is_done))
-            def toggle(t=tid, v=var): self.db.toggle_todo(t, v.get()); self.refresh_todo_list()
-            tk.Checkbutton(row, variable=var, command=lambda: toggle(tid, var), bg=COLORS["white"], activebackground=COLORS["white"]).pack(side="left")
-            fg_col = "#aaa" if is_done else COLORS["fg_text"]
-            tk.Label(row, text=task, bg=COLORS["white"], fg=fg_col, wraplength=140, justify="left", anchor="w").pack(side="left", fill="x", expand=True)
-            btn_del = tk.Label(row, text="✕", fg="#aaa", bg=COLORS["white"], cursor="hand2")
-            btn_del.pack(side="right", padx=5)
-            btn_del.bind("<Button-1>", lambda e, t=tid: self.delete_task(t))
-
-    def delete_task(self, tid):
-        self.db.delete_todo(tid)
-        self.refresh_todo_list()
+        for tid, pid, task, due, is_done, _ in todos:
+            self.create_todo_row(self.todo_scroll.scrollable_frame, tid, task, due, is_done)
+
+    def create_todo_row(self, parent, tid, task, due, is_done, subtitle=None, wraplength=140):
+        # Toggling or deleting touches only this row; the list is not rebuilt
+        row = tk.Frame(parent, bg=COLORS["white"], pady=2)
+        row.pack(fill="x", pady=2)
+        var = tk.BooleanVar(value=bool(is_done))
+        text = f"{task}\n{subtitle}" if subtitle else task
+        lbl = tk.Label(row, text=text, bg=COLORS["white"], wraplength=wraplength, justify="left", anchor="w")
+        lbl_due = tk.Label(row, bg=COLORS["white"], font=("Segoe UI", 8))
+
+        def paint():
+            done = var.get()
+            lbl.config(fg="#aaa" if done else COLORS["fg_text"])
+            d = parse_due(due)
+            if d:
+                overdue = not done and d < datetime.now().date()
+                lbl_due.config(text=d.strftime("%d %b"), fg=COLORS["error"] if overdue else "#888")
+
+        def toggle():
+            self.db.toggle_todo(tid, var.get())
+            paint()
+
+        def delete(e):
+            self.db.delete_todo(tid)
+            row.destroy()
+
+        tk.Checkbutton(row, variable=var, command=toggle, bg=COLORS["white"], activebackground=COLORS["white"]).pack(side="left")
+        btn_del = tk.Label(row, text="✕", fg="#aaa", bg=COLORS["white"], cursor="hand2")
+        btn_del.pack(side="right", padx=5)
+        btn_del.bind("<Button-1>", delete)
+        if parse_due(due): lbl_due.pack(side="right")
+        lbl.pack(side="left", fill="x", expand=True)
+        paint()
+
+    def open_agenda(self):
+        d = tk.Toplevel(self)
+        d.title("Agenda")
+        d.geometry("420x520")
+        try: d.iconbitmap("icon.ico")
+        except: pass
+        d.configure(bg=COLORS["bg_main"])
+        scroll = ScrollableFrame(d, bg_color=COLORS["bg_main"])
+        scroll.pack(fill="both", expand=True, padx=10, pady=10)
+
+        today = datetime.now().date()
+        week_end = today + timedelta(days=6 - today.weekday())
+        sections = {"Overdue": [], "Today": [], "This Week": []}
+        for tid, pid, project, task, due in self.db.get_agenda(week_end.isoformat()):
+            d_due = parse_due(due)
+            if not d_due: continue
+            key = "Overdue" if d_due < today else "Today" if d_due == today else "This Week"
+            sections[key].append((tid, project, task, due))
+
+        if not any(sections.values()):
+            ttk.Label(scroll.scrollable_frame, text="Nothing due this week.", padding=20).pack()
+        for title, items in sections.items():
+            if not items: continue
+            fg = COLORS["error"] if title == "Overdue" else COLORS["accent"]
+            tk.Label(scroll.scrollable_frame, text=title, font=("Segoe UI", 11, "bold"), bg=COLORS["bg_main"], fg=fg).pack(anchor="w", pady=(10, 2))
+            for tid, project, task, due in items:
+                self.create_todo_row(scroll.scrollable_frame, tid, task, due, 0, subtitle=project, wraplength=300)
 
     def set_password_dialog(self): 
         p = ask_string(self, "Set", "Password:", show="*")
-        if p: self.db.set_project_password(self.current_project, p); show_msg(self, "Done", "Locked.")
+        if not p: return
+        self.db.set_project_password(self.current_project, p)
+        if HAS_CRYPTO and ask_yes_no(self, "Encrypt", "Also encrypt this notebook's notes?\nThey can't be recovered without the password."):
+            self._settle_journal()
+            self.db.encrypt_project(self.current_project, p)
+        show_msg(self, "Done", "Locked."); self._refresh_lock_tools()
         
     def change_password_dialog(self):
         p = ask_string(self, "Change", "New Password:", show="*")
         if p: self.db.set_project_password(self.current_project, p)
 
+    def encrypt_project_dialog(self):
+        p = ask_string(self, "Encrypt", "Notebook password:", show="*")
+        if p is None: return
+        self._settle_journal()
+        try:
+            if not self.db.encrypt_project(self.current_project, p): return show_msg(self, "Error", "Incorrect password.", True)
+        except RuntimeError as e: return show_msg(self, "Error", str(e), True)
+        ExportCache(os.path.dirname(self.db.db_path)).clear_markup()
+        show_msg(self, "Done", "Notes encrypted.")
+        self._refresh_lock_tools()
+
+    def decrypt_project_dialog(self):
+        if not ask_yes_no(self, "Decrypt", "Store this notebook's notes unencrypted? The password lock stays."): return
+        self._settle_journal()
+        self.db.decrypt_project(self.current_project)
+        show_msg(self, "Done", "Notes decrypted.")
+        self._refresh_lock_tools()
+
     def open_new_project_dialog(self):
         p = ask_string(self, "New", "Name:")
         if p: self.db.add_project(p, ""); self.refresh_project_list()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Required for worker processes in the frozen Windows build
     app = NoteApp()
     app.mainloop()
\ No newline at end of file
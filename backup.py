@@ -0,0 +1,278 @@
+# backup.py
+# Backup helpers that don't depend on tkinter, shared by the app and scripts.
+import os
+import re
+import glob
+import json
+import zlib
+import shutil
+import sqlite3
+import hashlib
+import zipfile
+import tempfile
+from datetime import datetime
+
+CHUNK_SIZE = 1 << 20 # 1 MiB; a multiple of the SQLite page size so in-place page writes stay aligned
+BACKUP_PAGES = 256 # Pages copied per step of the online backup
+COMPRESSION_LEVELS = {"Store (fastest)": None, "Fast": 1, "Default": 6, "Maximum": 9}
+DATA_FILE_RE = re.compile(r"^(noteapp\.db(-wal|-shm|-journal)?|wb_\d+_\d+\.png)$")
+STAGING_DIR = "restore_staging"
+ROLLBACK_DIR = "restore_rollback"
+
+def app_files(db_path):
+    """Map archive names to the files that make up the app's data set."""
+    app_dir = os.path.dirname(db_path)
+    files = {"noteapp.db": db_path}
+    for img in glob.glob(os.path.join(app_dir, "wb_*.png")):
+        files[os.path.basename(img)] = img
+    return files
+
+def data_files(folder):
+    """Names of the files in folder that belong to the data set (db, journals, pages)."""
+    if not os.path.isdir(folder): return []
+    return [n for n in os.listdir(folder) if DATA_FILE_RE.match(n)]
+
+def snapshot_database(db_path, dest_path, pages=BACKUP_PAGES, progress=None):
+    """Copy a live database to dest_path with the SQLite online backup API.
+    Works in steps of `pages` so writers on other connections are never blocked
+    for long, and the copy is always a consistent point-in-time image."""
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(dest_path)
+    try:
+        src.backup(dst, pages=pages, sleep=0.005,
+                   progress=(lambda status, remaining, total: progress(total - remaining, total)) if progress else None)
+    finally:
+        dst.close()
+        src.close()
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""): h.update(block)
+    return h.hexdigest()
+
+def export_zip(db_path, out_path, level=6, progress=None, cancelled=None):
+    """Write a full backup archive. The database is copied with snapshot_database
+    and deflated at `level` (stored when None); whiteboard PNGs are stored, as
+    they are compressed already. Every entry is streamed by ZipFile.write, so
+    memory use doesn't depend on file sizes. A manifest.json with SHA-256 sums
+    is written last so restores can verify every entry. Returns False if cancelled."""
+    tmp_dir = tempfile.mkdtemp(prefix="note_backup_", dir=os.path.dirname(os.path.abspath(out_path)))
+    part_path = out_path + ".part"
+    try:
+        db_copy = os.path.join(tmp_dir, "noteapp.db")
+        snapshot_database(db_path, db_copy,
+                          progress=(lambda done, total: progress(0, 1, f"Copying database ({done}/{total} pages)...")) if progress else None)
+        files = app_files(db_path)
+        files["noteapp.db"] = db_copy
+        names = sorted(files)
+        manifest = {}
+
+        with zipfile.ZipFile(part_path, "w") as zf:
+            for done, name in enumerate(names, 1):
+                if cancelled and cancelled(): return False
+                path = files[name]
+                if name == "noteapp.db" and level is not None:
+                    zf.write(path, name, compress_type=zipfile.ZIP_DEFLATED, compresslevel=level)
+                else:
+                    zf.write(path, name, compress_type=zipfile.ZIP_STORED)
+                manifest[name] = {"size": os.path.getsize(path), "sha256": _sha256(path)}
+                if progress: progress(done, len(names), f"Packed {done} of {len(names)} files...")
+            zf.writestr("manifest.json", json.dumps({"version": 1, "files": manifest}))
+        os.replace(part_path, out_path)
+        return True
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if os.path.exists(part_path): os.remove(part_path)
+
+def stage_zip(zip_path, staging_dir, progress=None, cancelled=None):
+    """Stream a backup archive into staging_dir. Each entry is copied in blocks and
+    checked against its CRC and, when the archive has one, manifest.json's SHA-256.
+    Entries that aren't data files (or try to escape the folder) are skipped.
+    Returns False if cancelled."""
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        manifest = {}
+        if "manifest.json" in zf.namelist():
+            manifest = json.loads(zf.read("manifest.json")).get("files", {})
+        entries = [i for i in zf.infolist() if DATA_FILE_RE.match(i.filename)]
+        if not any(i.filename == "noteapp.db" for i in entries):
+            raise ValueError("This archive doesn't contain a Note database.")
+        for n, info in enumerate(entries):
+            if cancelled and cancelled(): return False
+            digest = hashlib.sha256()
+            with zf.open(info) as src, open(os.path.join(staging_dir, info.filename), "wb") as dst:
+                while True:
+                    block = src.read(CHUNK_SIZE) # ZipExtFile raises BadZipFile on a CRC mismatch
+                    if not block: break
+                    digest.update(block)
+                    dst.write(block)
+            expected = manifest.get(info.filename, {}).get("sha256")
+            if expected and digest.hexdigest() != expected:
+                raise ValueError(f"Checksum mismatch for {info.filename}; the archive is damaged.")
+            if progress: progress(n + 1, len(entries), f"Extracted {n + 1} of {len(entries)} files...")
+    return True
+
+def verify_database(db_path):
+    """Raise ValueError unless db_path is an intact Note database."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            raise ValueError(f"Database integrity check failed: {result}")
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not {"projects", "notes", "todos"} <= tables:
+            raise ValueError("The backup database is missing required tables.")
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"The backup database can't be opened: {e}")
+    finally:
+        conn.close()
+
+def swap_in(staging_dir, app_dir, keep_dir):
+    """Replace the data files in app_dir with those in staging_dir. The current files
+    are moved into keep_dir (emptied first). Everything is a rename on the same disk,
+    and if any step fails the moves done so far are undone before re-raising."""
+    shutil.rmtree(keep_dir, ignore_errors=True)
+    os.makedirs(keep_dir)
+    moved_out, moved_in = [], []
+    try:
+        for name in data_files(app_dir):
+            os.replace(os.path.join(app_dir, name), os.path.join(keep_dir, name))
+            moved_out.append(name)
+        for name in data_files(staging_dir):
+            os.replace(os.path.join(staging_dir, name), os.path.join(app_dir, name))
+            moved_in.append(name)
+    except Exception:
+        for name in moved_in:
+            os.replace(os.path.join(app_dir, name), os.path.join(staging_dir, name))
+        for name in moved_out:
+            os.replace(os.path.join(keep_dir, name), os.path.join(app_dir, name))
+        raise
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+class BackupStore:
+    # Content-addressed store on disk:
+    #   <root>/chunks/<2 hex>/<sha256>  - file chunks, zlib'd when that helps
+    #   <root>/snapshots/<id>.json      - manifest: name -> size, mtime, chunk hashes
+    # A new snapshot only writes chunks the store doesn't already have.
+    def __init__(self, root):
+        self.root = root
+        self.chunk_dir = os.path.join(root, "chunks")
+        self.snap_dir = os.path.join(root, "snapshots")
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        os.makedirs(self.snap_dir, exist_ok=True)
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def _put_chunk(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path): return digest, 0
+        packed = zlib.compress(data, 1)
+        payload = b"z" + packed if len(packed) < len(data) else b"r" + data
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f: f.write(payload)
+        os.replace(tmp, path)
+        return digest, len(payload)
+
+    def _get_chunk(self, digest):
+        with open(self._chunk_path(digest), "rb") as f:
+            payload = f.read()
+        data = zlib.decompress(payload[1:]) if payload[:1] == b"z" else payload[1:]
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Backup chunk {digest[:12]} is corrupted")
+        return data
+
+    def _load_manifest(self, snap_id):
+        with open(os.path.join(self.snap_dir, f"{snap_id}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def create_snapshot(self, files, progress=None, cancelled=None):
+        """Store files ({name: path}) as a new snapshot. Files whose size and mtime
+        match the previous snapshot reuse its chunk list without being re-read.
+        Returns (snapshot_id, bytes_written)."""
+        snaps = self.list_snapshots()
+        previous = self._load_manifest(snaps[0]["id"])["files"] if snaps else {}
+        manifest = {}
+        written = 0
+        for i, (name, path) in enumerate(sorted(files.items())):
+            if cancelled and cancelled(): return None, written
+            st = os.stat(path)
+            prev = previous.get(name)
+            if prev and prev["size"] == st.st_size and prev["mtime"] == st.st_mtime_ns:
+                manifest[name] = prev
+            else:
+                chunks = []
+                with open(path, "rb") as f:
+                    while True:
+                        data = f.read(CHUNK_SIZE)
+                        if not data: break
+                        digest, n = self._put_chunk(data)
+                        chunks.append(digest)
+                        written += n
+                manifest[name] = {"size": st.st_size, "mtime": st.st_mtime_ns, "chunks": chunks}
+            if progress: progress(i + 1, len(files))
+
+        snap_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        suffix = 1
+        while os.path.exists(os.path.join(self.snap_dir, f"{snap_id}.json")):
+            suffix += 1
+            snap_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        data = {"id": snap_id, "created": datetime.now().strftime("%Y-%m-%d %H:%M"), "files": manifest}
+        path = os.path.join(self.snap_dir, f"{snap_id}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f: json.dump(data, f)
+        os.replace(path + ".tmp", path)
+        return snap_id, written
+
+    def snapshot_app(self, db_path, progress=None, cancelled=None):
+        """create_snapshot() of the app's data set. The database is chunked from an
+        online-backup copy: the live file lags its WAL and may be mid-write."""
+        with tempfile.TemporaryDirectory() as tmp:
+            files = app_files(db_path)
+            files["noteapp.db"] = os.path.join(tmp, "noteapp.db")
+            snapshot_database(db_path, files["noteapp.db"])
+            return self.create_snapshot(files, progress, cancelled)
+
+    def list_snapshots(self):
+        """Newest first: [{"id", "created", "files", "size"}, ...]"""
+        snaps = []
+        for path in glob.glob(os.path.join(self.snap_dir, "*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f: data = json.load(f)
+            except (OSError, ValueError): continue
+            files = data.get("files", {})
+            snaps.append({"id": data["id"], "created": data.get("created", ""), "files": len(files),
+                          "size": sum(e["size"] for e in files.values())})
+        return sorted(snaps, key=lambda s: s["id"], reverse=True)
+
+    def restore_snapshot(self, snap_id, dest_dir, progress=None, cancelled=None):
+        """Write every file of a snapshot into dest_dir; chunks are verified as they are read.
+        Returns False if cancelled."""
+        manifest = self._load_manifest(snap_id)["files"]
+        os.makedirs(dest_dir, exist_ok=True)
+        for i, (name, entry) in enumerate(manifest.items()):
+            if cancelled and cancelled(): return False
+            if not DATA_FILE_RE.match(name): continue
+            with open(os.path.join(dest_dir, name), "wb") as f:
+                for digest in entry["chunks"]:
+                    f.write(self._get_chunk(digest))
+            if progress: progress(i + 1, len(manifest), f"Restored {i + 1} of {len(manifest)} files...")
+        return True
+
+    def prune(self, keep=10):
+        """Drop all but the newest `keep` snapshots and delete chunks no snapshot uses.
+        Returns (snapshots_removed, chunks_removed)."""
+        snaps = self.list_snapshots()
+        for s in snaps[keep:]:
+            os.remove(os.path.join(self.snap_dir, f"{s['id']}.json"))
+        live = set()
+        for s in snaps[:keep]:
+            for entry in self._load_manifest(s["id"])["files"].values():
+                live.update(entry["chunks"])
+        removed = 0
+        for path in glob.glob(os.path.join(self.chunk_dir, "*", "*")):
+            if os.path.basename(path) not in live:
+                os.remove(path)
+                removed += 1
+        return len(snaps[keep:]), removed
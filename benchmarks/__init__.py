@@ -0,0 +1,2 @@
+# benchmarks
+# Headless performance suite: `python -m benchmarks.run --scale small`
@@ -0,0 +1,127 @@
+# benchmarks/run.py
+# Times the core operations against a synthetic data set and writes the results as JSON.
+#   python -m benchmarks.run --scale tiny --out results.json [--compare baseline.json]
+import os
+import sys
+import json
+import glob
+import random
+import sqlite3
+import argparse
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from database import DatabaseManager, plain_text_title
+from snapshot import parse_snapshot, serialize_snapshot
+from benchmarks import synth
+
+def measure(fn, repeat=5, number=1):
+    """Run fn `number` times per sample; returns per-call timings in ms."""
+    fn() # Warm-up: page cache, imports, statement cache
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number): fn()
+        samples.append((time.perf_counter() - start) * 1000 / number)
+    return {"min_ms": min(samples), "median_ms": statistics.median(samples), "mean_ms": statistics.fmean(samples),
+            "repeat": repeat, "number": number}
+
+def run_suite(folder, repeat=5):
+    db = DatabaseManager(os.path.join(folder, "noteapp.db"))
+    rng = random.Random(99)
+    project_count = db.conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+    pids = [rng.randint(1, project_count) for _ in range(20)]
+    results = {}
+
+    results["get_projects"] = measure(lambda: db.get_projects(), repeat)
+    results["get_projects_search"] = measure(lambda: db.get_projects("design"), repeat)
+    results["get_project_page_first"] = measure(lambda: db.get_project_page(), repeat)
+    def deep_page():
+        # Walk ten pages with the keyset cursor, as scrolling the landing list does
+        after = None
+        for _ in range(10):
+            page = db.get_project_page(after=after)
+            if not page: break
+            after = (page[-1][7], page[-1][0])
+    results["get_project_page_x10"] = measure(deep_page, repeat)
+    results["get_agenda_week"] = measure(lambda: db.get_agenda("2024-01-07"), repeat)
+    results["get_notes"] = measure(lambda: [db.get_notes(p) for p in pids], repeat)
+    results["get_notes_search"] = measure(lambda: [db.get_notes(p, "budget") for p in pids], repeat)
+
+    # Heaviest formatted note in the set drives the snapshot benchmarks
+    contents = [db.get_note_content(nid) for (nid,) in db.conn.execute("SELECT id FROM notes ORDER BY id LIMIT 2000")]
+    heavy = max(contents, key=len)
+    text, tags = parse_snapshot(heavy)
+    flat = {name: [i for pair in pairs for i in pair] for name, pairs in tags.items()}
+    results["snapshot_apply"] = measure(lambda: parse_snapshot(heavy), repeat, number=200)
+    results["snapshot_serialize"] = measure(lambda: serialize_snapshot(text, flat), repeat, number=200)
+    results["title_extraction_2000"] = measure(lambda: [plain_text_title(c) for c in contents], repeat)
+
+    if synth.HAS_PIL:
+        from PIL import Image
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "wb_1_0.png")
+            def roundtrip():
+                synth.make_page(path, rng)
+                Image.open(path).convert("RGB")
+            results["whiteboard_roundtrip"] = measure(roundtrip, repeat)
+    else:
+        results["whiteboard_roundtrip"] = {"skipped": "Pillow not installed"}
+
+    from pdf_export import HAS_PDF, build_pdf
+    if HAS_PDF:
+        boards = glob.glob(os.path.join(folder, "wb_*_0.png"))
+        nid = int(os.path.basename(boards[0]).split("_")[1]) if boards else 1
+        pid = db.conn.execute("SELECT project_id FROM notes WHERE id = ?", (nid,)).fetchone()[0]
+        note_ids = [row[0] for row in db.get_notes(pid)]
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "bench.pdf")
+            results["pdf_export_notebook"] = measure(lambda: build_pdf(db.db_path, note_ids, out), max(1, repeat // 2))
+    else:
+        results["pdf_export_notebook"] = {"skipped": "reportlab not installed"}
+    db.close()
+    return results
+
+def compare(results, baseline):
+    print(f"{'benchmark':28} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, cur in results.items():
+        old = baseline.get("results", {}).get(name, {})
+        if "median_ms" not in cur or "median_ms" not in old: continue
+        change = (cur["median_ms"] / old["median_ms"] - 1) * 100 if old["median_ms"] else 0.0
+        print(f"{name:28} {old['median_ms']:12.3f} {cur['median_ms']:12.3f} {change:+7.1f}%")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Note app benchmark suite (no display needed).")
+    parser.add_argument("--scale", choices=sorted(synth.SCALES), default="tiny")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "note_bench"),
+                        help="Generated data sets are kept here and reused between runs")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="Write results JSON here (default: bench-<scale>-<time>.json)")
+    parser.add_argument("--compare", help="Print the change against an earlier results file")
+    args = parser.parse_args(argv)
+
+    folder = os.path.join(args.workdir, args.scale)
+    started = time.perf_counter()
+    synth.build(folder, args.scale)
+    print(f"Data set ready in {time.perf_counter() - started:.1f}s: {folder}")
+
+    results = run_suite(folder, args.repeat)
+    report = {"scale": args.scale, "created": datetime.now().isoformat(timespec="seconds"),
+              "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+              "platform": platform.platform(), "results": results}
+    out = args.out or f"bench-{args.scale}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, r in results.items():
+        print(f"{name:28} " + (f"{r['median_ms']:10.3f} ms" if "median_ms" in r else r.get("skipped", "")))
+    print(f"Results written to {out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    sys.exit(main())
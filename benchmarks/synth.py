@@ -0,0 +1,92 @@
+# benchmarks/synth.py
+# Deterministic synthetic data sets for the benchmark suite.
+import os
+import random
+import sqlite3
+from datetime import datetime, timedelta
+from database import DatabaseManager, note_columns
+from snapshot import serialize_snapshot
+
+try:
+    from PIL import Image, ImageDraw
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+# name -> notebooks, notes per notebook, share of heavily formatted notes,
+#         notes with whiteboards, pages per whiteboard
+SCALES = {
+    "tiny":  dict(projects=50,    notes_per_project=40, formatted=0.2, boards=10,  pages=3),
+    "small": dict(projects=1000,  notes_per_project=50, formatted=0.2, boards=50,  pages=5),
+    "large": dict(projects=10000, notes_per_project=50, formatted=0.2, boards=200, pages=8),
+}
+
+WORDS = ("note meeting project idea draft plan review budget design sketch todo research summary "
+         "client launch invoice schedule lecture chapter exam diagram outline question answer").split()
+INSERT_BATCH = 10000
+
+def _sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+def make_note(rng, formatted=False, lines=20):
+    """Return (title, stored_content, plain_text) as the app writes a note row.
+    Formatted notes carry a heading plus many bold/italic runs."""
+    text_lines = [_sentence(rng, rng.randint(4, 14)) for _ in range(lines)]
+    ranges = {}
+    if formatted:
+        ranges["heading"] = ["1.0", f"1.{len(text_lines[0])}"]
+        for tag in ("bold", "italic"):
+            marks = []
+            for ln in range(2, len(text_lines) + 1):
+                line = text_lines[ln - 1]
+                for _ in range(3):
+                    a = rng.randrange(0, max(1, len(line) - 5))
+                    marks += [f"{ln}.{a}", f"{ln}.{a + 4}"]
+            ranges[tag] = marks
+    return note_columns(serialize_snapshot("\n".join(text_lines), ranges))
+
+def make_page(path, rng, size=(800, 600), strokes=60):
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    for _ in range(strokes):
+        pts = [(rng.randrange(size[0]), rng.randrange(size[1])) for _ in range(6)]
+        draw.line(pts, fill=rng.choice(("black", "red", "blue")), width=3, joint="curve")
+    img.save(path)
+
+def build(folder, scale, seed=1234, progress=print):
+    """Create <folder>/noteapp.db for `scale` unless it already exists. Returns the db path."""
+    spec = SCALES[scale]
+    os.makedirs(folder, exist_ok=True)
+    db_path = os.path.join(folder, "noteapp.db")
+    if os.path.exists(db_path): return db_path
+
+    DatabaseManager(db_path).conn.close() # Creates the schema the app uses
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    base = datetime(2024, 1, 1)
+    notes = []
+    note_id = 0
+    for pid in range(1, spec["projects"] + 1):
+        conn.execute("INSERT INTO projects (id, name, description, created_at) VALUES (?, ?, ?, ?)",
+                     (pid, f"{rng.choice(WORDS).title()} {pid}", _sentence(rng, 6), base.strftime("%Y-%m-%d %H:%M")))
+        for _ in range(spec["notes_per_project"]):
+            note_id += 1
+            title, content, text = make_note(rng, rng.random() < spec["formatted"], lines=rng.randint(5, 40))
+            ts = (base + timedelta(minutes=note_id)).strftime("%Y-%m-%d %H:%M")
+            notes.append((note_id, pid, title, content, text, ts))
+            if len(notes) >= INSERT_BATCH:
+                conn.executemany("INSERT INTO notes (id, project_id, title, content, plain_text, timestamp) VALUES (?, ?, ?, ?, ?, ?)", notes)
+                notes.clear()
+                progress(f"  {note_id} notes...")
+        conn.executemany("INSERT INTO todos (project_id, task, due_date, is_done, created_at) VALUES (?, ?, ?, ?, ?)",
+                         [(pid, _sentence(rng, 4), (base + timedelta(days=rng.randint(0, 365))).strftime("%Y-%m-%d"),
+                           rng.random() < 0.5, "2024-01-01") for _ in range(5)])
+    conn.executemany("INSERT INTO notes (id, project_id, title, content, plain_text, timestamp) VALUES (?, ?, ?, ?, ?, ?)", notes)
+    conn.commit()
+    conn.close()
+
+    if HAS_PIL:
+        for nid in rng.sample(range(1, note_id + 1), min(spec["boards"], note_id)):
+            for page in range(spec["pages"]):
+                make_page(os.path.join(folder, f"wb_{nid}_{page}.png"), rng)
+    return db_path
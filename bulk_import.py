@@ -0,0 +1,92 @@
+# bulk_import.py
+# Imports a folder tree of .md/.txt files: every folder that holds files becomes
+# a notebook and every file a note. Parsing runs on a process pool; inserts are
+# batched into large transactions.
+import os
+import json
+import time
+import sqlite3
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from database import note_columns
+from snapshot import markdown_to_snapshot
+
+EXTENSIONS = (".md", ".markdown", ".txt")
+TXN_SIZE = 5000 # Notes per transaction
+PROGRESS_EVERY = 250 # Notes between progress reports and cancel checks
+POOL_THRESHOLD = 200 # Below this many files a pool costs more than it saves
+
+def find_files(root):
+    """Yield (notebook_name, [paths]) for every folder under root that has importable files."""
+    base = os.path.basename(os.path.normpath(root)) or root
+    for folder, dirs, files in os.walk(root):
+        dirs.sort()
+        paths = [os.path.join(folder, f) for f in sorted(files) if f.lower().endswith(EXTENSIONS)]
+        if not paths: continue
+        rel = os.path.relpath(folder, root)
+        name = base if rel == "." else f"{base} / {rel.replace(os.sep, ' / ')}"
+        yield name, paths
+
+def parse_file(path):
+    """Process-pool worker: returns (title, stored_content, plain_text, timestamp, size).
+    Compression of large notes happens here too, off the inserting process."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        source = f.read()
+    if path.lower().endswith(".txt"):
+        content = json.dumps({"text": source.replace("\r\n", "\n"), "tags": []})
+    else:
+        content = markdown_to_snapshot(source)
+    ts = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M")
+    return (*note_columns(content), ts, len(source.encode("utf-8")))
+
+def import_folder(db_path, root, progress=None, cancelled=None, workers=None):
+    """Import root into the database at db_path. Returns a stats dict with
+    notebooks, notes, bytes, seconds and notes_per_sec, or None if cancelled
+    (notes committed before the cancel are kept)."""
+    started = time.perf_counter()
+    groups = list(find_files(root))
+    total = sum(len(paths) for _, paths in groups)
+    stats = {"notebooks": 0, "notes": 0, "bytes": 0}
+    if not total:
+        return dict(stats, seconds=0.0, notes_per_sec=0.0)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    pool = ProcessPoolExecutor(max_workers=workers) if total >= POOL_THRESHOLD else None
+    batch = []
+
+    def flush():
+        conn.executemany("INSERT INTO notes (project_id, title, content, plain_text, timestamp) VALUES (?, ?, ?, ?, ?)", batch)
+        conn.commit()
+        batch.clear()
+
+    # One map over every file keeps the pool busy even when folders are small;
+    # results come back in order, so each notebook is created on its first note.
+    items = [(gi, path) for gi, (_, paths) in enumerate(groups) for path in paths]
+    pids = {}
+    try:
+        paths = [path for _, path in items]
+        results = pool.map(parse_file, paths, chunksize=64) if pool else map(parse_file, paths)
+        for (gi, path), (title, content, text, ts, size) in zip(items, results):
+            if gi not in pids:
+                cur = conn.execute("INSERT INTO projects (name, description, created_at) VALUES (?, ?, ?)",
+                                   (groups[gi][0], f"Imported from {os.path.dirname(path)}", datetime.now().strftime("%Y-%m-%d %H:%M")))
+                pids[gi] = cur.lastrowid
+                stats["notebooks"] += 1
+            batch.append((pids[gi], title, content, text, ts))
+            stats["notes"] += 1
+            stats["bytes"] += size
+            if len(batch) >= TXN_SIZE: flush()
+            if stats["notes"] % PROGRESS_EVERY == 0:
+                if progress: progress(stats["notes"], total, f"Imported {stats['notes']} of {total} files...")
+                if cancelled and cancelled(): return None # The open batch and its new notebooks are rolled back
+        flush()
+    finally:
+        if conn.in_transaction: conn.rollback() # Only reached on errors; completed batches stay
+        conn.close()
+        if pool: pool.shutdown(cancel_futures=True)
+
+    seconds = time.perf_counter() - started
+    stats["seconds"] = seconds
+    stats["notes_per_sec"] = stats["notes"] / seconds if seconds else 0.0
+    return stats
@@ -0,0 +1,163 @@
+# cli.py
+# Headless entry point for scripts and scheduled jobs. Never imports tkinter;
+# reportlab is only loaded by export-pdf, so other commands start quickly.
+#   python cli.py list | search QUERY | export-pdf OUT_DIR | backup OUT | stats | usage | gc
+import os
+import re
+import sys
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from database import DatabaseManager
+
+def _open_db(args):
+    if args.db and not os.path.exists(args.db):
+        sys.exit(f"No database at {args.db}")
+    return DatabaseManager(args.db)
+
+def _iter_projects(db, search=""):
+    after = None
+    while True:
+        page = db.get_project_page(search, after, 500)
+        yield from page
+        if len(page) < 500: return
+        after = (page[-1][7], page[-1][0])
+
+def _snippet(text, query, width=70):
+    pos = (text or "").lower().find(query.lower())
+    if pos < 0: return ""
+    start = max(0, pos - width // 3)
+    if start: start = text.rfind(" ", 0, start) + 1 # Don't open mid-word
+    return " ".join(text[start:start + width].split())
+
+def cmd_list(db, args):
+    for pid, name, desc, created, locked, notes, todos, activity in _iter_projects(db, args.search):
+        print(f"{pid:>6}  {name[:40]:40}  {notes:>5} notes  {todos:>4} open  {activity or ''}{'  [locked]' if locked else ''}")
+
+def cmd_search(db, args):
+    # Locked notebooks stay private to the app
+    hits = db.search_all_notes(args.query, args.limit, include_locked=False)
+    for nid, pid, notebook, title, ts, locked, text in hits:
+        print(f"{nid:>6}  [{notebook}] {title}  ({ts})")
+        snippet = _snippet(text, args.query)
+        if snippet: print(f"        {snippet}")
+    return 0 if hits else 1 # grep-style: non-zero when nothing matched
+
+def _export_one(db_path, note_ids, out_path, with_images):
+    # Process-pool worker: one notebook per task
+    from pdf_export import build_pdf
+    build_pdf(db_path, note_ids, out_path, with_images=with_images)
+    return out_path
+
+def cmd_export_pdf(db, args):
+    from pdf_export import HAS_PDF
+    if not HAS_PDF: sys.exit("Install 'reportlab' first.")
+    os.makedirs(args.out_dir, exist_ok=True)
+    wanted = set(args.notebook or [])
+    jobs = []
+    for pid, name, _, _, locked, notes, _, _ in _iter_projects(db):
+        if wanted and pid not in wanted: continue
+        if locked:
+            print(f"Skipping locked notebook {pid} ({name})", file=sys.stderr)
+            continue
+        note_ids = [row[0] for row in db.get_notes(pid)]
+        if not note_ids: continue
+        safe = re.sub(r"[^\w\- ]+", "_", name).strip() or "notebook"
+        jobs.append((note_ids, os.path.join(args.out_dir, f"{pid}-{safe}.pdf")))
+    if not jobs: sys.exit("Nothing to export.")
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(_export_one, db.db_path, ids, path, not args.no_images): path for ids, path in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try: print(f"[{done}/{len(jobs)}] {future.result()}")
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(jobs)}] {futures[future]} failed: {e}", file=sys.stderr)
+    return 1 if failed else 0
+
+def cmd_backup(db, args):
+    from backup import export_zip, BackupStore
+    if args.incremental:
+        snap_id, written = BackupStore(args.out).snapshot_app(db.db_path)
+        print(f"Snapshot {snap_id}: {written / 1048576:.1f} MB of new data")
+    else:
+        export_zip(db.db_path, args.out, level=args.level)
+        print(f"Backup written to {args.out}")
+
+def cmd_stats(db, args):
+    stats = db.get_stats()
+    pages = glob.glob(os.path.join(os.path.dirname(db.db_path), "wb_*_*.png"))
+    stats["whiteboard_pages"] = len(pages)
+    stats["whiteboard_bytes"] = sum(os.path.getsize(p) for p in pages)
+    for key, value in stats.items():
+        shown = f"{value / 1048576:.1f} MB" if key.endswith("_bytes") else value
+        print(f"{key.replace('_', ' '):20} {shown}")
+
+def cmd_usage(db, args):
+    from storage import disk_usage
+    usage = disk_usage(db, os.path.dirname(db.db_path))
+    mb = lambda n: f"{n / 1048576:8.2f} MB"
+    for r in usage["notebooks"][:args.top]:
+        print(f"{r['id']:>6}  {r['name'][:40]:40}  {r['notes']:>6} notes {mb(r['db_bytes'])}  {r['pages']:>5} pages {mb(r['image_bytes'])}")
+    print(f"database file {mb(usage['db_file_bytes'])}, unused pages: {usage['orphan_pages']} ({mb(usage['orphan_bytes']).strip()})")
+    print(", ".join(f"{name} {mb(size).strip()}" for name, size in usage["cache_bytes"].items()))
+
+def cmd_gc(db, args):
+    from storage import find_garbage, collect_garbage
+    app_dir = os.path.dirname(db.db_path)
+    if args.dry_run:
+        found = find_garbage(db, app_dir)
+        for path, size, _, reason in found: print(f"{reason:9} {size:>9}  {os.path.basename(path)}")
+        print(f"{len(found)} file(s), {sum(f[1] for f in found) / 1048576:.1f} MB would be removed")
+    else:
+        files, freed = collect_garbage(db, app_dir)
+        print(f"Removed {files} file(s), {freed / 1048576:.1f} MB freed")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description="Note app from the command line (no window).")
+    parser.add_argument("--db", help="Database file (default: the app's own)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="List notebooks, most recently active first")
+    p.add_argument("--search", default="", help="Only notebooks whose name or description matches")
+    p.set_defaults(fn=cmd_list)
+
+    p = sub.add_parser("search", help="Search note titles and text in every unlocked notebook")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int, default=50)
+    p.set_defaults(fn=cmd_search)
+
+    p = sub.add_parser("export-pdf", help="Export notebooks to one PDF each, in parallel")
+    p.add_argument("out_dir")
+    p.add_argument("--notebook", type=int, action="append", help="Notebook id (repeatable; default: all unlocked)")
+    p.add_argument("--no-images", action="store_true", help="Leave out whiteboard sketches")
+    p.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    p.set_defaults(fn=cmd_export_pdf)
+
+    p = sub.add_parser("backup", help="Write a backup zip, or an incremental snapshot into a folder")
+    p.add_argument("out")
+    p.add_argument("--level", type=int, choices=range(10), default=6, help="Zip compression level for the database (default: 6); pages are stored")
+    p.add_argument("--incremental", action="store_true", help="Treat OUT as an incremental backup folder")
+    p.set_defaults(fn=cmd_backup)
+
+    p = sub.add_parser("stats", help="Counts and sizes")
+    p.set_defaults(fn=cmd_stats)
+
+    p = sub.add_parser("usage", help="Disk use per notebook (data plus sketches), largest first")
+    p.add_argument("--top", type=int, default=50)
+    p.set_defaults(fn=cmd_usage)
+
+    p = sub.add_parser("gc", help="Delete sketch pages of deleted notes and trailing empty pages")
+    p.add_argument("--dry-run", action="store_true", help="Only list what would be removed")
+    p.set_defaults(fn=cmd_gc)
+
+    args = parser.parse_args(argv)
+    db = _open_db(args)
+    try:
+        return args.fn(db, args) or 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
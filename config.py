@@ -2,6 +2,26 @@
 
 APP_NAME = "Note"
 DB_NAME = "noteapp.db"
+PROJECT_PAGE_SIZE = 50 # Notebooks loaded per page on the landing screen
+PROJECT_STATE_CACHE = 8 # Recently opened notebooks whose view state is remembered
+SEARCH_DEBOUNCE_MS = 200 # Quiet time after typing in a search box before it runs
+RESIZE_THROTTLE_MS = 100 # Minimum gap between relayouts while a window is resized
+COMPRESS_MIN_BYTES = 4096 # Note snapshots at least this large are stored compressed
+COMPRESS_CODEC = "zlib" # or "zstd" (needs the zstandard package wherever the data is opened)
+JOURNAL_FLUSH_MS = 500 # Editor operations are appended to the journal at most this often
+JOURNAL_CHECKPOINT_OPS = 500 # Journaled operations on a note before it is folded into its content
+MINHASH_PERMS = 64 # MinHash signature length for related-note suggestions
+LSH_BANDS = 32 # Signature bands of two rows; notes sharing any band are scored (most pairs above ~0.25 overlap)
+SHINGLE_WORDS = 3 # Words per shingle
+RELATED_MIN_SCORE = 0.3 # Estimated overlap a note needs to be suggested as related
+RELATED_LIMIT = 5
+BLANK_PAGE_MAX_BYTES = 16384 # Whiteboard pages larger than this are never checked for being empty
+STORAGE_GC_MIN_AGE_S = 3600 # Empty pages saved more recently than this are left alone
+STORAGE_GC_INTERVAL_S = 24 * 3600 # Background storage cleanup runs at most this often
+MAINTENANCE_IDLE_MS = 30000 # Quiet time (no keys or clicks) before database upkeep starts
+MAINTENANCE_STEP_MS = 50 # Gap between upkeep steps while the app stays idle
+VACUUM_STEP_PAGES = 256 # Free pages handed back to the file system per upkeep step
+ANALYSIS_LIMIT = 400 # Rows sampled per index by ANALYZE / PRAGMA optimize
 
 COLORS = {
     "bg_main": "#FDFCF0",        
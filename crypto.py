@@ -0,0 +1,103 @@
+# crypto.py
+# Password hashing and notebook encryption, free of tkinter.
+# Passwords are stored as salted scrypt hashes (PBKDF2 where this Python lacks
+# scrypt). The same slow derivation also yields a key-encryption key, so one
+# unlock both checks the password and opens the notebook's random data key.
+# Changing a password only re-wraps that data key. Sealing data needs the
+# optional 'cryptography' package (AES-GCM); hashing works without it.
+import os
+import re
+import hmac
+import zlib
+import hashlib
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.exceptions import InvalidTag
+    HAS_CRYPTO = True
+except ImportError:
+    HAS_CRYPTO = False
+
+SEAL_MARK = b"NE1" # Sealed values: marker + 12-byte nonce + AES-GCM ciphertext
+SCRYPT_PARAMS = (2 ** 14, 8, 1) # n, r, p: about 16 MB and a few tens of ms per unlock
+PBKDF2_ROUNDS = 300000
+WORD_RE = re.compile(r"\w+")
+
+class LockedError(Exception):
+    """Sealed data was read or written without its notebook's key."""
+
+def _derive(password, salt, method, params):
+    # 64 bytes: the first half is the stored verifier, the second half the
+    # key-encryption key, which is never stored
+    if method == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=64 * 1024 * 1024, dklen=64)
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, params[0], dklen=64)
+
+def hash_password(password):
+    """Return "method$params...$salt$verifier" for storing."""
+    method, params = ("scrypt", SCRYPT_PARAMS) if hasattr(hashlib, "scrypt") else ("pbkdf2", (PBKDF2_ROUNDS,))
+    salt = os.urandom(16)
+    out = _derive(password, salt, method, params)
+    return "$".join([method, *map(str, params), salt.hex(), out[:32].hex()])
+
+def check_password(password, stored):
+    """Return the key-encryption key if password matches the stored hash, else None."""
+    try:
+        method, *params, salt, verifier = stored.split("$")
+        out = _derive(password, bytes.fromhex(salt), method, tuple(int(p) for p in params))
+    except (ValueError, AttributeError):
+        return None
+    return out[32:] if hmac.compare_digest(out[:32].hex(), verifier) else None
+
+def is_hashed(stored):
+    # By method prefix: a plain-text password may well contain "$" itself
+    return bool(stored) and stored.startswith(("scrypt$", "pbkdf2$")) and stored.count("$") >= 3
+
+# --- Sealing ---
+def _require():
+    if not HAS_CRYPTO: raise RuntimeError("Install 'cryptography' to use encrypted notebooks.")
+
+def new_data_key():
+    return os.urandom(32)
+
+def seal(key, data, field):
+    """Encrypt bytes. `field` is authenticated, so a sealed title can't pass as content."""
+    _require()
+    nonce = os.urandom(12)
+    return SEAL_MARK + nonce + AESGCM(key).encrypt(nonce, data, field.encode())
+
+def open_sealed(key, blob, field):
+    _require()
+    if key is None: raise LockedError("This notebook is locked.")
+    try:
+        return AESGCM(key).decrypt(blob[3:15], blob[15:], field.encode())
+    except InvalidTag:
+        raise ValueError("Encrypted data is damaged or the key is wrong.")
+
+def is_sealed(value):
+    return isinstance(value, bytes) and value[:3] == SEAL_MARK
+
+def seal_text(key, text, field):
+    raw = text.encode("utf-8")
+    packed = zlib.compress(raw, 6)
+    # Compress before encrypting; ciphertext doesn't compress
+    return seal(key, b"\x01" + packed if len(packed) < len(raw) else b"\x00" + raw, field)
+
+def open_text(key, blob, field):
+    data = open_sealed(key, blob, field)
+    return (zlib.decompress(data[1:]) if data[:1] == b"\x01" else data[1:]).decode("utf-8")
+
+# --- Keyed search tokens ---
+def _token_key(key):
+    return hmac.new(key, b"search", hashlib.sha256).digest()
+
+def search_tokens(key, text):
+    """Space-padded set of keyed word hashes, so whole-word search works on sealed notes
+    with LIKE '% token %' without revealing the words."""
+    tk = _token_key(key)
+    tokens = {hmac.new(tk, w.encode("utf-8"), hashlib.sha256).hexdigest()[:16] for w in WORD_RE.findall(text.lower())}
+    return " " + " ".join(sorted(tokens)) + " "
+
+def query_tokens(key, query):
+    return search_tokens(key, query).split()
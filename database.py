@@ -3,17 +3,149 @@ import sqlite3
 import os
 import sys
 import json
+import zlib
+import hmac
+import hashlib
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from config import APP_NAME, DB_NAME
+from config import (
+    APP_NAME, DB_NAME, COMPRESS_MIN_BYTES, COMPRESS_CODEC, RELATED_LIMIT, RELATED_MIN_SCORE,
+    VACUUM_STEP_PAGES, ANALYSIS_LIMIT
+)
+from instrument import trace_methods
+from snapshot import TextBuffer
+from similarity import index_notes, store_signature, signature, load_signature, similarity
+from crypto import (
+    LockedError, hash_password, check_password, is_hashed, new_data_key, seal, open_sealed,
+    is_sealed, seal_text, open_text, search_tokens, query_tokens
+)
 
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+def snapshot_text(content):
+    """The plain text of a note snapshot (or of legacy plain-text content)."""
+    try:
+        data = json.loads(content)
+        raw_text = data.get("text", "")
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        raw_text = content
+    return raw_text or ""
+
+def plain_text_title(content):
+    title = snapshot_text(content).split('\n')[0][:30].strip()
+    return title if title else "Untitled"
+
+# --- Due dates ---
+# Stored as ISO "YYYY-MM-DD" or NULL. Older rows and exports used DD-MM-YYYY or "".
+def iso_due(value):
+    """A due date as stored, from either format; None for empty or unreadable values."""
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y"):
+        try: return datetime.strptime(value, fmt).date().isoformat()
+        except (TypeError, ValueError): pass
+    return None
+
+def parse_due(value):
+    """date of a stored due date, or None if it isn't a valid ISO date."""
+    try: return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError): return None
+
+# --- Content compression ---
+# Large snapshots are stored as a BLOB: a 3-byte codec marker followed by the
+# compressed UTF-8 JSON. Anything stored as TEXT is an uncompressed snapshot,
+# so rows written before compression existed read back unchanged.
+ZLIB_MARK, ZSTD_MARK = b"NZ1", b"NS1"
+
+def pack_content(content):
+    raw = content.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES: return content
+    if COMPRESS_CODEC == "zstd" and HAS_ZSTD:
+        packed = ZSTD_MARK + zstandard.ZstdCompressor(level=9).compress(raw)
+    else:
+        packed = ZLIB_MARK + zlib.compress(raw, 6)
+    return packed if len(packed) < len(raw) * 0.9 else content
+
+def unpack_content(value):
+    if not isinstance(value, bytes): return value
+    mark, body = value[:3], value[3:]
+    if mark == ZLIB_MARK: return zlib.decompress(body).decode("utf-8")
+    if mark == ZSTD_MARK:
+        if not HAS_ZSTD: raise RuntimeError("This note is zstd-compressed; install the 'zstandard' package to read it.")
+        return zstandard.ZstdDecompressor().decompress(body).decode("utf-8")
+    return value.decode("utf-8")
+
+def note_columns(content):
+    """(title, stored content, plain_text) for writing a note row."""
+    text = snapshot_text(content)
+    title = text.split('\n')[0][:30].strip()
+    return title or "Untitled", pack_content(content), text
+
+@trace_methods("db")
 class DatabaseManager:
-    def __init__(self):
-        self.db_path = self._get_app_data_path()
-        self.conn = sqlite3.connect(self.db_path)
-        self.cursor = self.conn.cursor()
+    # One writer connection, serialized by a lock, plus one read-only connection
+    # per thread. In WAL mode readers never wait for the writer (or each other),
+    # so any thread can query while the UI thread saves.
+    def __init__(self, db_path=None):
+        # db_path lets worker processes open the same file the UI is using
+        self.db_path = db_path or self._get_app_data_path()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self.keys = {} # project id -> data key of an unlocked encrypted notebook (this session only)
+        self._unlocked = {} # project id -> keyed hash of the password that unlocked it
+        self._session_secret = os.urandom(32)
+        self.title_listeners = [] # fn(note_id, project_id, title); title None = removed, note_id None = whole notebook
+        self.conn.execute("PRAGMA journal_mode = WAL")
         self._init_db()
         self._migrate_db()
 
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False) # Closed from close(), on any thread
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._readers_lock: self._readers.append(conn)
+        return conn
+
+    def _read(self, sql, params=()):
+        return self._reader().execute(sql, params).fetchall()
+
+    def _read_one(self, sql, params=()):
+        return self._reader().execute(sql, params).fetchone()
+
+    @contextmanager
+    def _writing(self):
+        # Holds the writer for several statements and commits them together
+        with self._write_lock:
+            try:
+                yield self.conn
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+
+    def _write(self, sql, params=()):
+        with self._writing() as conn:
+            return conn.execute(sql, params)
+
+    def _title_changed(self, note_id, project_id, title):
+        # Titles of encrypted notebooks are never handed out in plain text
+        for fn in self.title_listeners: fn(note_id, project_id, title)
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers: conn.close()
+            self._readers.clear()
+        with self._write_lock:
+            self.conn.close()
+
     def _get_app_data_path(self):
         if sys.platform == "win32":
             app_data = os.getenv('LOCALAPPDATA')
@@ -26,8 +158,9 @@ class DatabaseManager:
         return os.path.join(folder, DB_NAME)
 
     def _init_db(self):
-        self.cursor.execute("PRAGMA foreign_keys = ON")
-        self.cursor.execute("""
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL") # Only takes effect on a new, empty file
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS projects (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
@@ -36,7 +169,7 @@ class DatabaseManager:
                 password TEXT
             )
         """)
-        self.cursor.execute("""
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS notes (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 project_id INTEGER,
@@ -46,7 +179,7 @@ class DatabaseManager:
                 FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
             )
         """)
-        self.cursor.execute("""
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS todos (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 project_id INTEGER,
@@ -59,127 +192,605 @@ class DatabaseManager:
         """)
         self.conn.commit()
 
-        self.cursor.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        # Editor operations not yet folded into notes.content (see checkpoint_journal)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS note_journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                note_id INTEGER,
+                op TEXT,
+                FOREIGN KEY(note_id) REFERENCES notes(id) ON DELETE CASCADE
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_note ON note_journal(note_id, seq)")
+        # Related-notes index (see similarity.py): a MinHash signature per note and
+        # one LSH bucket row per signature band
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS note_minhash (
+                note_id INTEGER PRIMARY KEY,
+                sig BLOB,
+                FOREIGN KEY(note_id) REFERENCES notes(id) ON DELETE CASCADE
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS note_lsh (
+                bucket INTEGER,
+                note_id INTEGER,
+                FOREIGN KEY(note_id) REFERENCES notes(id) ON DELETE CASCADE
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_bucket ON note_lsh(bucket, note_id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_note ON note_lsh(note_id)")
         self.conn.commit()
 
     def set_setting(self, key, value):
-        self.cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
-        self.conn.commit()
+        self._write("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
 
     def get_setting(self, key):
-        self.cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-        res = self.cursor.fetchone()
+        res = self._read_one("SELECT value FROM settings WHERE key = ?", (key,))
         return res[0] if res else ""
     
     def _migrate_db(self):
         try:
-            self.cursor.execute("ALTER TABLE todos ADD COLUMN due_date TEXT")
+            self.conn.execute("ALTER TABLE todos ADD COLUMN due_date TEXT")
             self.conn.commit()
         except sqlite3.OperationalError: pass
         try:
-            self.cursor.execute("ALTER TABLE projects ADD COLUMN password TEXT")
+            self.conn.execute("ALTER TABLE projects ADD COLUMN password TEXT")
             self.conn.commit()
         except sqlite3.OperationalError: pass
-
-    def _get_plain_text_title(self, content):
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_notes_project ON notes(project_id, timestamp)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_todos_project ON todos(project_id, is_done)")
+        try:
+            # last_activity = newest note timestamp (or creation time), kept current by triggers
+            self.conn.execute("ALTER TABLE projects ADD COLUMN last_activity TEXT")
+            self.conn.execute("""
+                UPDATE projects SET last_activity = COALESCE(
+                    (SELECT MAX(timestamp) FROM notes WHERE notes.project_id = projects.id), created_at)
+            """)
+            self.conn.commit()
+        except sqlite3.OperationalError: pass
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_activity ON projects(last_activity, id)")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 7:
+            # last_activity must never be NULL: the keyset comparison in get_project_page
+            # is NULL for such a row, so it was never listed past the first page
+            self.conn.execute("DROP TRIGGER IF EXISTS trg_projects_activity_init")
+            self.conn.execute("UPDATE projects SET last_activity = COALESCE(created_at, '') WHERE last_activity IS NULL")
+        self.conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_projects_activity_init AFTER INSERT ON projects
+            WHEN NEW.last_activity IS NULL BEGIN
+                UPDATE projects SET last_activity = COALESCE(NEW.created_at, '') WHERE id = NEW.id;
+            END
+        """)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # Due dates were saved as DD-MM-YYYY (or ""); store ISO dates so they sort and range-query
+            self._normalize_due_dates()
+            self.conn.execute("PRAGMA user_version = 1")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_todos_open_due ON todos(due_date) WHERE is_done = 0")
         try:
-            data = json.loads(content)
-            raw_text = data.get("text", "")
-        except (json.JSONDecodeError, TypeError):
-            raw_text = content
-        title = raw_text.split('\n')[0][:30].strip()
-        return title if title else "Untitled"
+            # Search reads plain_text so it never has to decompress content
+            self.conn.execute("ALTER TABLE notes ADD COLUMN plain_text TEXT")
+        except sqlite3.OperationalError: pass
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 2:
+            # Fill plain_text and compress large existing notes, a batch of ids at a time
+            last = 0
+            while True:
+                rows = self.conn.execute("SELECT id, content FROM notes WHERE id > ? ORDER BY id LIMIT 1000", (last,)).fetchall()
+                if not rows: break
+                batch = []
+                for nid, stored in rows:
+                    content = unpack_content(stored) or ""
+                    batch.append((pack_content(content), snapshot_text(content), nid))
+                self.conn.executemany("UPDATE notes SET content = ?, plain_text = ? WHERE id = ?", batch)
+                last = rows[-1][0]
+            self.conn.execute("PRAGMA user_version = 2")
+        try:
+            # Data key of an encrypted notebook, sealed with its password-derived key
+            self.conn.execute("ALTER TABLE projects ADD COLUMN enc_key BLOB")
+        except sqlite3.OperationalError: pass
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 3:
+            # Passwords were stored as plain text; keep only salted hashes
+            self._hash_plain_passwords()
+            self.conn.execute("PRAGMA user_version = 3")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 4:
+            # Files created before auto-vacuum need one full VACUUM to switch modes;
+            # from then on free pages are handed back a few at a time by maintenance_step()
+            self.conn.commit()
+            if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                self.conn.execute("VACUUM")
+            self.conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+            self.conn.execute("ANALYZE")
+            self.conn.execute("PRAGMA user_version = 4")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 5:
+            # Version 3 took any password with three "$" for a hash, and imports of
+            # version 1 exports stored plain text; hash whatever is left
+            self._hash_plain_passwords()
+            self.conn.execute("PRAGMA user_version = 5")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 6:
+            # Notebook imports kept the old due date format until version 6
+            self._normalize_due_dates()
+            self.conn.execute("PRAGMA user_version = 6")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 7:
+            self.conn.execute("PRAGMA user_version = 7") # NULL last_activity backfilled above, before the triggers
+        for event in ("INSERT", "UPDATE OF timestamp"):
+            self.conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_notes_activity_{event.split()[0].lower()} AFTER {event} ON notes BEGIN
+                    UPDATE projects SET last_activity = NEW.timestamp
+                    WHERE id = NEW.project_id AND (last_activity IS NULL OR last_activity < NEW.timestamp);
+                END
+            """)
+        self.conn.commit()
+
+    def _normalize_due_dates(self):
+        self.conn.execute("""
+            UPDATE todos SET due_date = substr(due_date, 7, 4) || '-' || substr(due_date, 4, 2) || '-' || substr(due_date, 1, 2)
+            WHERE due_date GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]'
+        """)
+        self.conn.execute("UPDATE todos SET due_date = NULL WHERE due_date = ''")
+
+    def _hash_plain_passwords(self):
+        for pid, pwd in self.conn.execute("SELECT id, password FROM projects WHERE COALESCE(password, '') != ''").fetchall():
+            if not is_hashed(pwd): self.conn.execute("UPDATE projects SET password = ? WHERE id = ?", (hash_password(pwd), pid))
+        app = self.conn.execute("SELECT value FROM settings WHERE key = 'app_password'").fetchone()
+        if app and app[0] and not is_hashed(app[0]):
+            self.conn.execute("UPDATE settings SET value = ? WHERE key = 'app_password'", (hash_password(app[0]),))
 
     def add_project(self, name, description):
-        self.cursor.execute("INSERT INTO projects (name, description, created_at) VALUES (?, ?, ?)",
-                            (name, description, datetime.now().strftime("%Y-%m-%d %H:%M")))
-        self.conn.commit()
+        self._write("INSERT INTO projects (name, description, created_at) VALUES (?, ?, ?)",
+                    (name, description, datetime.now().strftime("%Y-%m-%d %H:%M")))
 
     def get_projects(self, search_query=""):
         if search_query:
             q = f"%{search_query}%"
-            self.cursor.execute("SELECT * FROM projects WHERE name LIKE ? OR description LIKE ? ORDER BY id DESC", (q, q))
+            return self._read("SELECT id, name, description, created_at FROM projects WHERE name LIKE ? OR description LIKE ? ORDER BY id DESC", (q, q))
         else:
-            self.cursor.execute("SELECT * FROM projects ORDER BY id DESC")
-        return self.cursor.fetchall()
+            return self._read("SELECT id, name, description, created_at FROM projects ORDER BY id DESC")
+
+    def get_project_page(self, search_query="", after=None, limit=50):
+        # One page of the landing list, most recently active first. `after` is the
+        # (last_activity, id) of the previous page's last row (keyset pagination),
+        # so every page is an index range scan no matter how deep it is. Counts are
+        # computed only for the rows on the page.
+        # Rows: (id, name, description, created_at, locked, note_count, open_todos, last_activity)
+        where, params = [], []
+        if after:
+            where.append("(p.last_activity, p.id) < (?, ?)")
+            params += list(after)
+        if search_query:
+            where.append("(p.name LIKE ? OR p.description LIKE ?)")
+            params += [f"%{search_query}%"] * 2
+        return self._read(f"""
+            SELECT p.id, p.name, p.description, p.created_at,
+                   COALESCE(p.password, '') != '' AS locked,
+                   (SELECT COUNT(*) FROM notes n WHERE n.project_id = p.id) AS note_count,
+                   (SELECT COUNT(*) FROM todos t WHERE t.project_id = p.id AND t.is_done = 0) AS open_todos,
+                   p.last_activity
+            FROM projects p
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY p.last_activity DESC, p.id DESC
+            LIMIT ?
+        """, params + [limit])
 
     def delete_project(self, project_id):
-        self.cursor.execute("DELETE FROM projects WHERE id = ?", (project_id,))
-        self.conn.commit()
+        self._write("DELETE FROM projects WHERE id = ?", (project_id,))
+        self._title_changed(None, project_id, None)
+
+    def get_project_names(self):
+        return dict(self._read("SELECT id, name FROM projects"))
+
+    def locked_project_ids(self):
+        # Password-protected notebooks not yet unlocked this session
+        return {pid for (pid,) in self._read("SELECT id FROM projects WHERE COALESCE(password, '') != ''")} - self._unlocked.keys()
 
     def set_project_password(self, project_id, password):
-        self.cursor.execute("UPDATE projects SET password = ? WHERE id = ?", (password, project_id))
-        self.conn.commit()
+        # An empty password removes the lock (decrypting the notebook first). A new
+        # password on an encrypted notebook only re-seals its data key.
+        self._unlocked.pop(project_id, None)
+        if not password:
+            self.decrypt_project(project_id)
+            self._write("UPDATE projects SET password = NULL WHERE id = ?", (project_id,))
+            return
+        stored = hash_password(password)
+        if self.is_encrypted(project_id):
+            wrapped = seal(check_password(password, stored), self._project_key(project_id), "data key")
+            self._write("UPDATE projects SET password = ?, enc_key = ? WHERE id = ?", (stored, wrapped, project_id))
+        else:
+            self._write("UPDATE projects SET password = ? WHERE id = ?", (stored, project_id))
+        self._unlocked[project_id] = self._session_tag(password)
 
     def get_project_password(self, project_id):
-        self.cursor.execute("SELECT password FROM projects WHERE id = ?", (project_id,))
-        res = self.cursor.fetchone()
+        res = self._read_one("SELECT password FROM projects WHERE id = ?", (project_id,))
         return res[0] if res else None
 
     def add_note(self, project_id, content="New Note"):
-        title = self._get_plain_text_title(content)
-        self.cursor.execute("INSERT INTO notes (project_id, title, content, timestamp) VALUES (?, ?, ?, ?)",
-                            (project_id, title, content, datetime.now().strftime("%Y-%m-%d %H:%M")))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        key = self._project_key(project_id)
+        title, stored, text = self._note_columns(key, content)
+        with self._writing() as conn:
+            nid = conn.execute("INSERT INTO notes (project_id, title, content, plain_text, timestamp) VALUES (?, ?, ?, ?, ?)",
+                               (project_id, title, stored, text, datetime.now().strftime("%Y-%m-%d %H:%M"))).lastrowid
+            index_notes(conn, [(nid, None if key else text)])
+        self._title_changed(nid, project_id, None if key else title)
+        return nid
 
     def update_note(self, note_id, content):
-        title = self._get_plain_text_title(content)
-        self.cursor.execute("UPDATE notes SET title = ?, content = ?, timestamp = ? WHERE id = ?",
-                            (title, content, datetime.now().strftime("%Y-%m-%d %H:%M"), note_id))
-        self.conn.commit()
+        # A full snapshot supersedes anything still journaled for the note
+        pid = self._note_project(note_id)
+        key = self._project_key(pid) if pid else None
+        title, stored, text = self._note_columns(key, content)
+        with self._writing() as conn:
+            conn.execute("UPDATE notes SET title = ?, content = ?, plain_text = ?, timestamp = ? WHERE id = ?",
+                         (title, stored, text, datetime.now().strftime("%Y-%m-%d %H:%M"), note_id))
+            conn.execute("DELETE FROM note_journal WHERE note_id = ?", (note_id,))
+            index_notes(conn, [(note_id, None if key else text)])
+        if pid: self._title_changed(note_id, pid, None if key else title)
 
     def get_notes(self, project_id, search_query=""):
+        if self.is_encrypted(project_id):
+            # Titles are sealed and plain_text holds keyed word hashes: whole-word search only
+            key = self.keys.get(project_id)
+            where, params = "", [project_id]
+            if search_query:
+                tokens = query_tokens(key, search_query) if key else []
+                if not tokens: return []
+                where = "".join(" AND plain_text LIKE ?" for _ in tokens)
+                params += [f"% {t} %" for t in tokens]
+            rows = self._read(f"SELECT id, project_id, title, timestamp FROM notes WHERE project_id = ?{where} ORDER BY timestamp DESC", params)
+            return [(nid, pid, self._open_value(key, title, "title") if key else "🔒 Locked", ts) for nid, pid, title, ts in rows]
         if search_query:
             q = f"%{search_query}%"
-            self.cursor.execute("SELECT id, project_id, title, timestamp FROM notes WHERE project_id = ? AND (title LIKE ? OR content LIKE ?) ORDER BY timestamp DESC", (project_id, q, q))
+            return self._read("SELECT id, project_id, title, timestamp FROM notes WHERE project_id = ? AND (title LIKE ? OR plain_text LIKE ?) ORDER BY timestamp DESC", (project_id, q, q))
         else:
-            self.cursor.execute("SELECT id, project_id, title, timestamp FROM notes WHERE project_id = ? ORDER BY timestamp DESC", (project_id,))
-        return self.cursor.fetchall()
+            return self._read("SELECT id, project_id, title, timestamp FROM notes WHERE project_id = ? ORDER BY timestamp DESC", (project_id,))
+
+    def _read_note(self, note_id):
+        # (title, content) with any journaled edits applied. One statement, so a
+        # checkpoint committing on another connection can't split the read.
+        # Sealed notes are only decrypted here, when a note is actually opened.
+        rows = self._read("""
+            SELECT n.project_id, n.title, n.content, j.op FROM notes n LEFT JOIN note_journal j ON j.note_id = n.id
+            WHERE n.id = ? ORDER BY j.seq
+        """, (note_id,))
+        if not rows: return None
+        pid, title, stored = rows[0][:3]
+        key = self._project_key(pid) if is_sealed(stored) or is_sealed(rows[0][3]) else None
+        title, content = self._open_value(key, title, "title"), self._open_value(key, stored, "content") or ""
+        if rows[0][3] is None: return title, content
+        buf = TextBuffer(content)
+        for *_, op in rows: buf.apply(json.loads(self._open_value(key, op, "op")))
+        return title, buf.snapshot()
+
+    # --- Notebook locks and encryption ---
+    # projects.password holds a crypto.hash_password string. An encrypted notebook
+    # also has enc_key, its random data key sealed with the key derived from the
+    # password; its notes' title, content and journal ops are sealed with the data
+    # key and plain_text holds keyed word hashes. Notebook names stay readable,
+    # so the landing list costs the same for every notebook.
+    def is_encrypted(self, project_id):
+        row = self._read_one("SELECT enc_key IS NOT NULL FROM projects WHERE id = ?", (project_id,))
+        return bool(row and row[0])
+
+    def note_is_encrypted(self, note_id):
+        row = self._read_one("SELECT p.enc_key IS NOT NULL FROM notes n JOIN projects p ON p.id = n.project_id WHERE n.id = ?", (note_id,))
+        return bool(row and row[0])
+
+    def _project_key(self, project_id):
+        key = self.keys.get(project_id)
+        if key is None and self.is_encrypted(project_id):
+            raise LockedError("Unlock this notebook first.")
+        return key
+
+    def _open_value(self, key, value, field):
+        if is_sealed(value): return open_text(key, value, field)
+        return unpack_content(value)
+
+    def _note_columns(self, key, content):
+        # (title, stored content, plain_text) for a note row, sealed when key is set
+        if key is None: return note_columns(content)
+        text = snapshot_text(content)
+        title = text.split('\n')[0][:30].strip() or "Untitled"
+        return seal_text(key, title, "title"), seal_text(key, content, "content"), search_tokens(key, text)
+
+    def _session_tag(self, password):
+        return hmac.new(self._session_secret, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def unlock_project(self, project_id, password):
+        # Runs the slow key derivation once per session; later unlocks compare a
+        # keyed hash of the password instead.
+        row = self._read_one("SELECT password, enc_key FROM projects WHERE id = ?", (project_id,))
+        if not row or not row[0]: return True
+        tag = self._session_tag(password)
+        if project_id in self._unlocked: return hmac.compare_digest(self._unlocked[project_id], tag)
+        kek = check_password(password, row[0])
+        if kek is None: return False
+        if row[1]: self.keys[project_id] = open_sealed(kek, row[1], "data key")
+        self._unlocked[project_id] = tag
+        return True
+
+    def _rewrite_notes(self, project_id, old_key, new_key):
+        # Re-encode every note of a notebook (sealing or unsealing) in one transaction
+        ids = [r[0] for r in self._read("SELECT id FROM notes WHERE project_id = ?", (project_id,))]
+        self.checkpoint_journal(ids) # Journaled ops are sealed with the old key
+        titles = []
+        with self._writing() as conn:
+            for nid, stored in conn.execute("SELECT id, content FROM notes WHERE project_id = ?", (project_id,)).fetchall():
+                content = self._open_value(old_key, stored, "content") or ""
+                title, stored, text = self._note_columns(new_key, content)
+                conn.execute("UPDATE notes SET title = ?, content = ?, plain_text = ? WHERE id = ?", (title, stored, text, nid))
+                index_notes(conn, [(nid, None if new_key else text)]) # Similarity would leak what sealed notes share
+                titles.append((nid, None if new_key else title))
+        for nid, title in titles: self._title_changed(nid, project_id, title)
+
+    def encrypt_project(self, project_id, password):
+        # Seal a password-locked notebook's notes. Returns False if the password is wrong.
+        stored = self.get_project_password(project_id)
+        kek = check_password(password, stored) if stored else None
+        if kek is None: return False
+        if self.is_encrypted(project_id): return True
+        key = new_data_key()
+        wrapped = seal(kek, key, "data key") # Fails before any note is touched if sealing is unavailable
+        self._rewrite_notes(project_id, None, key)
+        self._write("UPDATE projects SET enc_key = ? WHERE id = ?", (wrapped, project_id))
+        self.keys[project_id] = key
+        return True
+
+    def decrypt_project(self, project_id):
+        if not self.is_encrypted(project_id): return
+        self._rewrite_notes(project_id, self._project_key(project_id), None)
+        self._write("UPDATE projects SET enc_key = NULL WHERE id = ?", (project_id,))
+        self.keys.pop(project_id, None)
+
+    def set_app_password(self, password):
+        self.set_setting("app_password", hash_password(password) if password else "")
+
+    def check_app_password(self, password):
+        stored = self.get_setting("app_password")
+        return not stored or check_password(password, stored) is not None
+
+    def search_all_notes(self, search_query, limit=50, include_locked=True):
+        # Newest matches across every notebook except encrypted ones:
+        # (id, project_id, notebook, title, timestamp, locked, plain_text).
+        # Locked notebooks are filtered here, not by the caller, so `limit` counts shown rows.
+        q = f"%{search_query}%"
+        return self._read(f"""
+            SELECT n.id, n.project_id, p.name, n.title, n.timestamp, COALESCE(p.password, '') != '', n.plain_text
+            FROM notes n JOIN projects p ON p.id = n.project_id
+            WHERE p.enc_key IS NULL AND (n.title LIKE ? OR n.plain_text LIKE ?)
+            {"" if include_locked else "AND COALESCE(p.password, '') = ''"}
+            ORDER BY n.timestamp DESC LIMIT ?
+        """, (q, q, limit))
+
+    def get_stats(self):
+        one = lambda sql: self._read_one(sql)[0]
+        return {
+            "notebooks": one("SELECT COUNT(*) FROM projects"),
+            "locked_notebooks": one("SELECT COUNT(*) FROM projects WHERE COALESCE(password, '') != ''"),
+            "encrypted_notebooks": one("SELECT COUNT(*) FROM projects WHERE enc_key IS NOT NULL"),
+            "notes": one("SELECT COUNT(*) FROM notes"),
+            "compressed_notes": one("SELECT COUNT(*) FROM notes WHERE typeof(content) = 'blob'"),
+            "content_bytes": one("SELECT COALESCE(SUM(length(CAST(content AS BLOB))), 0) FROM notes"),
+            "open_todos": one("SELECT COUNT(*) FROM todos WHERE is_done = 0"),
+            "done_todos": one("SELECT COUNT(*) FROM todos WHERE is_done = 1"),
+            "journal_ops": one("SELECT COUNT(*) FROM note_journal"),
+            "db_bytes": one("PRAGMA page_count") * one("PRAGMA page_size"),
+        }
+
+    def get_note(self, note_id):
+        return self._read_note(note_id)
 
     def get_note_content(self, note_id):
-        self.cursor.execute("SELECT content FROM notes WHERE id = ?", (note_id,))
-        result = self.cursor.fetchone()
-        return result[0] if result else ""
+        note = self._read_note(note_id)
+        return note[1] if note else ""
     
     # --- UPDATED: Now returns ID as well ---
     def get_all_notes_content(self, project_id):
-        self.cursor.execute("SELECT id, title, content FROM notes WHERE project_id = ? ORDER BY timestamp DESC", (project_id,))
-        return self.cursor.fetchall()
+        rows = self._read("SELECT id FROM notes WHERE project_id = ? ORDER BY timestamp DESC", (project_id,))
+        return [(nid, *self._read_note(nid)) for (nid,) in rows]
+
+    # --- Edit journal ---
+    # The editor appends small operations instead of rewriting the whole
+    # snapshot; checkpoint_journal folds them into notes.content later.
+    def _note_project(self, note_id):
+        row = self._read_one("SELECT project_id FROM notes WHERE id = ?", (note_id,))
+        return row[0] if row else None
+
+    def _note_key(self, note_id):
+        pid = self._note_project(note_id)
+        return self._project_key(pid) if pid else None
+
+    def append_journal(self, entries):
+        # entries: [(note_id, op)]
+        keys = {nid: self._note_key(nid) for nid in {nid for nid, _ in entries}}
+        rows = [(nid, seal_text(keys[nid], json.dumps(op), "op") if keys[nid] else json.dumps(op)) for nid, op in entries]
+        with self._writing() as conn:
+            conn.executemany("INSERT INTO note_journal (note_id, op) VALUES (?, ?)", rows)
+
+    def touch_note(self, note_id, title, text=None):
+        # Cheap save: the title and timestamp the notes list shows, without the content.
+        # text (the editor's plain text) keeps search current until the next checkpoint.
+        pid = self._note_project(note_id)
+        key = self._project_key(pid) if pid else None
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+        title_value = seal_text(key, title, "title") if key else title
+        if text is None:
+            self._write("UPDATE notes SET title = ?, timestamp = ? WHERE id = ?", (title_value, stamp, note_id))
+        else:
+            self._write("UPDATE notes SET title = ?, timestamp = ?, plain_text = ? WHERE id = ?",
+                        (title_value, stamp, search_tokens(key, text) if key else text, note_id))
+        if pid: self._title_changed(note_id, pid, None if key else title)
+
+    def checkpoint_journal(self, note_ids=None):
+        # Replays journaled operations into notes.content (all notes by default).
+        # Notes of encrypted notebooks that aren't unlocked keep their journal.
+        # Returns the number of notes rewritten.
+        if note_ids is None:
+            note_ids = [r[0] for r in self._read("SELECT DISTINCT note_id FROM note_journal")]
+        changed = []
+        for nid in note_ids:
+            # Read and rewrite under the writer lock so no append lands in between;
+            # BEGIN IMMEDIATE does the same against other processes.
+            with self._writing() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                ops = conn.execute("SELECT seq, op FROM note_journal WHERE note_id = ? ORDER BY seq", (nid,)).fetchall()
+                if not ops: continue
+                row = conn.execute("""
+                    SELECT n.content, n.project_id, p.enc_key IS NOT NULL FROM notes n JOIN projects p ON p.id = n.project_id
+                    WHERE n.id = ?
+                """, (nid,)).fetchone()
+                if row:
+                    key = self.keys.get(row[1])
+                    if row[2] and key is None: continue
+                    buf = TextBuffer(self._open_value(key, row[0], "content") or "")
+                    for _, op in ops: buf.apply(json.loads(self._open_value(key, op, "op")))
+                    title, stored, text = self._note_columns(key, buf.snapshot())
+                    conn.execute("UPDATE notes SET title = ?, content = ?, plain_text = ? WHERE id = ?", (title, stored, text, nid))
+                    index_notes(conn, [(nid, None if key else text)])
+                    changed.append((nid, row[1], None if key else title))
+                conn.execute("DELETE FROM note_journal WHERE note_id = ? AND seq <= ?", (nid, ops[-1][0]))
+        for change in changed: self._title_changed(*change)
+        return len(changed)
+
+    # --- Related notes ---
+    def related_notes(self, note_id, limit=RELATED_LIMIT, min_score=RELATED_MIN_SCORE):
+        """[(id, title, score)] of notes in the same notebook that look like note_id,
+        best first. Only notes sharing an LSH bucket with it are scored."""
+        row = self._read_one("SELECT m.sig, n.project_id FROM note_minhash m JOIN notes n ON n.id = m.note_id WHERE m.note_id = ?", (note_id,))
+        if not row or row[0] is None: return []
+        sig = load_signature(row[0])
+        candidates = self._read("""
+            SELECT n.id, n.title, m.sig FROM notes n JOIN note_minhash m ON m.note_id = n.id
+            WHERE n.project_id = ? AND n.id != ? AND n.id IN (
+                SELECT note_id FROM note_lsh WHERE bucket IN (SELECT bucket FROM note_lsh WHERE note_id = ?))
+        """, (row[1], note_id, note_id))
+        scored = [(nid, title, similarity(sig, load_signature(other))) for nid, title, other in candidates]
+        return sorted((r for r in scored if r[2] >= min_score), key=lambda r: -r[2])[:limit]
+
+    def index_pending(self, batch=50):
+        # Indexes notes written without going through this class (migrated, bulk
+        # imported, transferred). Returns how many were examined; 0 once caught up.
+        # Signatures (tens of ms for a long note) are computed before taking the
+        # write lock, so the Tk thread's journal writes only wait for the inserts.
+        rows = self._read("""
+            SELECT n.id, n.plain_text FROM notes n JOIN projects p ON p.id = n.project_id
+            LEFT JOIN note_minhash m ON m.note_id = n.id
+            WHERE m.note_id IS NULL AND p.enc_key IS NULL LIMIT ?
+        """, (batch,))
+        if not rows: return 0
+        sigs = {nid: signature(text or "") for nid, text in rows}
+        with self._writing() as conn:
+            # Skip notes deleted, encrypted or indexed from newer text in the meantime
+            still = conn.execute(f"""
+                SELECT n.id FROM notes n JOIN projects p ON p.id = n.project_id
+                LEFT JOIN note_minhash m ON m.note_id = n.id
+                WHERE n.id IN ({",".join("?" * len(sigs))}) AND m.note_id IS NULL AND p.enc_key IS NULL
+            """, list(sigs)).fetchall()
+            for nid, in still: store_signature(conn, nid, sigs[nid])
+        return len(rows)
+
+    # --- Maintenance ---
+    def maintenance_step(self, pages=VACUUM_STEP_PAGES):
+        """One short unit of idle-time upkeep: hand up to `pages` free pages back
+        to the file system, then, once none are left, fold the WAL back into the
+        database. Returns True while there is more to do."""
+        with self._writing() as conn:
+            if conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                # executescript steps the pragma to completion; execute() would free a single page
+                conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+                if conn.execute("PRAGMA freelist_count").fetchone()[0]: return True
+        # Outside any transaction, or the checkpoint can't finish
+        with self._write_lock: self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return False
+
+    def optimize(self):
+        with self._write_lock:
+            self.conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+            self.conn.execute("PRAGMA optimize")
+            self.conn.commit()
+
+    def get_db_health(self):
+        one = lambda sql: self._read_one(sql)[0]
+        page_size, pages, free = one("PRAGMA page_size"), one("PRAGMA page_count"), one("PRAGMA freelist_count")
+        wal = self.db_path + "-wal"
+        health = {
+            "file_bytes": os.path.getsize(self.db_path),
+            "wal_bytes": os.path.getsize(wal) if os.path.exists(wal) else 0,
+            "page_size": page_size, "pages": pages, "free_pages": free,
+            "free_bytes": free * page_size,
+            "auto_vacuum": ("none", "full", "incremental")[one("PRAGMA auto_vacuum")],
+            "analyzed": bool(one("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'")),
+        }
+        try:
+            # Space left empty inside used pages; needs SQLite built with the dbstat table
+            unused, total = self._read_one("SELECT SUM(unused), SUM(pgsize) FROM dbstat")
+            health["page_fill"] = 1 - unused / total if total else 1.0
+        except sqlite3.OperationalError:
+            health["page_fill"] = None
+        return health
+
+    # --- Storage ---
+    def get_note_ids(self):
+        return {nid for (nid,) in self._read("SELECT id FROM notes")}
+
+    def get_note_projects(self):
+        return dict(self._read("SELECT id, project_id FROM notes"))
+
+    def get_notebook_usage(self):
+        # (id, name, notes, approximate bytes of its rows: notes, pending journal ops and tasks)
+        return self._read("""
+            SELECT p.id, p.name,
+                (SELECT COUNT(*) FROM notes WHERE project_id = p.id),
+                COALESCE((SELECT SUM(length(CAST(content AS BLOB)) + COALESCE(length(CAST(title AS BLOB)), 0)
+                                     + COALESCE(length(CAST(plain_text AS BLOB)), 0)) FROM notes WHERE project_id = p.id), 0)
+                + COALESCE((SELECT SUM(length(CAST(j.op AS BLOB))) FROM note_journal j JOIN notes n ON n.id = j.note_id
+                            WHERE n.project_id = p.id), 0)
+                + COALESCE((SELECT SUM(length(CAST(task AS BLOB))) FROM todos WHERE project_id = p.id), 0)
+            FROM projects p
+        """)
+
+    def note_titles(self):
+        # (id, project_id, title) of every note outside encrypted notebooks, for the quick switcher
+        return self._read("""
+            SELECT n.id, n.project_id, n.title FROM notes n JOIN projects p ON p.id = n.project_id
+            WHERE p.enc_key IS NULL ORDER BY n.id
+        """)
 
     def delete_note(self, note_id):
-        self.cursor.execute("DELETE FROM notes WHERE id = ?", (note_id,))
-        self.conn.commit()
+        self._write("DELETE FROM notes WHERE id = ?", (note_id,))
+        self._title_changed(note_id, None, None)
 
-    def add_todo(self, project_id, task, due_date=""):
-        self.cursor.execute("INSERT INTO todos (project_id, task, due_date, created_at) VALUES (?, ?, ?, ?)",
-                            (project_id, task, due_date, datetime.now().strftime("%Y-%m-%d")))
-        self.conn.commit()
-        # --- Add these to database.py ---
+    def add_todo(self, project_id, task, due_date=None):
+        # due_date is an ISO "YYYY-MM-DD" string or None
+        return self._write("INSERT INTO todos (project_id, task, due_date, created_at) VALUES (?, ?, ?, ?)",
+                           (project_id, task, due_date or None, datetime.now().strftime("%Y-%m-%d"))).lastrowid
 
     def get_project_by_id(self, project_id):
         # Fetches current name and description for the edit dialog
-        self.cursor.execute("SELECT name, description FROM projects WHERE id = ?", (project_id,))
-        return self.cursor.fetchone()
+        return self._read_one("SELECT name, description FROM projects WHERE id = ?", (project_id,))
 
     def update_project(self, project_id, name, description):
         # Updates the record in the database
-        self.cursor.execute("UPDATE projects SET name = ?, description = ? WHERE id = ?", 
-                            (name, description, project_id))
-        self.conn.commit()
+        self._write("UPDATE projects SET name = ?, description = ? WHERE id = ?", 
+                    (name, description, project_id))
 
     def get_todos(self, project_id):
-        self.cursor.execute("""
+        return self._read("""
             SELECT id, project_id, task, due_date, is_done, created_at 
             FROM todos WHERE project_id = ? ORDER BY is_done ASC, id DESC
         """, (project_id,))
-        return self.cursor.fetchall()
+
+    def get_agenda(self, until):
+        # Open tasks due on or before `until` (ISO date) across every notebook, soonest first.
+        # Served by the partial index on open tasks' due dates.
+        return self._read("""
+            SELECT t.id, t.project_id, p.name, t.task, t.due_date
+            FROM todos t JOIN projects p ON p.id = t.project_id
+            WHERE t.is_done = 0 AND t.due_date IS NOT NULL AND t.due_date <= ?
+            ORDER BY t.due_date, t.id
+        """, (until,))
 
     def toggle_todo(self, todo_id, is_done):
         val = 1 if is_done else 0
-        self.cursor.execute("UPDATE todos SET is_done = ? WHERE id = ?", (val, todo_id))
-        self.conn.commit()
+        self._write("UPDATE todos SET is_done = ? WHERE id = ?", (val, todo_id))
 
     def delete_todo(self, todo_id):
-        self.cursor.execute("DELETE FROM todos WHERE id = ?", (todo_id,))
-        self.conn.commit()
\ No newline at end of file
+        self._write("DELETE FROM todos WHERE id = ?", (todo_id,))
\ No newline at end of file
@@ -0,0 +1,94 @@
+# instrument.py
+# Opt-in timing for DB calls and UI work. Off by default; when off, a traced
+# call costs one attribute check. Enable with NOTE_TRACE=1 or from Settings.
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+MAX_EVENTS = 200000 # Oldest trace events are dropped beyond this
+
+class Tracer:
+    def __init__(self):
+        self.enabled = os.environ.get("NOTE_TRACE") == "1"
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.stats = {} # name -> [calls, total_s, max_s, rows]
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def enable(self, flag=True):
+        self.enabled = bool(flag)
+
+    def reset(self):
+        with self._lock:
+            self.events.clear()
+            self.stats.clear()
+
+    @contextmanager
+    def span(self, name, cat="ui"):
+        """Time a block. The yielded dict can carry a "rows" count into the record."""
+        if not self.enabled:
+            yield {}
+            return
+        info = {}
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.record(name, cat, start, time.perf_counter() - start, info.get("rows"))
+
+    def record(self, name, cat, start, duration, rows=None):
+        event = {"name": name, "cat": cat, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                 "ts": round((start - self._origin) * 1e6), "dur": round(duration * 1e6)}
+        if rows is not None: event["args"] = {"rows": rows}
+        with self._lock:
+            self.events.append(event)
+            s = self.stats.setdefault(name, [0, 0.0, 0.0, 0])
+            s[0] += 1
+            s[1] += duration
+            s[2] = max(s[2], duration)
+            s[3] += rows or 0
+
+    def summary(self):
+        """[(name, calls, total_ms, avg_ms, max_ms, rows)], slowest total first."""
+        with self._lock:
+            rows = [(name, c, t * 1000, t * 1000 / c, m * 1000, r) for name, (c, t, m, r) in self.stats.items()]
+        return sorted(rows, key=lambda r: r[2], reverse=True)
+
+    def dump_chrome_trace(self, path):
+        """Write the recorded spans in Chrome trace-event format (chrome://tracing, Perfetto)."""
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+tracer = Tracer()
+
+def _row_count(result):
+    return len(result) if isinstance(result, list) else None
+
+def traced(name=None, cat="ui"):
+    """Decorator: time every call of the function under `name` (default: its qualified name)."""
+    def wrap(fn):
+        label = name or fn.__qualname__
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not tracer.enabled: return fn(*args, **kwargs)
+            with tracer.span(label, cat) as info:
+                result = fn(*args, **kwargs)
+                info["rows"] = _row_count(result)
+                return result
+        return inner
+    return wrap
+
+def trace_methods(cat):
+    """Class decorator: apply traced() to every public method defined on the class."""
+    def wrap(cls):
+        for attr, value in list(vars(cls).items()):
+            if callable(value) and not attr.startswith("_"):
+                setattr(cls, attr, traced(f"{cls.__name__}.{attr}", cat)(value))
+        return cls
+    return wrap
@@ -0,0 +1,188 @@
+# pdf_export.py
+# PDF generation kept free of tkinter so it can run in a worker process.
+import os
+import glob
+import json
+import time
+import hashlib
+from xml.sax.saxutils import escape
+from database import DatabaseManager
+from snapshot import parse_snapshot, line_runs
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+try:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Image as PDFImage
+    from reportlab.lib.styles import getSampleStyleSheet
+    HAS_PDF = True
+except ImportError:
+    HAS_PDF = False
+
+CACHE_VERSION = 1
+IMAGE_MAX_PX = (800, 600) # 2x the 400x300pt box sketches are drawn in
+CACHE_MAX_AGE = 60 * 24 * 3600
+
+class ExportCancelled(Exception):
+    pass
+
+def note_markup(raw_content):
+    """Convert a stored note into [(style_name, paragraph_markup), ...], keeping
+    bold/italic runs and rendering heading-tagged lines with a heading style."""
+    text, tags = parse_snapshot(raw_content)
+    paragraphs = []
+    for runs in line_runs(text, tags):
+        if not "".join(seg for seg, _ in runs).strip(): continue
+        is_heading = any("heading" in active for seg, active in runs if seg.strip())
+        parts = []
+        for seg, active in runs:
+            seg = escape(seg)
+            if "italic" in active: seg = f"<i>{seg}</i>"
+            if "bold" in active: seg = f"<b>{seg}</b>"
+            parts.append(seg)
+        paragraphs.append(("Heading2" if is_heading else "BodyText", "".join(parts)))
+    return paragraphs
+
+class ExportCache:
+    # Lives in <storage>/export_cache. Notes are keyed by a hash of their stored
+    # content and sketches by a hash of the PNG bytes, so a re-export only parses
+    # and resamples what changed since the last run.
+    def __init__(self, storage_path):
+        self.folder = os.path.join(storage_path, "export_cache")
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _path(self, digest, ext):
+        return os.path.join(self.folder, f"{digest}.{ext}")
+
+    def _touch(self, path):
+        try: os.utime(path)
+        except OSError: pass
+
+    def markup(self, raw_content, persist=True):
+        """persist=False (notes of encrypted notebooks) never writes plaintext or a
+        hash of it to disk, and removes an entry left from before that rule."""
+        key = hashlib.sha1(f"{CACHE_VERSION}:{raw_content}".encode("utf-8")).hexdigest()
+        path = self._path(key, "json")
+        if not persist:
+            try: os.remove(path)
+            except OSError: pass
+            return note_markup(raw_content)
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    paragraphs = [tuple(p) for p in json.load(f)]
+                self._touch(path)
+                return paragraphs
+            except (OSError, ValueError): pass
+        paragraphs = note_markup(raw_content)
+        self._write(path, json.dumps(paragraphs).encode("utf-8"))
+        return paragraphs
+
+    def image(self, png_path):
+        """Return a downscaled JPEG of png_path, or png_path itself without PIL."""
+        if not HAS_PIL: return png_path
+        with open(png_path, "rb") as f:
+            key = hashlib.sha1(f.read()).hexdigest()
+        path = self._path(key, "jpg")
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+        img = Image.open(png_path).convert("RGB")
+        img.thumbnail(IMAGE_MAX_PX)
+        tmp = path + ".tmp"
+        img.save(tmp, "JPEG", quality=85, optimize=True)
+        os.replace(tmp, path)
+        return path
+
+    def _write(self, path, data):
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "wb") as f: f.write(data)
+            os.replace(tmp, path)
+        except OSError: pass
+
+    def clear_markup(self):
+        # Called when a notebook gets encrypted: its notes may have been cached in plain text
+        for name in os.listdir(self.folder):
+            if name.endswith(".json"):
+                try: os.remove(os.path.join(self.folder, name))
+                except OSError: pass
+
+    def prune(self, max_age=CACHE_MAX_AGE):
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            try:
+                if os.path.getmtime(path) < cutoff: os.remove(path)
+            except OSError: pass
+
+def build_pdf(db_path, note_ids, out_path, with_images=True, with_titles=True,
+              progress=None, cancelled=None, keys=None):
+    """Render note_ids to out_path. progress(done, total) is called after each
+    note; if cancelled() returns True the export stops and nothing is written.
+    keys maps project id to the data key of unlocked encrypted notebooks."""
+    if not HAS_PDF: raise RuntimeError("Install 'reportlab' first.")
+    db = DatabaseManager(db_path)
+    db.keys.update(keys or {})
+    storage_path = os.path.dirname(db.db_path)
+    cache = ExportCache(storage_path)
+    styles = getSampleStyleSheet()
+    story = []
+    total = len(note_ids)
+
+    try:
+        for i, nid in enumerate(note_ids):
+            if cancelled and cancelled(): raise ExportCancelled()
+            row = db.get_note(nid)
+            if not row: continue # Deleted since the snapshot was taken
+            title, content = row
+
+            if with_titles:
+                story.append(Paragraph(escape(title or "Untitled"), styles['Heading1']))
+                story.append(Spacer(1, 12))
+            for style, markup in cache.markup(content, persist=not db.note_is_encrypted(nid)):
+                story.append(Paragraph(markup, styles[style]))
+                story.append(Spacer(1, 6))
+
+            if with_images:
+                paths = sorted(glob.glob(os.path.join(storage_path, f"wb_{nid}_*.png")))
+                if paths:
+                    story.append(Spacer(1, 10))
+                    story.append(Paragraph("Sketches:", styles['Heading3']))
+                    for p in paths:
+                        try:
+                            story.append(PDFImage(cache.image(p), width=400, height=300))
+                            story.append(Spacer(1, 10))
+                        except Exception: pass
+            if total > 1:
+                story.append(PageBreak())
+            if progress: progress(i + 1, total)
+    finally:
+        db.close()
+
+    if cancelled and cancelled(): raise ExportCancelled()
+    # Build next to the target and swap in, so a failed build never leaves a truncated PDF
+    tmp_path = out_path + ".part"
+    try:
+        SimpleDocTemplate(tmp_path, pagesize=letter).build(story)
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+    cache.prune()
+
+def export_worker(db_path, note_ids, out_path, with_images, with_titles, messages, cancel_event, keys=None):
+    """multiprocessing entry point. Reports ("progress", done, total), then one of
+    ("done", path), ("cancelled",) or ("error", message) on the messages queue."""
+    try:
+        build_pdf(db_path, note_ids, out_path, with_images, with_titles,
+                  progress=lambda done, total: messages.put(("progress", done, total)),
+                  cancelled=cancel_event.is_set, keys=keys)
+        messages.put(("done", out_path))
+    except ExportCancelled:
+        messages.put(("cancelled",))
+    except Exception as e:
+        messages.put(("error", str(e)))
@@ -0,0 +1,64 @@
+# similarity.py
+# Near-duplicate detection for the "Related" panel, free of tkinter.
+# Each note's plain text is cut into word shingles and summarized by a MinHash
+# signature; the signature is split into LSH bands and every band is stored as
+# a bucket key in note_lsh. Notes sharing any bucket are candidates, and only
+# those are scored, so a lookup never compares a note with the whole notebook.
+import re
+import hashlib
+from array import array
+from config import MINHASH_PERMS, LSH_BANDS, SHINGLE_WORDS
+
+WORD_RE = re.compile(r"\w+")
+PRIME = (1 << 61) - 1
+ROWS = MINHASH_PERMS // LSH_BANDS
+
+# Fixed seeds keep signatures comparable between runs and machines
+_seed = hashlib.sha256(b"note-minhash").digest()
+PERMS = []
+for i in range(MINHASH_PERMS):
+    h = hashlib.blake2b(_seed + i.to_bytes(2, "big"), digest_size=16).digest()
+    PERMS.append((int.from_bytes(h[:8], "big") % (PRIME - 1) + 1, int.from_bytes(h[8:], "big") % PRIME))
+
+def shingles(text):
+    """Hashes of the overlapping SHINGLE_WORDS-word runs in text (the words themselves for very short notes)."""
+    words = WORD_RE.findall((text or "").lower())
+    if len(words) >= SHINGLE_WORDS:
+        words = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return {int.from_bytes(hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest(), "big") for w in words}
+
+def signature(text):
+    """MinHash signature as an array of MINHASH_PERMS ints, or None for a note without words."""
+    xs = shingles(text)
+    if not xs: return None
+    return array("Q", [min((a * x + b) % PRIME for x in xs) for a, b in PERMS])
+
+def band_keys(sig):
+    # One signed 64-bit bucket key per band; the band number is mixed in so bands never collide
+    return [int.from_bytes(hashlib.blake2b(bytes([band]) + sig[band * ROWS:(band + 1) * ROWS].tobytes(),
+                                           digest_size=8).digest(), "big", signed=True)
+            for band in range(LSH_BANDS)]
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+def load_signature(blob):
+    sig = array("Q")
+    sig.frombytes(blob)
+    return sig
+
+def index_notes(conn, rows):
+    """(Re)index [(note_id, plain_text)] on conn; text None (an encrypted note) drops
+    a note from the index. Notes without words get a NULL signature, so they aren't
+    picked up again as unindexed. The caller owns the transaction."""
+    for nid, text in rows:
+        conn.execute("DELETE FROM note_lsh WHERE note_id = ?", (nid,))
+        conn.execute("DELETE FROM note_minhash WHERE note_id = ?", (nid,))
+        if text is not None: store_signature(conn, nid, signature(text))
+
+def store_signature(conn, nid, sig):
+    """Write a signature computed beforehand (None for a note without words) for a
+    note that has no index rows yet."""
+    conn.execute("INSERT INTO note_minhash (note_id, sig) VALUES (?, ?)", (nid, sig.tobytes() if sig else None))
+    if sig: conn.executemany("INSERT INTO note_lsh (bucket, note_id) VALUES (?, ?)", [(key, nid) for key in band_keys(sig)])
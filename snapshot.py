@@ -0,0 +1,194 @@
+# snapshot.py
+# Helpers for the note content format written by NoteApp.get_content_snapshot:
+#   {"text": "...", "tags": [{"name": "bold", "ranges": ["1.0", "1.5", ...]}, ...]}
+# Ranges are Tk text indices ("line.column", lines starting at 1) in start/end pairs.
+import re
+import json
+from bisect import bisect_right
+
+FORMAT_TAGS = ("bold", "italic", "heading")
+
+def parse_snapshot(raw):
+    """Return (text, tags) where tags maps a tag name to a list of (start, end) index pairs.
+    Plain-text content from before snapshots existed comes back with no tags."""
+    try:
+        data = json.loads(raw)
+        if not isinstance(data, dict): raise TypeError
+    except (json.JSONDecodeError, TypeError):
+        return (raw or ""), {}
+    tags = {}
+    for tag_info in data.get("tags", []):
+        ranges = tag_info.get("ranges", [])
+        pairs = [(ranges[i], ranges[i+1]) for i in range(0, len(ranges) - 1, 2)]
+        tags.setdefault(tag_info.get("name"), []).extend(pairs)
+    return data.get("text", ""), tags
+
+def serialize_snapshot(text, tag_ranges):
+    """Inverse of parse_snapshot. tag_ranges maps a tag name to the flat list of
+    indices Tk's tag_ranges() returns; tags without ranges are left out."""
+    tags = [{"name": name, "ranges": [str(r) for r in tag_ranges[name]]}
+            for name in FORMAT_TAGS if tag_ranges.get(name)]
+    return json.dumps({"text": text, "tags": tags})
+
+def split_index(index):
+    line, col = str(index).split(".")
+    return int(line), int(col)
+
+def line_runs(text, tags, names=FORMAT_TAGS):
+    """Yield one list per line of (segment, tag_set) runs covering the whole line."""
+    lines = text.split("\n")
+    spans = [[] for _ in lines] # per line: (start_col, end_col, name)
+    for name in names:
+        for start, end in tags.get(name, []):
+            (sl, sc), (el, ec) = split_index(start), split_index(end)
+            for ln in range(max(sl, 1), min(el, len(lines)) + 1):
+                a = sc if ln == sl else 0
+                b = ec if ln == el else len(lines[ln - 1])
+                if b > a: spans[ln - 1].append((a, b, name))
+
+    for line, line_spans in zip(lines, spans):
+        if not line_spans:
+            yield [(line, frozenset())]
+            continue
+        cuts = sorted({0, len(line)} | {min(c, len(line)) for a, b, _ in line_spans for c in (a, b)})
+        runs = []
+        for a, b in zip(cuts, cuts[1:]):
+            active = frozenset(n for sa, sb, n in line_spans if sa <= a and b <= sb)
+            if runs and runs[-1][1] == active:
+                runs[-1] = (runs[-1][0] + line[a:b], active)
+            else:
+                runs.append((line[a:b], active))
+        yield runs or [(line, frozenset())]
+
+# --- Edit journal replay ---
+class TextBuffer:
+    """Headless model of the editor's Text widget: plain text plus FORMAT_TAGS
+    ranges, edited with the journal operations the editor records:
+        ["i", index, chars, [tags]]   insert chars carrying exactly those tags
+        ["d", start, end]             delete
+        ["t+", tag, start, end] / ["t-", tag, start, end]
+    Indices are resolved "line.column" strings. As in Tk, a column past the end
+    of its line clamps to the line end and a line past the last clamps to the end."""
+    def __init__(self, raw=""):
+        self.text, tags = parse_snapshot(raw)
+        self._starts = None
+        self.tags = {name: [] for name in FORMAT_TAGS} # name -> sorted, disjoint [(start, end)] offsets
+        for name, pairs in tags.items():
+            if name not in self.tags: continue
+            for start, end in pairs: self._add_range(name, self.offset(start), self.offset(end))
+
+    def _line_starts(self):
+        if self._starts is None:
+            self._starts = [0] + [i + 1 for i, c in enumerate(self.text) if c == "\n"]
+        return self._starts
+
+    def offset(self, index):
+        line, col = split_index(index)
+        starts = self._line_starts()
+        if line < 1: return 0
+        if line > len(starts): return len(self.text)
+        line_end = starts[line] - 1 if line < len(starts) else len(self.text)
+        return min(starts[line - 1] + max(col, 0), line_end)
+
+    def index(self, offset):
+        starts = self._line_starts()
+        line = bisect_right(starts, offset)
+        return f"{line}.{offset - starts[line - 1]}"
+
+    def _add_range(self, name, a, b):
+        if b <= a: return
+        merged = []
+        for s, e in self.tags[name]:
+            if e < a or s > b: merged.append((s, e))
+            else: a, b = min(a, s), max(b, e)
+        merged.append((a, b))
+        self.tags[name] = sorted(merged)
+
+    def _remove_range(self, name, a, b):
+        if b <= a: return
+        kept = []
+        for s, e in self.tags[name]:
+            if e <= a or s >= b: kept.append((s, e))
+            else:
+                if s < a: kept.append((s, a))
+                if e > b: kept.append((b, e))
+        self.tags[name] = kept
+
+    def insert(self, index, chars, tags=()):
+        at, n = self.offset(index), len(chars)
+        if not n: return
+        self.text = self.text[:at] + chars + self.text[at:]
+        self._starts = None
+        for name, ranges in self.tags.items():
+            moved = []
+            for s, e in ranges:
+                if e <= at: moved.append((s, e))
+                elif s >= at: moved.append((s + n, e + n))
+                else: moved += [(s, at), (at + n, e + n)]
+            self.tags[name] = moved
+        for name in tags:
+            if name in self.tags: self._add_range(name, at, at + n)
+
+    def delete(self, start, end):
+        a, b = self.offset(start), self.offset(end)
+        if b <= a: return
+        self.text = self.text[:a] + self.text[b:]
+        self._starts = None
+        shift = lambda p: p if p <= a else a if p <= b else p - (b - a)
+        for name, ranges in self.tags.items():
+            kept = [(shift(s), shift(e)) for s, e in ranges]
+            self.tags[name] = []
+            for s, e in kept: self._add_range(name, s, e)
+
+    def apply(self, op):
+        kind = op[0]
+        if kind == "i": self.insert(op[1], op[2], op[3] if len(op) > 3 else ())
+        elif kind == "d": self.delete(op[1], op[2])
+        elif kind == "t+" and op[1] in self.tags: self._add_range(op[1], self.offset(op[2]), self.offset(op[3]))
+        elif kind == "t-" and op[1] in self.tags: self._remove_range(op[1], self.offset(op[2]), self.offset(op[3]))
+
+    def snapshot(self):
+        return serialize_snapshot(self.text, {name: [self.index(o) for pair in ranges for o in pair]
+                                              for name, ranges in self.tags.items()})
+
+# --- Markdown import ---
+MD_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.*?)\s*#*\s*$")
+MD_BULLET = re.compile(r"^(\s*)[-*+]\s+")
+MD_INLINE = re.compile(r"\*\*(.+?)\*\*|__(.+?)__|\*(?=\S)(.+?)(?<=\S)\*|(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)")
+
+def _md_inline(src, line_no, col, ranges):
+    # Strips emphasis markers from src, recording Tk index ranges per tag
+    out = []
+    pos = 0
+    for m in MD_INLINE.finditer(src):
+        out.append(src[pos:m.start()])
+        col += m.start() - pos
+        inner = next(g for g in m.groups() if g is not None)
+        tag = "bold" if m.group(1) is not None or m.group(2) is not None else "italic"
+        start = col
+        inner_text = _md_inline(inner, line_no, col, ranges)
+        col += len(inner_text)
+        ranges.setdefault(tag, []).extend([f"{line_no}.{start}", f"{line_no}.{col}"])
+        out.append(inner_text)
+        pos = m.end()
+    out.append(src[pos:])
+    return "".join(out)
+
+def markdown_to_snapshot(source):
+    """Convert Markdown (or plain text) into the editor's snapshot JSON.
+    Headings, **bold**/__bold__ and *italic*/_italic_ become tags; "-", "*" and "+"
+    bullets become the editor's "•" bullets. Everything else is kept as text."""
+    lines = []
+    ranges = {}
+    for line_no, line in enumerate(source.replace("\r\n", "\n").replace("\r", "\n").split("\n"), start=1):
+        heading = MD_HEADING.match(line)
+        if heading:
+            line = heading.group(1)
+        else:
+            line = MD_BULLET.sub(lambda m: m.group(1) + "• ", line)
+        text = _md_inline(line, line_no, 0, ranges)
+        if heading and text:
+            ranges.setdefault("heading", []).extend([f"{line_no}.0", f"{line_no}.{len(text)}"])
+        lines.append(text)
+    tags = [{"name": name, "ranges": ranges[name]} for name in FORMAT_TAGS if ranges.get(name)]
+    return json.dumps({"text": "\n".join(lines), "tags": tags})
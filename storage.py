@@ -0,0 +1,126 @@
+# storage.py
+# Whiteboard page housekeeping, free of tkinter. Deleting a note (or a whole
+# notebook, by cascade) removes its rows but not its wb_<note>_<page>.png
+# files, and older versions saved an empty first page for every note they
+# showed. collect_garbage() removes pages of notes that no longer exist, those
+# automatic empty pages and thumbnails of page versions that are gone;
+# disk_usage() reports bytes per notebook and for the cache folders.
+import os
+import re
+import time
+
+try:
+    from PIL import Image, ImageChops
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+from config import BLANK_PAGE_MAX_BYTES, STORAGE_GC_MIN_AGE_S
+
+PAGE_RE = re.compile(r"^wb_(\d+)_(\d+)\.png$")
+THUMB_RE = re.compile(r"^wb_(\d+)_(\d+)-[0-9a-f]{40}\.png$") # See whiteboard.ThumbnailCache
+CACHE_DIRS = ("thumbs", "export_cache")
+
+def scan_pages(app_dir):
+    """{note id: {page: (path, size, mtime)}} from one directory scan."""
+    pages = {}
+    with os.scandir(app_dir) as entries:
+        for entry in entries:
+            m = PAGE_RE.match(entry.name)
+            if not m or not entry.is_file(): continue
+            st = entry.stat()
+            pages.setdefault(int(m.group(1)), {})[int(m.group(2))] = (entry.path, st.st_size, st.st_mtime)
+    return pages
+
+def scan_files(folder):
+    """[(name, path, size, mtime)] of the files in folder, [] if it doesn't exist."""
+    files = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not entry.is_file(): continue
+                st = entry.stat()
+                files.append((entry.name, entry.path, st.st_size, st.st_mtime))
+    except FileNotFoundError: pass
+    return files
+
+def is_blank(path):
+    # Pages are RGB on white; a blank one has no pixel that differs from white
+    try:
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+            return ImageChops.difference(img, Image.new("RGB", img.size, "white")).getbbox() is None
+    except OSError:
+        return False
+
+def find_garbage(db, app_dir, keep_note_ids=()):
+    """[(path, size, mtime, reason)] that collect_garbage would delete."""
+    pages = scan_pages(app_dir)
+    live = db.get_note_ids() # Read after the scan, so a page of a brand-new note is never seen without its note
+    cutoff = time.time() - STORAGE_GC_MIN_AGE_S
+    found = []
+    for nid, note_pages in pages.items():
+        if nid not in live:
+            # Recent ones may belong to a note another process is about to commit
+            found += [(path, size, mtime, "orphaned") for path, size, mtime in note_pages.values() if mtime < cutoff]
+            continue
+        if nid in keep_note_ids or not HAS_PIL or set(note_pages) != {0}: continue
+        # Only a lone empty first page was written automatically; later pages exist
+        # because someone added them, blank or not. Small files only: a page with
+        # anything on it doesn't compress this far.
+        path, size, mtime = note_pages[0]
+        if size <= BLANK_PAGE_MAX_BYTES and mtime < cutoff and is_blank(path):
+            found.append((path, size, mtime, "empty"))
+    # Thumbnails: only the newest one of each page that stays is current
+    gone = {path for path, *_ in found}
+    newest = {}
+    for name, path, size, mtime in scan_files(os.path.join(app_dir, "thumbs")):
+        m = THUMB_RE.match(name)
+        page = m and pages.get(int(m.group(1)), {}).get(int(m.group(2)))
+        if not page or page[0] in gone:
+            if m or mtime < cutoff: found.append((path, size, mtime, "thumbnail")) # Leave a fresh .tmp being written
+            continue
+        key = m.group(1, 2)
+        if key in newest:
+            older = min(newest[key], (mtime, path, size))
+            found.append((older[1], older[2], older[0], "thumbnail"))
+            newest[key] = max(newest[key], (mtime, path, size))
+        else:
+            newest[key] = (mtime, path, size)
+    return found
+
+def collect_garbage(db, app_dir, keep_note_ids=(), cancelled=None):
+    """Delete what find_garbage() reports. Returns (files, bytes) removed.
+    Files changed since they were examined are left alone."""
+    files = freed = 0
+    for path, size, mtime, _ in find_garbage(db, app_dir, keep_note_ids):
+        if cancelled and cancelled(): break
+        try:
+            if os.path.getmtime(path) != mtime: continue
+            os.remove(path)
+        except OSError: continue
+        files += 1
+        freed += size
+    return files, freed
+
+def disk_usage(db, app_dir):
+    """Per-notebook usage, largest first: [{"id", "name", "notes", "db_bytes", "pages", "image_bytes"}],
+    plus totals for pages that belong to no note and bytes per cache folder."""
+    pages = scan_pages(app_dir)
+    owners = db.get_note_projects()
+    rows = {pid: {"id": pid, "name": name, "notes": notes, "db_bytes": size, "pages": 0, "image_bytes": 0}
+            for pid, name, notes, size in db.get_notebook_usage()}
+    orphans = [0, 0]
+    for nid, note_pages in pages.items():
+        row = rows.get(owners.get(nid))
+        for _, size, _ in note_pages.values():
+            if row:
+                row["pages"] += 1
+                row["image_bytes"] += size
+            else:
+                orphans[0] += 1
+                orphans[1] += size
+    db_files = sum(os.path.getsize(p) for p in (db.db_path, db.db_path + "-wal") if os.path.exists(p))
+    return {"notebooks": sorted(rows.values(), key=lambda r: r["db_bytes"] + r["image_bytes"], reverse=True),
+            "orphan_pages": orphans[0], "orphan_bytes": orphans[1], "db_file_bytes": db_files,
+            "cache_bytes": {d: sum(f[2] for f in scan_files(os.path.join(app_dir, d))) for d in CACHE_DIRS}}
@@ -0,0 +1,23 @@
+# Shared fixtures. The modules live at the repository root, next to Note.py.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "notes.db"))
+    yield manager
+    manager.close()
+
+@pytest.fixture
+def new_project(db):
+    # add_project doesn't return the new id
+    def create(name, description=""):
+        db.add_project(name, description)
+        return db.get_projects()[0][0]
+    return create
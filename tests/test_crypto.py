@@ -0,0 +1,55 @@
+import pytest
+
+from crypto import HAS_CRYPTO, LockedError, check_password, hash_password, is_hashed, is_sealed
+from database import DatabaseManager
+from snapshot import parse_snapshot, serialize_snapshot
+
+needs_crypto = pytest.mark.skipif(not HAS_CRYPTO, reason="sealing needs the 'cryptography' package")
+
+def test_hash_and_check_password():
+    stored = hash_password("correct horse")
+    assert is_hashed(stored)
+    assert len(check_password("correct horse", stored)) == 32
+    assert check_password("wrong", stored) is None
+    assert check_password("correct horse", "not a hash") is None
+
+def test_plain_password_with_dollars_is_not_mistaken_for_a_hash():
+    assert not is_hashed("pa$$w$rd")
+    assert not is_hashed("")
+
+@needs_crypto
+def test_encrypt_change_password_unlock_decrypt(db, new_project):
+    pid = new_project("Secret")
+    first = serialize_snapshot("Diary\nmet the auditor today", {"bold": ["1.0", "1.5"]})
+    nid = db.add_note(pid, first)
+    db.append_journal([(nid, ["i", "2.24", " again", []])]) # Journaled before sealing
+    db.set_project_password(pid, "old")
+    assert db.encrypt_project(pid, "wrong") is False
+    assert db.encrypt_project(pid, "old") is True
+    title, content = db._read_one("SELECT title, content FROM notes WHERE id = ?", (nid,))
+    assert is_sealed(title) and is_sealed(content)
+
+    db.append_journal([(nid, ["i", "1.5", "!", []])]) # Sealed with the data key
+    db.set_project_password(pid, "new")
+    expected = ("Diary!\nmet the auditor today again", {"bold": [("1.0", "1.5")]})
+    assert parse_snapshot(db.get_note_content(nid)) == expected
+
+    # A new session starts locked; only the new password opens the notebook
+    fresh = DatabaseManager(db.db_path)
+    try:
+        with pytest.raises(LockedError):
+            fresh.get_note_content(nid)
+        assert fresh.unlock_project(pid, "old") is False
+        assert fresh.unlock_project(pid, "new") is True
+        assert parse_snapshot(fresh.get_note_content(nid)) == expected
+        assert [row[0] for row in fresh.get_notes(pid, "auditor")] == [nid]
+        assert fresh.get_notes(pid, "audit") == [] # Whole words only
+
+        fresh.set_project_password(pid, "")
+        assert not fresh.is_encrypted(pid)
+        title, content = fresh._read_one("SELECT title, content FROM notes WHERE id = ?", (nid,))
+        assert not is_sealed(title) and not is_sealed(content)
+        assert parse_snapshot(fresh.get_note_content(nid)) == expected
+        assert fresh.get_stats()["journal_ops"] == 0
+    finally:
+        fresh.close()
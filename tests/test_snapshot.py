@@ -0,0 +1,63 @@
+import json
+
+from snapshot import TextBuffer, parse_snapshot, serialize_snapshot
+
+def replay(ops, raw=""):
+    buf = TextBuffer(raw)
+    for op in ops: buf.apply(op)
+    return parse_snapshot(buf.snapshot())
+
+def test_typing_into_empty_note():
+    text, tags = replay([["i", "1.0", "Hello", []], ["i", "1.5", "\n", []], ["i", "2.0", "world", []]])
+    assert text == "Hello\nworld"
+    assert tags == {}
+
+def test_insert_carries_exactly_its_tags():
+    text, tags = replay([["i", "1.0", "Hi ", []], ["i", "1.3", "there", ["bold"]], ["i", "1.8", "!", []]])
+    assert text == "Hi there!"
+    assert tags == {"bold": [("1.3", "1.8")]}
+
+def test_plain_insert_splits_a_tag_range():
+    raw = serialize_snapshot("abcdef", {"italic": ["1.0", "1.6"]})
+    text, tags = replay([["i", "1.3", "XY", []]], raw)
+    assert text == "abcXYdef"
+    assert tags == {"italic": [("1.0", "1.3"), ("1.5", "1.8")]}
+
+def test_delete_across_lines_shifts_and_merges_tags():
+    raw = serialize_snapshot("ab\ncd\nef", {"bold": ["1.0", "1.1", "2.1", "3.1"]})
+    text, tags = replay([["d", "1.1", "2.1"]], raw)
+    assert text == "ad\nef"
+    assert tags == {"bold": [("1.0", "2.1")]}
+
+def test_tag_add_and_remove():
+    ops = [["i", "1.0", "one two three", []], ["t+", "heading", "1.0", "1.13"], ["t-", "heading", "1.3", "1.8"]]
+    text, tags = replay(ops)
+    assert tags == {"heading": [("1.0", "1.3"), ("1.8", "1.13")]}
+
+def test_indices_clamp_like_tk():
+    # A column past the line end lands at the end of that line; a line past
+    # the last lands at the end of the text
+    text, _ = replay([["i", "1.0", "ab\ncd", []], ["i", "1.99", "!", []], ["i", "9.0", "?", []]])
+    assert text == "ab!\ncd?"
+
+def test_unknown_tags_and_ops_are_ignored():
+    text, tags = replay([["i", "1.0", "x", ["underline"]], ["t+", "underline", "1.0", "1.1"], ["zz"]])
+    assert text == "x"
+    assert tags == {}
+
+def test_plain_text_content_from_before_snapshots():
+    text, tags = replay([["i", "1.0", "> ", []]], "old note")
+    assert text == "> old note"
+    assert tags == {}
+
+def test_database_replays_the_journal_on_read_and_checkpoint(db, new_project):
+    pid = new_project("Journal")
+    nid = db.add_note(pid, serialize_snapshot("Title\nbody", {}))
+    ops = [["i", "2.4", " text", []], ["t+", "bold", "1.0", "1.5"], ["d", "2.0", "2.5"]]
+    db.append_journal([(nid, op) for op in ops])
+    expected = replay(ops, serialize_snapshot("Title\nbody", {}))
+    assert parse_snapshot(db.get_note_content(nid)) == expected == ("Title\ntext", {"bold": [("1.0", "1.5")]})
+    assert db.checkpoint_journal() == 1
+    assert db.get_stats()["journal_ops"] == 0
+    assert parse_snapshot(db.get_note_content(nid)) == expected
+    assert json.loads(db.get_note_content(nid))["text"] == "Title\ntext"
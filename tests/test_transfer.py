@@ -0,0 +1,107 @@
+import json
+import os
+
+import pytest
+
+from crypto import HAS_CRYPTO, check_password
+from database import DatabaseManager
+from snapshot import parse_snapshot, serialize_snapshot
+from transfer import export_ndjson, import_ndjson
+
+needs_crypto = pytest.mark.skipif(not HAS_CRYPTO, reason="sealing needs the 'cryptography' package")
+
+@pytest.fixture
+def dest(tmp_path):
+    os.makedirs(tmp_path / "dest")
+    manager = DatabaseManager(str(tmp_path / "dest" / "notes.db"))
+    yield manager
+    manager.close()
+
+def notes_of(db, name):
+    pid = next(pid for pid, n, *_ in db.get_projects() if n == name)
+    return pid, {db.get_note(nid)[0]: db.get_note_content(nid) for nid, *_ in db.get_notes(pid)}
+
+def leftovers(db):
+    return [n for n in os.listdir(os.path.dirname(db.db_path)) if n.startswith("import_")]
+
+def test_round_trip_with_journal_pages_and_todos(db, new_project, dest, tmp_path):
+    pid = new_project("Work", "desk notes")
+    plain = db.add_note(pid, serialize_snapshot("Plain\nsaved", {}))
+    journaled = db.add_note(pid, serialize_snapshot("Draft\n", {}))
+    db.append_journal([(journaled, ["i", "2.0", "typed later", ["italic"]])])
+    db.add_todo(pid, "file report", "2026-03-01")
+    with open(os.path.join(os.path.dirname(db.db_path), f"wb_{plain}_0.png"), "wb") as f: f.write(b"page zero")
+    db.set_project_password(pid, "pw")
+
+    dest.add_project("Existing", "") # Imported ids must not collide with these
+    dest.add_note(dest.get_projects()[0][0], "keep me")
+
+    out = str(tmp_path / "export.ndjson")
+    assert export_ndjson(db.db_path, out) == 1
+    assert import_ndjson(dest.db_path, out) == 1
+    assert leftovers(dest) == []
+
+    new_pid, notes = notes_of(dest, "Work")
+    assert parse_snapshot(notes["Plain"]) == ("Plain\nsaved", {})
+    assert parse_snapshot(notes["Draft"]) == ("Draft\ntyped later", {"italic": [("2.0", "2.11")]})
+    assert dest.get_stats()["journal_ops"] == 0 # Folded in on export
+    assert check_password("pw", dest.get_project_password(new_pid)) is not None
+    assert [(t[2], t[3]) for t in dest.get_todos(new_pid)] == [("file report", "2026-03-01")]
+    new_plain = next(nid for nid, _, title, _ in dest.get_notes(new_pid) if title == "Plain")
+    with open(os.path.join(os.path.dirname(dest.db_path), f"wb_{new_plain}_0.png"), "rb") as f:
+        assert f.read() == b"page zero"
+    assert notes_of(dest, "Existing")[1] == {"keep me": "keep me"}
+
+def test_version_1_export_with_plain_password(dest, tmp_path):
+    path = tmp_path / "old.ndjson"
+    records = [{"type": "header", "version": 1},
+               {"type": "project", "key": 7, "name": "Old", "description": "", "password": "hunter2"},
+               {"type": "note", "key": 9, "project": 7, "title": "Hi", "content": "Hi there"}]
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+    assert import_ndjson(dest.db_path, str(path)) == 1
+    pid, notes = notes_of(dest, "Old")
+    stored = dest.get_project_password(pid)
+    assert stored != "hunter2" and check_password("hunter2", stored) is not None
+    assert notes == {"Hi": "Hi there"}
+    assert dest.get_projects()[0][3] # created_at filled in
+
+def test_newer_format_is_refused(dest, tmp_path):
+    path = tmp_path / "new.ndjson"
+    path.write_text(json.dumps({"type": "header", "version": 99}) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        import_ndjson(dest.db_path, str(path))
+    assert leftovers(dest) == []
+
+def test_cancelled_import_adds_nothing(db, new_project, dest, tmp_path):
+    db.add_note(new_project("Work"), "note")
+    out = str(tmp_path / "export.ndjson")
+    export_ndjson(db.db_path, out)
+    assert import_ndjson(dest.db_path, out, cancelled=lambda: True) is None
+    assert dest.get_projects() == []
+    assert leftovers(dest) == []
+
+@needs_crypto
+def test_sealed_notes_travel_with_their_journal(db, new_project, dest, tmp_path):
+    pid = new_project("Vault")
+    nid = db.add_note(pid, serialize_snapshot("Keys\nunder the mat", {}))
+    db.set_project_password(pid, "pw")
+    assert db.encrypt_project(pid, "pw")
+    db.append_journal([(nid, ["d", "2.0", "2.6"]), (nid, ["t+", "heading", "1.0", "1.4"])])
+
+    out = str(tmp_path / "export.ndjson")
+    export_ndjson(db.db_path, out)
+    with open(out, encoding="utf-8") as f:
+        assert "under the mat" not in f.read()
+    assert import_ndjson(dest.db_path, out) == 1
+
+    fresh = DatabaseManager(dest.db_path) # Nothing unlocked yet
+    try:
+        new_pid = fresh.get_projects()[0][0]
+        assert fresh.is_encrypted(new_pid)
+        assert fresh.get_stats()["journal_ops"] == 2
+        assert fresh.unlock_project(new_pid, "pw")
+        new_nid = fresh.get_notes(new_pid)[0][0]
+        assert fresh.get_note(new_nid) == ("Keys", serialize_snapshot("Keys\nthe mat", {"heading": ["1.0", "1.4"]}))
+        assert [row[0] for row in fresh.get_notes(new_pid, "mat")] == [new_nid]
+    finally:
+        fresh.close()
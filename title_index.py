@@ -0,0 +1,130 @@
+# title_index.py
+# In-memory trigram index over note titles for the Ctrl+P quick switcher, free
+# of tkinter. Matching is fuzzy: the query's characters must appear in the
+# title in order. Candidates come from the postings of the query's rarest
+# trigram first (every title containing the query verbatim is in there), newest
+# notes first and capped, so a keystroke never walks every title; queries with
+# no shared trigrams ("mtgnts" for "Meeting notes") fall back to a bounded scan.
+import re
+import threading
+from collections import defaultdict
+
+CANDIDATES = 2000 # Posting entries walked per query, rarest trigram first
+FALLBACK_SCAN = 3000 # Titles tested when the postings come up short
+STALE_LIMIT = 0.5 # Rebuild the postings once this share of entries is stale
+
+def trigrams(text, pad=True):
+    if pad: text = f" {text} " # So one- and two-letter titles still index
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TitleIndex:
+    """note id -> (title, project id, lowercased title), searchable by fuzzy subsequence.
+    Safe to update from the checkpoint worker while the Tk thread searches."""
+    def __init__(self):
+        self.titles = {}
+        self.postings = defaultdict(list) # trigram -> [note id]; may hold stale ids, checked on read
+        self.ready = False
+        self._entries = 0
+        self._stale = 0
+        self._touched = None # Ids changed while build() was reading the database
+        self._gone = set() # Projects deleted meanwhile
+        self._lock = threading.Lock()
+
+    def begin_build(self):
+        with self._lock:
+            self._touched = set()
+            self._gone = set()
+
+    def build(self, rows):
+        """rows: [(note id, project id, title)] read after begin_build(). The postings
+        are built without the lock, so set() from the Tk thread never waits on them."""
+        titles = {nid: (title or "", pid, (title or "").lower()) for nid, pid, title in rows}
+        postings, entries = self._postings(titles)
+        with self._lock:
+            touched, self._touched = self._touched or set(), None
+            if self._gone:
+                for nid in [n for n, (_, p, _) in titles.items() if p in self._gone]: del titles[nid]
+            stale = 0
+            for nid in touched: # Updates that landed mid-build are newer than rows
+                old, new = titles.pop(nid, None), self.titles.get(nid)
+                if old: stale += len(trigrams(old[2]))
+                if not new: continue
+                titles[nid] = new
+                for g in trigrams(new[2]): postings[g].append(nid)
+                entries += len(trigrams(new[2]))
+            self.titles, self.postings = titles, postings
+            self._entries, self._stale = entries, stale
+            self.ready = True
+
+    @staticmethod
+    def _postings(titles):
+        postings = defaultdict(list)
+        for nid, (_, _, low) in titles.items():
+            for g in trigrams(low): postings[g].append(nid)
+        return postings, sum(map(len, postings.values()))
+
+    def _reindex(self):
+        self.postings, self._entries = self._postings(self.titles)
+        self._stale = 0
+
+    def set(self, nid, pid, title):
+        """Add or retitle a note; title None removes it. nid None with a title
+        of None removes every note of project pid."""
+        with self._lock:
+            if nid is None:
+                if self._touched is not None: self._gone.add(pid)
+                gone = [n for n, (_, p, _) in self.titles.items() if p == pid]
+                for n in gone: self._drop(n)
+                return
+            if self._touched is not None: self._touched.add(nid)
+            if title is None: return self._drop(nid)
+            old = self.titles.get(nid)
+            if old and old[:2] == (title, pid): return
+            self.titles[nid] = (title, pid, title.lower())
+            old_grams = trigrams(old[2]) if old else set()
+            for g in trigrams(title.lower()) - old_grams:
+                self.postings[g].append(nid)
+                self._entries += 1
+            self._stale += len(old_grams)
+            self._maybe_compact()
+
+    def _drop(self, nid):
+        old = self.titles.pop(nid, None)
+        if old:
+            self._stale += len(trigrams(old[2]))
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._entries and self._stale > self._entries * STALE_LIMIT: self._reindex()
+
+    def search(self, query, limit=20, hidden=()):
+        """[(note id, project id, title)] best first. Notes of projects in hidden are skipped."""
+        q = query.lower().strip()
+        if not q: return []
+        pattern = re.compile(".*?".join(map(re.escape, q)))
+        with self._lock:
+            hits, tested = {}, set()
+            def test(nid):
+                tested.add(nid)
+                entry = self.titles.get(nid)
+                if not entry or entry[1] in hidden: return
+                low = entry[2]
+                m = pattern.search(low)
+                if not m: return
+                # Prefix, then substring, then the tightest and earliest spread of the letters
+                rank = 0 if low.startswith(q) else 1 if q in low else 2
+                hits[nid] = ((rank, m.end() - m.start(), m.start(), len(low)), entry)
+
+            if len(q) >= 3:
+                budget = CANDIDATES
+                for g in sorted(trigrams(q, pad=False) & self.postings.keys(), key=lambda g: len(self.postings[g])):
+                    for nid in reversed(self.postings[g]):
+                        if budget <= 0: break
+                        budget -= 1
+                        if nid not in tested: test(nid)
+            if len(hits) < limit:
+                for i, nid in enumerate(reversed(self.titles)):
+                    if i >= FALLBACK_SCAN or len(hits) >= limit * 5: break
+                    if nid not in tested: test(nid)
+        best = sorted(hits.items(), key=lambda h: h[1][0])[:limit]
+        return [(nid, entry[1], entry[0]) for nid, (_, entry) in best]
@@ -0,0 +1,218 @@
+# transfer.py
+# Notebook export/import as NDJSON: one JSON record per line, whiteboard pages
+# copied next to it in a "<file>.files" folder. Both directions stream, so
+# memory use doesn't grow with the number of notebooks. Encrypted notebooks
+# travel still sealed (base64), together with their wrapped data key.
+# Journaled edits not yet checkpointed are folded into plain notes on export;
+# a sealed note can't be replayed without its key, so its ops travel with it.
+import os
+import re
+import json
+import base64
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+from database import pack_content, unpack_content, snapshot_text, plain_text_title, iso_due
+from snapshot import TextBuffer
+from crypto import is_sealed, is_hashed, hash_password
+
+FORMAT_VERSION = 2 # 2: hashed passwords, sealed notes and wrapped keys of encrypted notebooks
+BATCH_SIZE = 500
+
+def sidecar_dir(path):
+    return path + ".files"
+
+def _b64(value):
+    return base64.b64encode(value).decode("ascii") if value is not None else None
+
+def _unb64(value):
+    return base64.b64decode(value) if value is not None else None
+
+def iter_records(conn, project_ids=None):
+    """Yield export records notebook by notebook. Each query is iterated straight
+    off its cursor, so rows are pulled from SQLite as they are written out.
+    Run it inside a read transaction so journal and notes come from one snapshot."""
+    yield {"type": "header", "version": FORMAT_VERSION}
+    if project_ids is None:
+        projects = conn.execute("SELECT id, name, description, created_at, password, enc_key FROM projects ORDER BY id")
+    else:
+        projects = (conn.execute("SELECT id, name, description, created_at, password, enc_key FROM projects WHERE id = ?", (pid,)).fetchone()
+                    for pid in project_ids)
+    for row in projects:
+        if not row: continue
+        pid, name, desc, created, password, enc_key = row
+        yield {"type": "project", "key": pid, "name": name, "description": desc, "created_at": created, "password": password,
+               "enc_key": _b64(enc_key)}
+        journal = {}
+        for nid, op in conn.execute("""
+            SELECT j.note_id, j.op FROM note_journal j JOIN notes n ON n.id = j.note_id WHERE n.project_id = ? ORDER BY j.seq
+        """, (pid,)):
+            journal.setdefault(nid, []).append(op)
+        for nid, title, content, text, ts in conn.execute("SELECT id, title, content, plain_text, timestamp FROM notes WHERE project_id = ? ORDER BY id", (pid,)):
+            ops = journal.get(nid, [])
+            if is_sealed(content) or any(map(is_sealed, ops)):
+                yield {"type": "note", "key": nid, "project": pid, "sealed": True, "title": _b64(title), "content": _b64(content),
+                       "plain_text": text, "timestamp": ts, "journal": [_b64(op) for op in ops]}
+            else:
+                content = unpack_content(content)
+                if ops:
+                    buf = TextBuffer(content or "")
+                    for op in ops: buf.apply(json.loads(op))
+                    content = buf.snapshot()
+                    title = plain_text_title(content)
+                yield {"type": "note", "key": nid, "project": pid, "title": title, "content": content, "timestamp": ts}
+        for task, due, done, created_at in conn.execute("SELECT task, due_date, is_done, created_at FROM todos WHERE project_id = ? ORDER BY id", (pid,)):
+            yield {"type": "todo", "project": pid, "task": task, "due_date": due, "is_done": done, "created_at": created_at}
+
+def export_ndjson(db_path, out_path, project_ids=None, progress=None, cancelled=None):
+    """Write notebooks to out_path, copying whiteboard pages into sidecar_dir(out_path).
+    Returns the number of notebooks written, or None if cancelled."""
+    app_dir = os.path.dirname(db_path)
+    files_dir = sidecar_dir(out_path)
+    os.makedirs(files_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    total = len(project_ids) if project_ids is not None else conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+    # One directory scan up front instead of a glob per note
+    pages = {}
+    for name in os.listdir(app_dir):
+        m = re.match(r"^wb_(\d+)_(\d+)\.png$", name)
+        if m: pages.setdefault(int(m.group(1)), []).append(int(m.group(2)))
+    count = 0
+    try:
+        conn.execute("BEGIN")
+        with open(out_path, "w", encoding="utf-8") as out:
+            for rec in iter_records(conn, project_ids):
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                if rec["type"] == "project":
+                    count += 1
+                    if cancelled and cancelled(): return None
+                    if progress: progress(count, total, f"Exported {count} of {total} notebooks...")
+                elif rec["type"] == "note":
+                    for page in sorted(pages.get(rec["key"], [])):
+                        name = f"wb_{rec['key']}_{page}.png"
+                        shutil.copyfile(os.path.join(app_dir, name), os.path.join(files_dir, name))
+                        out.write(json.dumps({"type": "page", "note": rec["key"], "page": page, "file": name}) + "\n")
+    finally:
+        conn.close()
+    return count
+
+STAGE_SCHEMA = """
+    CREATE TABLE projects (seq INTEGER PRIMARY KEY, name, description, created_at, password, enc_key);
+    CREATE TABLE notes (seq INTEGER PRIMARY KEY, project_seq, title, content, plain_text, timestamp);
+    CREATE TABLE todos (project_seq, task, due_date, is_done, created_at);
+    CREATE TABLE journal (note_seq, op);
+"""
+
+def import_ndjson(db_path, in_path, batch_size=BATCH_SIZE, progress=None, cancelled=None):
+    """Append every notebook in in_path as new notebooks; on any error (or cancel)
+    nothing is added. Returns the number of notebooks imported.
+    The file is first parsed into a private staging database (and its pages into a
+    staging folder) without touching the app's database. Only then is everything
+    copied in with one INSERT ... SELECT per table, a transaction short enough
+    that the app's writer never runs into a lock."""
+    app_dir = os.path.dirname(db_path)
+    files_dir = sidecar_dir(in_path)
+    stage_dir = tempfile.mkdtemp(prefix="import_", dir=app_dir) # Same disk, so pages move in with a rename
+    stage = sqlite3.connect(os.path.join(stage_dir, "stage.db"), isolation_level=None)
+    stage.execute("PRAGMA journal_mode = OFF")
+    stage.execute("PRAGMA synchronous = OFF")
+    stage.executescript(STAGE_SCHEMA)
+    buffers = {"projects": [], "notes": [], "todos": [], "journal": []}
+    sql = {
+        "projects": "INSERT INTO projects VALUES (?, ?, ?, ?, ?, ?)",
+        "notes": "INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?)",
+        "todos": "INSERT INTO todos VALUES (?, ?, ?, ?, ?)",
+        "journal": "INSERT INTO journal VALUES (?, ?)",
+    }
+
+    def flush():
+        for table, rows in buffers.items():
+            if rows:
+                stage.executemany(sql[table], rows)
+                rows.clear()
+
+    conn = None
+    pages = [] # (staged file, note seq, page)
+    try:
+        # --- Parse into the staging database ---
+        size = max(os.path.getsize(in_path), 1)
+        pid_map, nid_map = {}, {} # export key -> staging seq
+        done = 0
+        stage.execute("BEGIN")
+        with open(in_path, "rb") as f: # Binary, so bytes read can drive the progress bar
+            for raw in f:
+                done += len(raw)
+                if not raw.strip(): continue
+                rec = json.loads(raw)
+                kind = rec.get("type")
+                if kind == "header":
+                    if rec.get("version", 1) > FORMAT_VERSION:
+                        raise ValueError("This export was made by a newer version of the app.")
+                elif kind == "project":
+                    if cancelled and cancelled(): raise InterruptedError()
+                    seq = pid_map[rec["key"]] = len(pid_map)
+                    password = rec.get("password")
+                    if password and not is_hashed(password): password = hash_password(password) # Version 1 exports hold plain text
+                    created = rec.get("created_at") or datetime.now().strftime("%Y-%m-%d %H:%M")
+                    buffers["projects"].append((seq, rec["name"], rec.get("description"), created, password,
+                                                _unb64(rec.get("enc_key"))))
+                    if progress: progress(done, size, f"Read {len(pid_map)} notebooks...")
+                elif kind == "note":
+                    seq = nid_map[rec["key"]] = len(nid_map)
+                    if rec.get("sealed"):
+                        buffers["notes"].append((seq, pid_map[rec["project"]], _unb64(rec["title"]), _unb64(rec["content"]),
+                                                 rec.get("plain_text"), rec.get("timestamp")))
+                        buffers["journal"] += [(seq, _unb64(op)) for op in rec.get("journal", [])]
+                    else:
+                        content = rec.get("content") or ""
+                        buffers["notes"].append((seq, pid_map[rec["project"]], rec.get("title"), pack_content(content),
+                                                 snapshot_text(content), rec.get("timestamp")))
+                elif kind == "todo":
+                    buffers["todos"].append((pid_map[rec["project"]], rec.get("task"), iso_due(rec.get("due_date")), rec.get("is_done", 0), rec.get("created_at")))
+                elif kind == "page":
+                    seq, page = nid_map[rec["note"]], int(rec["page"])
+                    staged = os.path.join(stage_dir, f"{seq}_{page}.png")
+                    shutil.copyfile(os.path.join(files_dir, os.path.basename(rec["file"])), staged)
+                    pages.append((staged, seq, page))
+                if sum(len(b) for b in buffers.values()) >= batch_size:
+                    flush()
+        flush()
+        stage.execute("COMMIT")
+        stage.close()
+        if cancelled and cancelled(): raise InterruptedError()
+        if progress: progress(size, size, "Adding notebooks to the database...")
+
+        # --- Copy in, in one short transaction ---
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("ATTACH DATABASE ? AS stage", (os.path.join(stage_dir, "stage.db"),))
+        conn.execute("BEGIN IMMEDIATE")
+        def next_id(table):
+            seq = conn.execute("SELECT seq FROM main.sqlite_sequence WHERE name = ?", (table,)).fetchone()
+            top = conn.execute(f"SELECT MAX(id) FROM main.{table}").fetchone()[0]
+            return max(seq[0] if seq else 0, top or 0) + 1
+        base_pid, base_nid = next_id("projects"), next_id("notes")
+        conn.execute("""INSERT INTO main.projects (id, name, description, created_at, password, enc_key)
+                        SELECT ? + seq, name, description, created_at, password, enc_key FROM stage.projects ORDER BY seq""", (base_pid,))
+        conn.execute("""INSERT INTO main.notes (id, project_id, title, content, plain_text, timestamp)
+                        SELECT ? + seq, ? + project_seq, title, content, plain_text, timestamp FROM stage.notes ORDER BY seq""",
+                     (base_nid, base_pid))
+        conn.execute("""INSERT INTO main.todos (project_id, task, due_date, is_done, created_at)
+                        SELECT ? + project_seq, task, due_date, is_done, created_at FROM stage.todos ORDER BY rowid""", (base_pid,))
+        conn.execute("""INSERT INTO main.note_journal (note_id, op)
+                        SELECT ? + note_seq, op FROM stage.journal ORDER BY rowid""", (base_nid,))
+        conn.execute("COMMIT")
+        # The notes exist now, so storage cleanup can't mistake their pages for orphans
+        for staged, seq, page in pages:
+            os.replace(staged, os.path.join(app_dir, f"wb_{base_nid + seq}_{page}.png"))
+        return len(pid_map)
+    except InterruptedError:
+        return None
+    finally:
+        if conn:
+            if conn.in_transaction: conn.execute("ROLLBACK")
+            conn.close()
+        try: stage.close()
+        except sqlite3.Error: pass
+        shutil.rmtree(stage_dir, ignore_errors=True)
@@ -2,11 +2,141 @@
 import tkinter as tk
 from tkinter import ttk
 import calendar
+import queue
+import threading
+import time
 from datetime import datetime
 from config import COLORS
 
+# --- Event coalescing ---
+class Scheduler:
+    """Merges bursts of Tk callbacks into single runs, keyed by name.
+    debounce: run once `delay` ms after the last request.
+    throttle: run at most once per `interval` ms; the latest request wins.
+    idle: run once when Tk is next idle (after pending redraws and events).
+    Requesting a key that is already pending only replaces its callback.
+    Keys of the form (widget, ...) are cancelled and dropped when that widget is destroyed."""
+    def __init__(self, root):
+        self.root = root
+        self._pending = {} # key -> [after_id, fn]
+        self._last_run = {} # key -> time.monotonic() of the last throttled run
+        self._watched = set() # Widgets with a <Destroy> hook into forget()
+
+    def debounce(self, key, delay, fn):
+        self._watch(key)
+        self.cancel(key)
+        self._pending[key] = [self.root.after(delay, self._run, key), fn]
+
+    def throttle(self, key, interval, fn):
+        self._watch(key)
+        if key in self._pending:
+            self._pending[key][1] = fn
+            return
+        wait = interval - (time.monotonic() - self._last_run.get(key, 0)) * 1000
+        after_id = self.root.after(int(wait), self._run, key) if wait > 0 else self.root.after_idle(self._run, key)
+        self._pending[key] = [after_id, fn]
+
+    def idle(self, key, fn):
+        self._watch(key)
+        if key in self._pending:
+            self._pending[key][1] = fn
+            return
+        self._pending[key] = [self.root.after_idle(self._run, key), fn]
+
+    def cancel(self, key):
+        entry = self._pending.pop(key, None)
+        if entry: self.root.after_cancel(entry[0])
+
+    def forget(self, widget):
+        """Cancel and drop every (widget, ...) key."""
+        self._watched.discard(widget)
+        for key in [k for k in (*self._pending, *self._last_run) if isinstance(k, tuple) and k[0] is widget]:
+            self.cancel(key)
+            self._last_run.pop(key, None)
+
+    def _watch(self, key):
+        widget = key[0] if isinstance(key, tuple) and key and isinstance(key[0], tk.Misc) else None
+        if widget is None or widget in self._watched: return
+        self._watched.add(widget)
+        # Children's Destroy events reach a toplevel's bindings too; only react to the widget's own
+        widget.bind("<Destroy>", lambda e: self.forget(widget) if e.widget is widget else None, add="+")
+
+    def _run(self, key):
+        entry = self._pending.pop(key, None)
+        if not entry: return
+        self._last_run[key] = time.monotonic()
+        entry[1]()
+
+def get_scheduler(widget):
+    """The Scheduler shared by every widget under widget's Tk root."""
+    root = widget._root()
+    if not hasattr(root, "_scheduler"): root._scheduler = Scheduler(root)
+    return root._scheduler
+
+# --- Text edit recording ---
+def _index_key(index):
+    line, col = index.split(".")
+    return int(line), int(col)
+
+class TextOpRecorder:
+    """Puts a Python layer in front of a Text widget's Tcl command (as IDLE's
+    redirector does) so every insert, delete and tag change, including the ones
+    Tk's own undo/redo replays, is reported to on_op as a journal operation with
+    resolved indices (see snapshot.TextBuffer). Only `tags` are reported."""
+    def __init__(self, widget, on_op, tags):
+        self.widget = widget
+        self.on_op = on_op
+        self.tags = tags
+        self.orig = widget._w + "_orig"
+        widget.tk.call("rename", widget._w, self.orig)
+        widget.tk.createcommand(widget._w, self._dispatch)
+
+    def _call(self, *args):
+        return self.widget.tk.call(self.orig, *args)
+
+    def _index(self, index):
+        return str(self._call("index", index))
+
+    def _pairs(self, indices):
+        # Tk lets the last index of a range list stand alone for a single character
+        indices = list(indices)
+        if len(indices) % 2: indices.append(f"{indices[-1]}+1c")
+        return [(self._index(a), self._index(b)) for a, b in zip(indices[::2], indices[1::2])]
+
+    def _inserted(self, index, chars):
+        if not chars: return
+        names = self._call("tag", "names", index)
+        self.on_op(["i", index, chars, [t for t in self.tags if t in names]])
+
+    def _dispatch(self, cmd, *args):
+        if cmd == "insert" and len(args) > 1:
+            index = self._index(args[0])
+            if self._call("compare", index, "==", "end"): index = self._index("end-1c") # Tk inserts before the final newline
+            result = self._call(cmd, *args)
+            self._inserted(index, "".join(args[1::2]))
+            return result
+        if cmd == "delete" and args:
+            ranges = self._pairs(args)
+            result = self._call(cmd, *args)
+            for a, b in sorted(ranges, key=lambda r: _index_key(r[0]), reverse=True): # Tk deletes back to front
+                self.on_op(["d", a, b])
+            return result
+        if cmd == "replace" and len(args) > 2:
+            (a, b), = self._pairs(args[:2])
+            result = self._call(cmd, *args)
+            self.on_op(["d", a, b])
+            self._inserted(a, "".join(args[2::2]))
+            return result
+        if cmd == "tag" and len(args) > 2 and args[0] in ("add", "remove") and args[1] in self.tags:
+            ranges = self._pairs(args[2:])
+            result = self._call(cmd, *args)
+            for a, b in ranges:
+                self.on_op(["t+" if args[0] == "add" else "t-", args[1], a, b])
+            return result
+        return self._call(cmd, *args)
+
 class CustomDialog(tk.Toplevel):
-    def __init__(self, parent, title, width=350, height=160):
+    def __init__(self, parent, title, width=350, height=160, modal=True):
         super().__init__(parent)
         self.withdraw()
         self.title(title)
@@ -16,7 +146,7 @@ class CustomDialog(tk.Toplevel):
         self.configure(bg=COLORS["bg_main"])
         self.resizable(False, False)
         self.transient(parent)
-        self.grab_set()
+        if modal: self.grab_set()
         self.update_idletasks()
         x = parent.winfo_x() + (parent.winfo_width() // 2) - (width // 2)
         y = parent.winfo_y() + (parent.winfo_height() // 2) - (height // 2)
@@ -63,6 +193,109 @@ class CustomAskString(CustomDialog):
         self.result = self.entry.get()
         self.destroy()
 
+class QuickSwitcher(CustomDialog):
+    # Ctrl+P palette: search(query) -> [(key, label)] runs on every keystroke;
+    # on_pick(key) gets the chosen entry after the dialog closes
+    def __init__(self, parent, search, on_pick):
+        super().__init__(parent, "Go to Note", width=480, height=340)
+        self.search, self.on_pick, self.keys = search, on_pick, []
+        self.var = tk.StringVar()
+        self.entry = ttk.Entry(self, textvariable=self.var)
+        self.entry.pack(fill="x", padx=10, pady=(10, 5))
+        self.listbox = tk.Listbox(self, activestyle="none", font=("Segoe UI", 10), bd=0, highlightthickness=0,
+                                  bg=COLORS["white"], fg=COLORS["fg_text"], selectbackground=COLORS["bg_active"])
+        self.listbox.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.var.trace("w", lambda n, i, m: self.refresh())
+        self.entry.bind("<Down>", lambda e: self.move(1))
+        self.entry.bind("<Up>", lambda e: self.move(-1))
+        self.entry.bind("<Return>", lambda e: self.pick())
+        self.bind("<Escape>", lambda e: self.destroy())
+        self.listbox.bind("<Double-Button-1>", lambda e: self.pick())
+        self.entry.focus_set()
+    def refresh(self):
+        results = self.search(self.var.get())
+        self.keys = [key for key, _ in results]
+        self.listbox.delete(0, "end")
+        for _, label in results: self.listbox.insert("end", label)
+        if results: self.listbox.selection_set(0)
+    def move(self, step):
+        if not self.keys: return "break"
+        sel = self.listbox.curselection()
+        i = min(max((sel[0] if sel else -1) + step, 0), len(self.keys) - 1)
+        self.listbox.selection_clear(0, "end")
+        self.listbox.selection_set(i)
+        self.listbox.see(i)
+        return "break"
+    def pick(self):
+        sel = self.listbox.curselection()
+        if not sel: return
+        key = self.keys[sel[0]]
+        self.destroy()
+        self.on_pick(key)
+
+class ProgressDialog(CustomDialog):
+    # Non-modal: the main window keeps working while a background job reports in
+    def __init__(self, parent, title, message, on_cancel=None):
+        super().__init__(parent, title, height=150, modal=False)
+        self.on_cancel = on_cancel
+        self.lbl = tk.Label(self, text=message, bg=COLORS["bg_main"], fg=COLORS["fg_text"], wraplength=300, font=("Segoe UI", 10))
+        self.lbl.pack(pady=(20, 10), padx=20)
+        self.bar = ttk.Progressbar(self, orient="horizontal", mode="determinate", length=300)
+        self.bar.pack(padx=20)
+        self.btn_cancel = ttk.Button(self, text="Cancel", command=self.cancel)
+        self.btn_cancel.pack(pady=15)
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+    def set_progress(self, done, total, message=None):
+        self.bar.config(maximum=max(total, 1), value=done)
+        if message: self.lbl.config(text=message)
+    def cancel(self):
+        if not self.on_cancel: return
+        self.btn_cancel.config(state="disabled")
+        self.lbl.config(text="Cancelling...")
+        self.on_cancel()
+
+class BackgroundTask:
+    # Runs work(progress, cancelled) on a thread behind a ProgressDialog. The worker
+    # may call progress(done, total, text=None) freely; updates reach Tk via a queue.
+    # on_done(result) runs on the Tk thread unless the task was cancelled; then
+    # on_cancel() runs instead, once the worker has stopped.
+    def __init__(self, parent, title, message, work, on_done=None, cancellable=True, on_cancel=None):
+        self.parent = parent
+        self.work = work
+        self.on_done = on_done
+        self.on_cancel = on_cancel
+        self.messages = queue.Queue()
+        self.cancel_flag = threading.Event()
+        self.dialog = ProgressDialog(parent, title, message, on_cancel=self.cancel_flag.set if cancellable else None)
+        if not cancellable: self.dialog.btn_cancel.pack_forget()
+        threading.Thread(target=self._run, daemon=True).start()
+        parent.after(100, self._poll)
+
+    def _run(self):
+        try:
+            result = self.work(lambda done, total, text=None: self.messages.put(("progress", done, total, text)),
+                               self.cancel_flag.is_set)
+            self.messages.put(("done", result))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+    def _poll(self):
+        while True:
+            try: msg = self.messages.get_nowait()
+            except queue.Empty: return self.parent.after(100, self._poll)
+            if msg[0] == "progress":
+                if not self.cancel_flag.is_set() and self.dialog.winfo_exists():
+                    self.dialog.set_progress(msg[1], msg[2], msg[3])
+                continue
+            if self.dialog.winfo_exists(): self.dialog.destroy()
+            if msg[0] == "error":
+                show_msg(self.parent, "Error", str(msg[1]), True)
+            elif self.cancel_flag.is_set():
+                if self.on_cancel: self.on_cancel()
+            elif self.on_done:
+                self.on_done(msg[1])
+            return
+
 class CalendarDialog(CustomDialog):
     def __init__(self, parent, callback):
         super().__init__(parent, "Select Date", 250, 250)
@@ -101,7 +334,7 @@ class CalendarDialog(CustomDialog):
         if self.month == 13: self.month, self.year = 1, self.year + 1
         self._update_calendar()
     def _select_date(self, day):
-        self.callback(f"{day:02d}-{self.month:02d}-{self.year}")
+        self.callback(f"{self.year}-{self.month:02d}-{day:02d}") # ISO, so due dates sort as text
         self.destroy()
 
 class ScrollableFrame(ttk.Frame):
@@ -110,15 +343,21 @@ class ScrollableFrame(ttk.Frame):
         self.canvas = tk.Canvas(self, bg=bg_color, highlightthickness=0)
         self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
         self.scrollable_frame = ttk.Frame(self.canvas, style="Card.TFrame")
-        self.scrollable_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
         self.canvas_window = self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.bind('<Configure>', lambda e: self.canvas.itemconfig(self.canvas.create_window((0,0), window=self.scrollable_frame, anchor="nw"), width=e.width))
+        # Rows added in a loop fire <Configure> once each; sync the canvas once when idle
+        self.scrollable_frame.bind("<Configure>", lambda e: get_scheduler(self).idle((self, "sync"), self._sync_canvas))
+        self.canvas.bind('<Configure>', lambda e: get_scheduler(self).idle((self, "sync"), self._sync_canvas))
         self.canvas.configure(yscrollcommand=self.scrollbar.set)
         self.canvas.pack(side="left", fill="both", expand=True)
         self.scrollbar.pack(side="right", fill="y")
         self.scrollable_frame.bind('<Enter>', lambda e: self.canvas.bind_all("<MouseWheel>", lambda e: self.canvas.yview_scroll(int(-1*(e.delta/120)), "units")))
         self.scrollable_frame.bind('<Leave>', lambda e: self.canvas.unbind_all("<MouseWheel>"))
 
+    def _sync_canvas(self):
+        if not self.winfo_exists(): return
+        self.canvas.itemconfig(self.canvas_window, width=self.canvas.winfo_width())
+        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+
 def show_msg(parent, title, msg, is_error=False): CustomMessageDialog(parent, title, msg, is_error)
 def ask_yes_no(parent, title, msg): d = CustomAskYesNo(parent, title, msg); return d.result
 def ask_string(parent, title, prompt, show=None): d = CustomAskString(parent, title, prompt, show); return d.result
\ No newline at end of file
@@ -3,8 +3,14 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import os
 import glob
+import hashlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog
-from config import COLORS
+from config import COLORS, RESIZE_THROTTLE_MS
+from instrument import traced
+from ui_shared import get_scheduler
 
 try:
     from PIL import Image, ImageDraw, ImageTk
@@ -19,10 +25,108 @@ try:
 except ImportError:
     HAS_PDF = False
 
+THUMB_SIZE = (96, 64)
+
+class ThumbnailCache:
+    # Thumbnails live in <storage>/thumbs named by page and the SHA-1 of the page
+    # PNG (wb_<note>_<page>-<sha1>.png), so an unchanged page never gets re-rendered,
+    # even across restarts. A hit is touched, so the newest thumbnail of a page is
+    # always its current one; storage.collect_garbage() removes the rest.
+    def __init__(self, storage_path, size=THUMB_SIZE):
+        self.folder = os.path.join(storage_path, "thumbs")
+        os.makedirs(self.folder, exist_ok=True)
+        self.size = size
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._digests = {} # page path -> ((mtime_ns, size), sha1)
+
+    def _digest(self, page_path):
+        st = os.stat(page_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            hit = self._digests.get(page_path)
+        if hit and hit[0] == stamp:
+            return hit[1]
+        with open(page_path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        with self._lock:
+            self._digests[page_path] = (stamp, digest)
+        return digest
+
+    def _build(self, page_path):
+        # Runs on the worker thread; returns the thumbnail path or None
+        if not HAS_PIL or not os.path.exists(page_path): return None
+        page = os.path.splitext(os.path.basename(page_path))[0]
+        out = os.path.join(self.folder, f"{page}-{self._digest(page_path)}.png")
+        if os.path.exists(out):
+            os.utime(out)
+        else:
+            img = Image.open(page_path).convert("RGB")
+            img.thumbnail(self.size)
+            tmp = out + ".tmp"
+            img.save(tmp, "PNG")
+            os.replace(tmp, out)
+        return out
+
+    def request(self, page_path, callback):
+        # callback(thumb_path) is invoked on the worker thread
+        def job():
+            try: callback(self._build(page_path))
+            except Exception as e:
+                print(f"Error building thumbnail: {e}")
+                callback(None)
+        self.pool.submit(job)
+
+class Rasterizer:
+    # Replays canvas strokes into the page's PIL image on a worker thread, so a
+    # motion event only queues a segment. Segments drained together are drawn as
+    # one polyline per unbroken run, which also joins them smoothly.
+    def __init__(self):
+        self.jobs = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def line(self, draw, x0, y0, x1, y1, color, width):
+        # draw is captured per segment, so strokes still queued for a page that was
+        # replaced or cleared land in that page's old image, never in the new one
+        self.jobs.put((draw, (x0, y0), (x1, y1), color, width))
+
+    def flush(self):
+        """Block until every queued segment is in its image."""
+        self.jobs.join()
+
+    def close(self):
+        self.jobs.put(None)
+
+    def _run(self):
+        while True:
+            batch = [self.jobs.get()]
+            while True:
+                try: batch.append(self.jobs.get_nowait())
+                except queue.Empty: break
+            try: self._draw([job for job in batch if job])
+            except Exception as e: print(f"Error drawing strokes: {e}")
+            finally:
+                for _ in batch: self.jobs.task_done()
+            if None in batch: return
+
+    def _draw(self, batch):
+        run = None # [draw, points, color, width]
+        for draw, start, end, color, width in batch:
+            if run and run[0] is draw and run[2:] == [color, width] and run[1][-1] == start:
+                run[1].append(end)
+                continue
+            if run: run[0].line(run[1], fill=run[2], width=run[3], joint="curve")
+            run = [draw, [start, end], color, width]
+        if run: run[0].line(run[1], fill=run[2], width=run[3], joint="curve")
+
 class Whiteboard(tk.Frame):
+    # Only this empty frame exists until the tab is first shown; _build() then
+    # creates the tools, canvas and page strip. Page data waits for the tab too:
+    # while it is hidden, load_board() and goto_page() just record the note and page.
     def __init__(self, parent, storage_path, width=600, height=400):
         super().__init__(parent, bg=COLORS["white"])
         self.storage_path = storage_path
+        self.initial_size = (width, height)
         self.brush_color = "black"
         self.brush_size = 3
         self.last_x, self.last_y = None, None
@@ -34,11 +138,23 @@ class Whiteboard(tk.Frame):
         self.active_note_id = None
         self.current_page = 0
         self.total_pages = 1
+        self.built = False
+        self.loaded = False # The active note's page is on the canvas
+        self.dirty = False # Drawn on since the page was loaded or saved
         
         # Responsive Storage
         self.responsive_btns = [] # List of (widget, short_text, long_text)
         self.display_mode = "long" # current state
 
+        self.bind("<Map>", lambda e: self.show()) # ttk.Notebook maps a tab's frame when it is selected
+
+    def show(self):
+        if not self.built: self._build()
+        if not self.loaded: self._load()
+
+    @traced()
+    def _build(self):
+        self.built = True
         # --- Toolbar (Top) ---
         self.tools = tk.Frame(self, bg="#eee", pady=5)
         self.tools.pack(side="top", fill="x")
@@ -72,6 +188,25 @@ class Whiteboard(tk.Frame):
         if HAS_PDF:
              self._add_responsive_btn(nav_frame, "💾", "💾 PDF", self.export_pdf, "right")
 
+        # Page Strip (Bottom)
+        self.thumbs = ThumbnailCache(self.storage_path)
+        self.thumb_photos = {} # page index -> PhotoImage
+        self.thumb_pending = set()
+        self.thumb_results = queue.Queue()
+        self.thumb_polling = False
+        self.slot_w = THUMB_SIZE[0] + 10
+
+        strip_frame = tk.Frame(self, bg="#eee")
+        strip_frame.pack(side="bottom", fill="x")
+        self.strip = tk.Canvas(strip_frame, bg="#eee", height=THUMB_SIZE[1] + 22, highlightthickness=0)
+        self.strip_scroll = ttk.Scrollbar(strip_frame, orient="horizontal", command=self._on_strip_scroll)
+        self.strip.configure(xscrollcommand=self.strip_scroll.set)
+        self.strip.pack(side="top", fill="x")
+        self.strip_scroll.pack(side="bottom", fill="x")
+        self.strip.bind("<Configure>", lambda e: get_scheduler(self).throttle((self, "strip"), RESIZE_THROTTLE_MS, self.load_visible_thumbs))
+        self.strip.bind("<Button-1>", self._on_strip_click)
+        self.strip.bind("<Shift-MouseWheel>", lambda e: self._on_strip_scroll("scroll", int(-1*(e.delta/120)), "units"))
+
         # Canvas
         self.canvas = tk.Canvas(self, bg="white", cursor="crosshair")
         self.canvas.pack(fill="both", expand=True)
@@ -81,17 +216,19 @@ class Whiteboard(tk.Frame):
         self.canvas.bind("<ButtonRelease-1>", self.stop_draw)
         
         # Bind Resize Event
-        self.bind("<Configure>", self.on_resize)
+        self.bind("<Configure>", lambda e: get_scheduler(self).throttle((self, "resize"), RESIZE_THROTTLE_MS, self.on_resize))
 
         if HAS_PIL:
-            self.create_new_image_obj(width, height)
+            self.raster = Rasterizer()
+            self.create_new_image_obj(*self.initial_size)
+        self.update_idletasks() # Lay out now so the first page is sized to the real canvas
 
     def _add_responsive_btn(self, parent, short, long, command, side):
         btn = ttk.Button(parent, text=long, command=command)
         btn.pack(side=side, padx=2)
         self.responsive_btns.append((btn, short, long))
 
-    def on_resize(self, event):
+    def on_resize(self):
         # Check current width
         width = self.winfo_width()
         
@@ -130,14 +267,16 @@ class Whiteboard(tk.Frame):
                                   width=self.brush_size, fill=self.brush_color, 
                                   capstyle=tk.ROUND, smooth=True)
             if HAS_PIL and self.draw:
-                self.draw.line([self.last_x, self.last_y, event.x, event.y], 
-                             fill=self.brush_color, width=self.brush_size, joint="curve")
+                self.raster.line(self.draw, self.last_x, self.last_y, event.x, event.y,
+                                 self.brush_color, self.brush_size)
+                self.dirty = True
             self.last_x, self.last_y = event.x, event.y
 
     def stop_draw(self, event):
         self.last_x, self.last_y = None, None
 
     def clear_canvas(self):
+        self.dirty = True
         self.canvas.delete("all")
         if HAS_PIL:
             w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
@@ -150,6 +289,13 @@ class Whiteboard(tk.Frame):
     def load_board(self, note_id):
         self.active_note_id = note_id
         self.current_page = 0
+        self.loaded = False
+        if self.winfo_ismapped(): self._load()
+
+    @traced()
+    def _load(self):
+        # Globs and decodes; only ever runs while the tab is on screen
+        self.loaded = True
         if self.active_note_id:
             pattern = os.path.join(self.storage_path, f"wb_{self.active_note_id}_*.png")
             existing_files = glob.glob(pattern)
@@ -157,19 +303,28 @@ class Whiteboard(tk.Frame):
             self.total_pages = max(indices) + 1 if indices else 1
         else:
             self.total_pages = 1
+        self.current_page = min(self.current_page, self.total_pages - 1)
         self.load_current_page_image()
+        self.rebuild_strip()
         self.update_ui_state()
 
+    @traced()
     def save_current_page(self):
-        if not HAS_PIL or not self.active_note_id: return
+        # Untouched pages are never re-encoded (or written out blank)
+        if not HAS_PIL or not self.active_note_id or not self.loaded or not self.dirty: return
         try:
             path = self._get_filename(self.current_page)
+            self.raster.flush() # Page changes and exports all save first, so they see every stroke
             self.image.save(path)
+            self.dirty = False
+            self.refresh_thumb(self.current_page)
         except Exception as e:
             print(f"Error saving page: {e}")
 
+    @traced()
     def load_current_page_image(self):
         self.clear_canvas()
+        self.dirty = False
         if not HAS_PIL or not self.active_note_id: return
         path = self._get_filename(self.current_page)
         if os.path.exists(path):
@@ -186,24 +341,109 @@ class Whiteboard(tk.Frame):
         self.total_pages += 1
         self.current_page = self.total_pages - 1
         self.clear_canvas()
+        self.dirty = True # Saved even while empty, so the page count survives a reload
+        self.rebuild_strip()
+        self.update_ui_state()
+        self.strip.xview_moveto(1.0)
+
+    def goto_page(self, page_idx):
+        if not self.loaded:
+            self.current_page = max(page_idx, 0) # _load() clamps it to the pages that exist
+            return
+        if page_idx == self.current_page or not 0 <= page_idx < self.total_pages: return
+        self.save_current_page()
+        self.current_page = page_idx
+        self.load_current_page_image()
         self.update_ui_state()
 
     def next_page(self):
-        if self.current_page < self.total_pages - 1:
-            self.save_current_page()
-            self.current_page += 1
-            self.load_current_page_image()
-            self.update_ui_state()
+        self.goto_page(self.current_page + 1)
 
     def prev_page(self):
-        if self.current_page > 0:
-            self.save_current_page()
-            self.current_page -= 1
-            self.load_current_page_image()
-            self.update_ui_state()
+        self.goto_page(self.current_page - 1)
 
     def update_ui_state(self):
         self.lbl_page.config(text=f"{self.current_page + 1}/{self.total_pages}")
+        self.strip.delete("current_hi")
+        x = self.current_page * self.slot_w
+        self.strip.create_rectangle(x + 3, 3, x + self.slot_w - 3, THUMB_SIZE[1] + 9,
+                                    outline=COLORS["accent"], width=2, tags="current_hi")
+
+    # --- PAGE STRIP ---
+    def rebuild_strip(self):
+        self.strip.delete("all")
+        self.thumb_photos.clear()
+        self.thumb_pending.clear()
+        for i in range(self.total_pages):
+            x = i * self.slot_w
+            self.strip.create_rectangle(x + 5, 5, x + self.slot_w - 5, THUMB_SIZE[1] + 7,
+                                        fill=COLORS["white"], outline="#ccc")
+            self.strip.create_text(x + self.slot_w // 2, THUMB_SIZE[1] + 15, text=str(i + 1),
+                                   font=("Segoe UI", 8), fill=COLORS["fg_sub"])
+        self.strip.configure(scrollregion=(0, 0, self.total_pages * self.slot_w, THUMB_SIZE[1] + 22))
+        self.load_visible_thumbs()
+
+    def _on_strip_scroll(self, *args):
+        self.strip.xview(*args)
+        self.load_visible_thumbs()
+
+    def _on_strip_click(self, event):
+        self.goto_page(int(self.strip.canvasx(event.x) // self.slot_w))
+
+    def refresh_thumb(self, page_idx):
+        # Called after a save: drop the stale image and rebuild off-thread
+        self.thumb_photos.pop(page_idx, None)
+        self.strip.delete(f"thumb_{page_idx}")
+        self._request_thumb(page_idx)
+
+    def load_visible_thumbs(self):
+        # Only pages scrolled into view get their thumbnails decoded
+        if not HAS_PIL or not self.active_note_id: return
+        left = self.strip.canvasx(0)
+        first = max(0, int(left // self.slot_w))
+        last = min(self.total_pages - 1, int((left + self.strip.winfo_width()) // self.slot_w))
+        for i in range(first, last + 1):
+            if i not in self.thumb_photos:
+                self._request_thumb(i)
+
+    def _request_thumb(self, page_idx):
+        if not HAS_PIL or page_idx in self.thumb_pending: return
+        path = self._get_filename(page_idx)
+        if not os.path.exists(path): return
+        self.thumb_pending.add(page_idx)
+        note_id = self.active_note_id
+        self.thumbs.request(path, lambda out: self.thumb_results.put((note_id, page_idx, out)))
+        if not self.thumb_polling:
+            self.thumb_polling = True
+            self.after(50, self._poll_thumbs)
+
+    def _poll_thumbs(self):
+        # Worker results are applied here, on the Tk thread
+        if not self.winfo_exists(): return
+        while True:
+            try: note_id, page_idx, out = self.thumb_results.get_nowait()
+            except queue.Empty: break
+            if note_id != self.active_note_id: continue
+            self.thumb_pending.discard(page_idx)
+            if not out: continue
+            try:
+                photo = ImageTk.PhotoImage(Image.open(out))
+            except Exception: continue
+            self.thumb_photos[page_idx] = photo
+            x = page_idx * self.slot_w + self.slot_w // 2
+            self.strip.delete(f"thumb_{page_idx}")
+            self.strip.create_image(x, THUMB_SIZE[1] // 2 + 6, image=photo, tags=f"thumb_{page_idx}")
+        self.strip.tag_raise("current_hi")
+        if self.thumb_pending:
+            self.after(50, self._poll_thumbs)
+        else:
+            self.thumb_polling = False
+
+    def destroy(self):
+        if self.built:
+            self.thumbs.pool.shutdown(wait=False)
+            if HAS_PIL: self.raster.close()
+        super().destroy()
 
     def get_all_image_paths(self):
         paths = []